@@ -0,0 +1,355 @@
+"""Headless benchmarks of the pen tool editor on synthetic curves.
+
+    python benchmarks/bench_pentool.py --sizes 100,1000,10000 --output results.json
+    hython benchmarks/bench_pentool.py --output results.json --baseline baseline.json
+
+Plain python runs against the pure-Python hou stand-in in benchmarks/houstub. Under hython the
+real hou is used and only the viewer side (scene viewer, drawables, handles, node parms) comes
+from the stand-in. With --baseline the run fails when any operation got slower than the
+tolerance allows.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+STUB_DIR = os.path.join(BENCH_DIR, "houstub")
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+ANCHORS_PER_PRIM = 100
+EDIT_CALLS = 10
+
+
+@contextlib.contextmanager
+def hou_backend(use_stub):
+    """ Yields hou, headless and the backend name. Viewer classes patched into
+        the real hou under hython are restored when the block exits """
+    if not use_stub:
+        try:
+            import hou
+        except ImportError:
+            use_stub = True
+
+    if use_stub:
+        sys.path.insert(0, STUB_DIR)
+
+        # the pen tool still imports Iterable the python 3.7 way
+        import collections
+        import collections.abc
+        if not hasattr(collections, "Iterable"):
+            collections.Iterable = collections.abc.Iterable
+
+        import hou
+        import headless
+        yield hou, headless, "stub"
+        return
+
+    # stand-in modules only fill what hython is missing
+    sys.path.append(STUB_DIR)
+    import headless
+    missing = object()
+    originals = {name: getattr(hou, name, missing) for name in headless.VIEWER_CLASSES}
+    for name in headless.VIEWER_CLASSES:
+        setattr(hou, name, getattr(headless, name))
+
+    try:
+        yield hou, headless, "hython " + hou.applicationVersionString()
+    finally:
+        for name, original in originals.items():
+            if original is missing:
+                delattr(hou, name)
+            else:
+                setattr(hou, name, original)
+        sys.path.remove(STUB_DIR)
+
+
+def load_pentool():
+    sys.path.insert(0, os.path.join(REPO_DIR, "python3.7libs"))
+    spec = importlib.util.spec_from_file_location("pentool", os.path.join(REPO_DIR, "viewer_states", "pentool.py"))
+    pentool = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pentool)
+    return pentool
+
+
+class BenchState(object):
+    show_point_handles = False
+    show_attrib_values = False
+    show_tags = False
+    show_names = False
+
+    def __init__(self, hou):
+        self.pscale_handle = hou.Handle(None, "pscale_handle")
+
+    def log(self, *args):
+        pass
+
+    def show_houdini_handle(self):
+        pass
+
+
+def make_controls(pentool, np, num_anchors):
+    attribute_type = pentool.AnchorAttributeType
+    rng = np.random.default_rng(num_anchors)
+
+    u = np.arange(num_anchors, dtype=np.float64)
+    positions = np.stack((u % ANCHORS_PER_PRIM, np.sin(u * 0.1), u // ANCHORS_PER_PRIM), axis=1)
+    tangents = rng.uniform(-0.3, 0.3, (num_anchors, 3))
+
+    return pentool.dumps_controls({
+        "attrib_meta": [["__pr", attribute_type.PSCALE_AND_ROLL], ["width", attribute_type.FLOAT_LADDER],
+                        ["id", attribute_type.INTEGER_LADDER], ["dir", attribute_type.VECTOR_ARBITRARY]],
+        "controls": np.stack((positions - tangents, positions, positions + tangents), axis=1),
+        "flags": rng.integers(0, 3, num_anchors),
+        "tags": ["tag" if i % 50 == 0 else "" for i in range(num_anchors)],
+        "attribs": {
+            "__pr": np.column_stack((rng.uniform(0.5, 1.5, num_anchors), rng.uniform(-90, 90, num_anchors))),
+            "width": rng.random(num_anchors),
+            "id": rng.integers(0, 10, num_anchors),
+            "dir": rng.normal(size=(num_anchors, 3)),
+        },
+        "prims": [[start, min(start + ANCHORS_PER_PRIM, num_anchors), False, "curve{}".format(start // ANCHORS_PER_PRIM)]
+                  for start in range(0, num_anchors, ANCHORS_PER_PRIM)],
+        "selection": [],
+    })
+
+
+def make_editor(pentool, hou, headless):
+    node = headless.Node({
+        "controls": "", "current_attribute": "None", "num_attributes": 0, "drawing_mode": 0,
+        "use_curve_guide": 0, "use_arrow_heads": 0, "update_geo_on_edit": 1, "handles_snapping": 1,
+        "controls_size": 10, "text_size": 3, "names_size": 3, "guides_thickness": 1.0, "close": 0,
+    })
+    editor = pentool.BezierEditor(hou.SceneViewer())
+    editor.attach_node(node, BenchState(hou))
+    return editor
+
+
+def select_anchors(editor, anchor_indices):
+    editor.point_controls.clear_selection()
+    for anchor_index in anchor_indices:
+        control = editor.anchor_points_controls[editor.anchor_points[anchor_index]][2]
+        editor.point_controls.add_control_to_selection(control, update_geo=False)
+
+
+def append_anchors(editor, hou):
+    prim_index = len(editor.prims) - 1
+    for i in range(EDIT_CALLS):
+        last_anchor = editor.prims[prim_index][1] - 1
+        position = editor.anchor_points[last_anchor].position + hou.Vector3(1.0, 0.0, 0.0)
+        editor.begin_edit()
+        editor.append_anchor(position, last_anchor, True, prim_index)
+        editor.end_edit()
+
+
+def append_anchors_in_edit(editor, hou):
+    # runs inside one open edit, see EDIT_OPERATIONS
+    prim_index = len(editor.prims) - 1
+    for i in range(EDIT_CALLS):
+        last_anchor = editor.prims[prim_index][1] - 1
+        position = editor.anchor_points[last_anchor].position + hou.Vector3(1.0, 0.0, 0.0)
+        editor.append_anchor(position, last_anchor, True, prim_index)
+
+
+def insert_anchors(editor, hou):
+    # insert_anchor samples the curve from the node output
+    editor.node.node("curve_geo")._geo = editor.curve_geo
+    for i in range(EDIT_CALLS):
+        editor.begin_edit()
+        editor.insert_anchor(0.5, 0)
+        editor.end_edit()
+
+
+def straighten_anchors(editor, hou):
+    select_anchors(editor, range(1, EDIT_CALLS + 1))
+    editor.straighten_anchors()
+
+
+def remove_selected_anchors(editor, hou):
+    select_anchors(editor, range(1, EDIT_CALLS + 1))
+    editor.remove_selected_anchors()
+
+
+def interpolate_anchors_attributes(editor, hou):
+    editor.interpolate_anchors_attributes(range(len(editor.anchor_points)))
+
+
+# name, calls per run, function
+OPERATIONS = [
+    ("writes", 1, lambda editor, hou: editor.writes()),
+    ("rebuild_geo", 1, lambda editor, hou: editor.rebuild_geo()),
+    ("interpolate_anchors_attributes", 1, interpolate_anchors_attributes),
+    ("append_anchor", EDIT_CALLS, append_anchors),
+    ("append_anchor_in_edit", EDIT_CALLS, append_anchors_in_edit),
+    ("insert_anchor", EDIT_CALLS, insert_anchors),
+    ("straighten_anchors", 1, straighten_anchors),
+    ("remove_selected_anchors", 1, remove_selected_anchors),
+]
+
+
+# measured between begin_edit and end_edit with export only on release, so the stash copy
+# and the controls parm write (both linear in scene size) stay out of the timing
+EDIT_OPERATIONS = {"append_anchor_in_edit"}
+
+# per call cost of these must not grow with the anchor count
+FLAT_OPERATIONS = ("append_anchor_in_edit",)
+
+
+def measure_in_edit(editor, function, repeat, calls):
+    export_rate = editor.export_throttle.rate
+    editor.export_throttle.rate = -1
+    editor.begin_edit()
+    try:
+        return measure(function, repeat, calls)
+    finally:
+        editor.end_edit()
+        editor.export_throttle.rate = export_rate
+
+
+def measure(function, repeat, calls):
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000.0 / calls)
+    return timings
+
+
+def result(op, num_anchors, calls, timings):
+    return {
+        "op": op,
+        "anchors": num_anchors,
+        "calls": calls,
+        "repeat": len(timings),
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.mean(timings),
+    }
+
+
+def run(sizes, repeat, operations, use_stub):
+    with hou_backend(use_stub) as (hou, headless, backend):
+        return run_backend(hou, headless, backend, sizes, repeat, operations)
+
+
+def run_backend(hou, headless, backend, sizes, repeat, operations):
+    pentool = load_pentool()
+    np = pentool.np
+
+    results = []
+    for num_anchors in sizes:
+        controls = make_controls(pentool, np, num_anchors)
+
+        editors = []
+        def reads():
+            editor = make_editor(pentool, hou, headless)
+            editor.reads(controls)
+            editors.append(editor)
+
+        if "reads" in operations:
+            results.append(result("reads", num_anchors, 1, measure(reads, repeat, 1)))
+            editor = editors[-1]
+        else:
+            reads()
+            editor = editors[-1]
+
+        # edits run one after another on the same editor, each changes only EDIT_CALLS anchors
+        for op, calls, function in OPERATIONS:
+            if op not in operations:
+                continue
+            if op in EDIT_OPERATIONS:
+                timings = measure_in_edit(editor, lambda: function(editor, hou), repeat, calls)
+            else:
+                timings = measure(lambda: function(editor, hou), repeat, calls)
+            results.append(result(op, num_anchors, calls, timings))
+
+        for item in results[-len(operations):]:
+            print("{backend:>8} {anchors:>7} {op:<32} min {min_ms:10.3f} ms  median {median_ms:10.3f} ms".format(backend=backend, **item))
+
+    return {
+        "backend": backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def find_regressions(report, baseline, tolerance):
+    if baseline["backend"] != report["backend"]:
+        print("Baseline backend {} doesn't match {}, skipping comparison".format(baseline["backend"], report["backend"]))
+        return []
+
+    baseline_times = {(item["op"], item["anchors"]): item["median_ms"] for item in baseline["results"]}
+    regressions = []
+    for item in report["results"]:
+        baseline_time = baseline_times.get((item["op"], item["anchors"]))
+        if baseline_time is not None and item["median_ms"] > baseline_time * tolerance:
+            regressions.append((item["op"], item["anchors"], baseline_time, item["median_ms"]))
+    return regressions
+
+
+def find_growth(report, max_growth):
+    growth = []
+    for op in FLAT_OPERATIONS:
+        items = sorted((item for item in report["results"] if item["op"] == op), key=lambda item: item["anchors"])
+        if len(items) < 2:
+            continue
+        smallest, largest = items[0], items[-1]
+        if largest["median_ms"] > smallest["median_ms"] * max_growth:
+            growth.append((op, smallest, largest))
+    return growth
+
+
+def main():
+    all_operations = ["reads"] + [op for op, calls, function in OPERATIONS]
+
+    parser = argparse.ArgumentParser(description="Pen tool editor benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="comma separated anchor counts")
+    parser.add_argument("--ops", default=",".join(all_operations), help="comma separated operations to run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stub", action="store_true", help="use the hou stand-in even if hou is importable")
+    parser.add_argument("--output", help="write results as json")
+    parser.add_argument("--baseline", help="json results to compare the medians with")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor against the baseline")
+    parser.add_argument("--max-growth", type=float, default=3.0,
+                        help="allowed per call slowdown of {} from the smallest to the largest size".format(", ".join(FLAT_OPERATIONS)))
+    args = parser.parse_args()
+
+    operations = [op for op in args.ops.split(",") if op]
+    unknown = set(operations) - set(all_operations)
+    if unknown:
+        parser.error("unknown operations: " + ", ".join(sorted(unknown)))
+
+    report = run([int(size) for size in args.sizes.split(",")], args.repeat, operations, args.stub)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    failed = False
+    for op, smallest, largest in find_growth(report, args.max_growth):
+        print("NOT FLAT {}: {:.3f} ms @ {} anchors -> {:.3f} ms @ {} anchors".format(
+            op, smallest["median_ms"], smallest["anchors"], largest["median_ms"], largest["anchors"]))
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(report, json.load(baseline_file), args.tolerance)
+        for op, num_anchors, baseline_time, median_time in regressions:
+            print("REGRESSION {} @ {} anchors: {:.3f} ms -> {:.3f} ms".format(op, num_anchors, baseline_time, median_time))
+        failed = failed or bool(regressions)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Equivalence checks of the pen tool editor on random curves and edit sequences.
+
+    python benchmarks/check_pentool.py --seeds 20
+    hython benchmarks/check_pentool.py --output hython.json
+    python benchmarks/check_pentool.py --reference hython.json
+
+Every case compares two paths that must give the same result:
+
+    packed       loads_controls(dumps_controls(data)) returns data, json controls load to the same data
+    parallel     rebuild_geo_from_json with workers builds the same geometry as the serial build
+    incremental  after each random edit the editor's curve geo matches a full build from the saved controls
+
+Geometry is compared with its prim and point numbers, anything downstream reading primnum or ptnum
+must see the same curve the same way. With --output the geometry of
+every case is written as json and --reference compares a run with it. Record the reference under
+hython and compare stub runs with it to check houstub against Houdini.
+"""
+
+import argparse
+import json
+import random
+import sys
+
+from bench_pentool import hou_backend, load_pentool, make_controls, make_editor, select_anchors
+
+TOLERANCE = 1e-4
+
+
+def geo_signature(geo):
+    """ Prims in prim order as name, closed flag, point numbers and point attribute values of their vertices """
+    columns = {}
+    for attrib in geo.pointAttribs():
+        name = attrib.name()
+        data_type = attrib.dataType().name()
+        if data_type == "String":
+            values = list(geo.pointStringAttribValues(name))
+        elif data_type == "Int":
+            values = list(geo.pointIntAttribValues(name))
+        else:
+            values = [round(value, 5) for value in geo.pointFloatAttribValues(name)]
+        size = attrib.size()
+        columns[name] = values if size == 1 else [values[i:i + size] for i in range(0, len(values), size)]
+
+    prims = []
+    for prim in geo.prims():
+        point_numbers = [vertex.point().number() for vertex in prim.vertices()]
+        prims.append({
+            "name": prim.attribValue("name"),
+            "closed": prim.isClosed(),
+            "point_numbers": point_numbers,
+            "points": {name: [values[number] for number in point_numbers] for name, values in sorted(columns.items())},
+        })
+
+    return prims
+
+
+def same(a, b, tolerance=TOLERANCE):
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b) <= tolerance * max(1.0, abs(a))
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y, tolerance) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(same(a[key], b[key], tolerance) for key in a)
+    return a == b
+
+
+def normalized_data(data):
+    return {
+        "attrib_meta": [list(attrib) for attrib in data["attrib_meta"]],
+        "controls": data["controls"].tolist(),
+        "flags": data["flags"].tolist(),
+        "tags": list(data["tags"]),
+        "attribs": {name: values.tolist() for name, values in data["attribs"].items()},
+        "prims": [list(prim) for prim in data["prims"]],
+        "selection": list(data["selection"]),
+    }
+
+
+def legacy_json(data):
+    """ Controls in the json format written before the packed one """
+    data = normalized_data(data)
+    anchors = [{"controls": controls, "flag": flag, "tag": tag,
+                "attribs": {name: values[index] for name, values in data["attribs"].items()}}
+               for index, (controls, flag, tag) in enumerate(zip(data["controls"], data["flags"], data["tags"]))]
+    return json.dumps({"attrib_meta": data["attrib_meta"], "anchors": anchors, "prims": data["prims"], "selection": data["selection"]})
+
+
+def check_packed(pentool, controls):
+    data = pentool.loads_controls(controls)
+    if pentool.dumps_controls(data) != controls:
+        return "dumps(loads(controls)) changed the controls"
+    if not same(normalized_data(pentool.loads_controls(legacy_json(data))), normalized_data(data), 0.0):
+        return "json controls load differently"
+
+
+def check_parallel(pentool, controls, workers):
+    data = pentool.loads_controls(controls)
+    serial = geo_signature(pentool.rebuild_geo_from_json(data))
+    if not same(geo_signature(pentool.rebuild_geo_from_json(data, workers)), serial, 0.0):
+        return "{} workers build different geometry".format(workers)
+    return serial
+
+
+def random_edit(editor, hou, rng):
+    """ Applies one random edit in its own edit transaction, returns its name """
+    prims = editor.prims
+    prim_index = rng.randrange(len(prims))
+    start, end, closed, _ = prims[prim_index]
+    anchor_index = rng.randrange(start, end)
+    anchor = editor.anchor_points[anchor_index]
+    edit = rng.choice(("append", "insert", "move", "attrib", "remove", "straighten", "close", "reverse"))
+
+    if edit == "append" and not closed:
+        editor.begin_edit()
+        editor.append_anchor(editor.anchor_points[end - 1].position + hou.Vector3(rng.random(), rng.random(), 0.0), end - 1, True, prim_index)
+        editor.end_edit()
+    elif edit == "insert" and end - start > 1 and prim_index in editor.geo_prims:
+        editor.node.node("curve_geo")._geo = editor.curve_geo
+        editor.begin_edit()
+        editor.insert_anchor(rng.random(), editor.geo_prims.index(prim_index))
+        editor.end_edit()
+    elif edit == "move":
+        editor.begin_edit()
+        editor.update_anchor_position(anchor, anchor.position + hou.Vector3(rng.uniform(-1, 1), rng.uniform(-1, 1), 0.0))
+        editor.end_edit()
+    elif edit == "attrib":
+        editor.begin_edit()
+        anchor.attributes["width"] = rng.random()
+        editor.update_anchor_geo_attribs(anchor)
+        editor.end_edit()
+    elif edit == "remove" and end - start > 2:
+        select_anchors(editor, [anchor_index])
+        editor.remove_selected_anchors()
+    elif edit == "straighten" and end - start > 2:
+        select_anchors(editor, range(anchor_index, min(anchor_index + 3, end)))
+        editor.straighten_anchors()
+    elif edit == "close" and end - start > 2:
+        editor.begin_edit()
+        editor.close_prim(prim_index, not closed)
+        editor.end_edit()
+    elif edit == "reverse":
+        editor.begin_edit()
+        editor.reverse_prim(prim_index)
+        editor.end_edit()
+    else:
+        return None
+
+    return edit
+
+
+def check_incremental(pentool, hou, headless, controls, rng, num_edits):
+    editor = make_editor(pentool, hou, headless)
+    editor.reads(controls)
+
+    for step in range(num_edits):
+        edit = random_edit(editor, hou, rng)
+        if edit is None:
+            continue
+        saved = pentool.loads_controls(editor.controls_parm.evalAsString())
+        if not same(geo_signature(editor.curve_geo), geo_signature(pentool.rebuild_geo_from_json(saved)), 0.0):
+            return "edit {} ({}) left the curve geo different from a full build".format(step, edit)
+
+
+def run(seeds, num_anchors, num_edits, workers, use_stub):
+    failures = []
+    signatures = {}
+
+    with hou_backend(use_stub) as (hou, headless, backend):
+        pentool = load_pentool()
+        np = pentool.np
+
+        for seed in range(seeds):
+            controls = make_controls(pentool, np, num_anchors + seed)
+            num_failures = len(failures)
+
+            for name, result in (("packed", check_packed(pentool, controls)),
+                                 ("parallel", check_parallel(pentool, controls, workers)),
+                                 ("incremental", check_incremental(pentool, hou, headless, controls, random.Random(seed), num_edits))):
+                if isinstance(result, str):
+                    failures.append("seed {} {}: {}".format(seed, name, result))
+                elif result is not None:
+                    signatures[str(seed)] = result
+
+            print("{:>8} seed {:>3} {}".format(backend, seed, "ok" if len(failures) == num_failures else "FAIL"))
+
+    return backend, failures, signatures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pen tool editor equivalence checks")
+    parser.add_argument("--seeds", type=int, default=10, help="number of random curves")
+    parser.add_argument("--anchors", type=int, default=250, help="anchors of the first curve, each seed adds one")
+    parser.add_argument("--edits", type=int, default=30, help="random edits per curve")
+    parser.add_argument("--workers", type=int, default=4, help="workers of the parallel build")
+    parser.add_argument("--stub", action="store_true", help="use the hou stand-in even if hou is importable")
+    parser.add_argument("--output", help="write the built geometry of every seed as json")
+    parser.add_argument("--reference", help="json geometry of a previous run to compare with")
+    args = parser.parse_args()
+
+    backend, failures, signatures = run(args.seeds, args.anchors, args.edits, args.workers, args.stub)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"backend": backend, "anchors": args.anchors, "signatures": signatures}, output_file)
+
+    if args.reference:
+        with open(args.reference) as reference_file:
+            reference = json.load(reference_file)
+        if reference["anchors"] != args.anchors:
+            failures.append("reference was recorded with --anchors {}".format(reference["anchors"]))
+        for seed, signature in sorted(reference["signatures"].items(), key=lambda item: int(item[0])):
+            if seed in signatures and not same(signatures[seed], signature):
+                failures.append("seed {} geometry differs from the {} reference".format(seed, reference["backend"]))
+
+    for failure in failures:
+        print("FAIL " + failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
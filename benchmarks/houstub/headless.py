@@ -0,0 +1,263 @@
+"""UI side of the hou stand-in: scene viewer, drawables, handles and a parm-only node.
+
+Used with the pure-Python stub and, under hython, on top of the real hou module
+where these objects need a running viewer.
+"""
+
+import hou
+
+__all__ = ["GeometryDrawable", "TextDrawable", "GadgetDrawable", "Handle", "ViewerStateDragger",
+           "GeometryViewport", "ConstructionPlane", "SceneViewer", "Parm", "ParmTuple", "Node", "SopNode"]
+
+# classes that need a live viewer in hython
+VIEWER_CLASSES = ["GeometryDrawable", "TextDrawable", "GadgetDrawable", "Handle", "ViewerStateDragger", "SceneViewer"]
+
+
+class _Drawable(object):
+
+    def __init__(self, scene_viewer=None, *args, **kwargs):
+        self.params = {}
+        self.geo = None
+        self.visible = False
+        self.draw_count = 0
+
+    def setParams(self, params):
+        self.params.update(params)
+
+    def setGeometry(self, geo):
+        self.geo = geo
+
+    def geometry(self):
+        return self.geo
+
+    def show(self, visible):
+        self.visible = visible
+
+    def draw(self, handle, params=None):
+        self.draw_count += 1
+
+
+class GeometryDrawable(_Drawable):
+    pass
+
+
+class TextDrawable(_Drawable):
+    pass
+
+
+class GadgetDrawable(_Drawable):
+    pass
+
+
+class Handle(object):
+
+    def __init__(self, scene_viewer, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def show(self, visible):
+        pass
+
+    def update(self, immediate=False):
+        pass
+
+    def disableParms(self, parms):
+        pass
+
+
+class ViewerStateDragger(object):
+
+    def __init__(self, name):
+        pass
+
+
+class GeometryViewport(object):
+
+    def __init__(self, width=1920, height=1080):
+        self._size = (0, 0, width, height)
+        self._view = hou.Matrix4(1) * hou.hmath.buildTranslate(0, 0, 10)
+        self._proj_scale = 100.0
+
+    def size(self):
+        return self._size
+
+    def name(self):
+        return "persp1"
+
+    def viewTransform(self):
+        return self._view
+
+    def modelToGeometryTransform(self):
+        return hou.Matrix4(1)
+
+    def cameraToModelTransform(self):
+        return self._view
+
+    def ndcToCameraTransform(self):
+        return hou.Matrix4(1)
+
+    def viewportToNDCTransform(self):
+        w, h = self._size[2], self._size[3]
+        s = 1.0 / self._proj_scale
+        return hou.Matrix4([[s, 0, 0, 0], [0, s, 0, 0], [0, 0, 1, 0], [-w * 0.5 * s, -h * 0.5 * s, 0, 1]])
+
+    def windowToViewportTransform(self):
+        return hou.Matrix4(1)
+
+    def mapToScreen(self, position):
+        proj = self.viewportToNDCTransform() * self.ndcToCameraTransform() * self.cameraToModelTransform()
+        p = hou.Vector4(position[0], position[1], position[2], 1.0) * proj.inverted()
+        return hou.Vector2(p[0] / p[3], p[1] / p[3])
+
+    def mapToWorld(self, x, y):
+        proj = self.viewportToNDCTransform() * self.ndcToCameraTransform() * self.cameraToModelTransform()
+        origin = hou.Vector4(x, y, 0.0, 1.0) * proj
+        return (hou.Vector3(0, 0, -1), hou.Vector3(origin[0], origin[1], origin[2]))
+
+    def draw(self):
+        pass
+
+
+class ConstructionPlane(object):
+
+    def isVisible(self):
+        return False
+
+    def transform(self):
+        return hou.Matrix4(1)
+
+
+class SceneViewer(object):
+
+    def __init__(self):
+        self._viewport = GeometryViewport()
+        self.undo_depth = 0
+
+    def curViewport(self):
+        return self._viewport
+
+    def constructionPlane(self):
+        return ConstructionPlane()
+
+    def referencePlane(self):
+        return None
+
+    def beginStateUndo(self, label):
+        self.undo_depth += 1
+
+    def endStateUndo(self):
+        self.undo_depth -= 1
+
+    def flashMessage(self, *args):
+        pass
+
+    def setPromptMessage(self, *args):
+        pass
+
+    def snappingMode(self):
+        return hou.snappingMode.Off
+
+
+class Parm(object):
+
+    def __init__(self, name, value=None):
+        self._name = name
+        self._value = value
+        self.set_count = 0
+
+    def name(self):
+        return self._name
+
+    def eval(self):
+        return self._value
+
+    def evalAsString(self):
+        return "" if self._value is None else self._value
+
+    def evalAsInt(self):
+        return int(self._value or 0)
+
+    def evalAsGeometry(self):
+        return self._value
+
+    def set(self, value):
+        self.set_count += 1
+        if isinstance(value, hou.Geometry):
+            value = value.freeze()
+        self._value = value
+
+    def hide(self, hidden):
+        pass
+
+
+class ParmTuple(object):
+
+    def __init__(self, name, value):
+        self._name = name
+        self._value = tuple(value)
+
+    def name(self):
+        return self._name
+
+    def eval(self):
+        return self._value
+
+    def set(self, value):
+        self._value = tuple(value)
+
+    def hide(self, hidden):
+        pass
+
+
+class _SopNode(object):
+
+    def __init__(self, geometry=None):
+        self._geo = geometry or hou.Geometry()
+
+    def geometry(self):
+        return self._geo
+
+    def cookCount(self):
+        return 1
+
+
+class Node(object):
+
+    def __init__(self, parms=None):
+        self._parms = {}
+        self._tuples = {}
+        self._children = {}
+        for name, value in (parms or {}).items():
+            self._parms[name] = Parm(name, value)
+
+    def parm(self, name):
+        if name not in self._parms:
+            self._parms[name] = Parm(name, 0)
+        return self._parms[name]
+
+    def parmTuple(self, name):
+        if name not in self._tuples:
+            self._tuples[name] = ParmTuple(name, (0.0, 0.0, 0.0))
+        return self._tuples[name]
+
+    def node(self, name):
+        if name not in self._children:
+            self._children[name] = _SopNode()
+        return self._children[name]
+
+    def inputConnections(self):
+        return []
+
+    def input(self, index):
+        return None
+
+    def removeSpareParms(self):
+        pass
+
+    def isDisplayFlagSet(self):
+        return True
+
+
+SopNode = Node
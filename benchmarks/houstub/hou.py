@@ -0,0 +1,991 @@
+"""Minimal pure-Python stand-in for the parts of hou used by the pen tool benchmarks"""
+
+import math
+from contextlib import contextmanager
+
+
+def _seq(args):
+    if len(args) == 1 and hasattr(args[0], "__len__"):
+        return [float(v) for v in args[0]]
+    return [float(v) for v in args]
+
+
+class _VectorBase(object):
+    SIZE = 3
+
+    def __init__(self, *args):
+        if not args:
+            self._v = [0.0] * self.SIZE
+        else:
+            values = _seq(args)
+            if len(values) != self.SIZE:
+                raise TypeError("wrong vector size")
+            self._v = values
+
+    def __getitem__(self, i):
+        return self._v[i]
+
+    def __setitem__(self, i, value):
+        self._v[i] = float(value)
+
+    def __len__(self):
+        return self.SIZE
+
+    def __iter__(self):
+        return iter(self._v)
+
+    def __eq__(self, other):
+        return isinstance(other, _VectorBase) and self._v == other._v
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return "<{} {}>".format(type(self).__name__, tuple(self._v))
+
+    def x(self):
+        return self._v[0]
+
+    def y(self):
+        return self._v[1]
+
+    def z(self):
+        return self._v[2]
+
+    def w(self):
+        return self._v[3]
+
+    def __add__(self, o):
+        return type(self)([a + b for a, b in zip(self._v, o)])
+
+    def __sub__(self, o):
+        return type(self)([a - b for a, b in zip(self._v, o)])
+
+    def __neg__(self):
+        return type(self)([-a for a in self._v])
+
+    def __mul__(self, o):
+        if isinstance(o, (Matrix4, Matrix3)):
+            return o._transform(self)
+        return type(self)([a * o for a in self._v])
+
+    def __rmul__(self, o):
+        return type(self)([a * o for a in self._v])
+
+    def __truediv__(self, o):
+        return type(self)([a / o for a in self._v])
+
+    __div__ = __truediv__
+
+    def dot(self, o):
+        return sum(a * b for a, b in zip(self._v, o))
+
+    def lengthSquared(self):
+        return self.dot(self)
+
+    def length(self):
+        return math.sqrt(self.lengthSquared())
+
+    def normalized(self):
+        length = self.length()
+        if length == 0.0:
+            return type(self)(self._v)
+        return type(self)([a / length for a in self._v])
+
+    def isAlmostEqual(self, o, tolerance=0.00001):
+        return all(abs(a - b) <= tolerance for a, b in zip(self._v, o))
+
+
+class Vector2(_VectorBase):
+    SIZE = 2
+
+
+class Vector3(_VectorBase):
+    SIZE = 3
+
+    def cross(self, o):
+        a, b = self._v, list(o)
+        return Vector3(a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+class Vector4(_VectorBase):
+    SIZE = 4
+
+
+def _matmul(a, b, n):
+    return [[sum(a[i][k] * b[k][j] for k in range(n)) for j in range(n)] for i in range(n)]
+
+
+def _invert(m, n):
+    a = [list(row) + [1.0 if i == j else 0.0 for j in range(n)] for i, row in enumerate(m)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-300:
+            raise ZeroDivisionError("singular matrix")
+        a[col], a[pivot] = a[pivot], a[col]
+        p = a[col][col]
+        a[col] = [v / p for v in a[col]]
+        for r in range(n):
+            if r != col:
+                f = a[r][col]
+                if f:
+                    a[r] = [v - f * w for v, w in zip(a[r], a[col])]
+    return [row[n:] for row in a]
+
+
+class _MatrixBase(object):
+    N = 4
+
+    def __init__(self, values=None):
+        n = self.N
+        if values is None:
+            self._m = [[0.0] * n for _ in range(n)]
+        elif isinstance(values, (int, float)):
+            self._m = [[float(values) if i == j else 0.0 for j in range(n)] for i in range(n)]
+        else:
+            values = list(values)
+            if len(values) == n and hasattr(values[0], "__len__"):
+                self._m = [[float(v) for v in row] for row in values]
+            else:
+                self._m = [[float(values[i * n + j]) for j in range(n)] for i in range(n)]
+
+    def __mul__(self, o):
+        if isinstance(o, _MatrixBase):
+            return type(self)(_matmul(self._m, o._m, self.N))
+        return type(self)([[v * o for v in row] for row in self._m])
+
+    def inverted(self):
+        return type(self)(_invert(self._m, self.N))
+
+    def transposed(self):
+        return type(self)([list(r) for r in zip(*self._m)])
+
+    def asTuple(self):
+        return tuple(v for row in self._m for v in row)
+
+    def asTupleOfTuples(self):
+        return tuple(tuple(row) for row in self._m)
+
+    def at(self, i, j):
+        return self._m[i][j]
+
+    def __eq__(self, o):
+        return isinstance(o, _MatrixBase) and self._m == o._m
+
+    __hash__ = object.__hash__
+
+    def extractRotates(self, transform_order="srt", rotate_order="xyz", pivot=None, pivot_rotate=None):
+        m = self._m
+        y = math.asin(max(-1.0, min(1.0, -m[0][2])))
+        x = math.atan2(m[1][2], m[2][2])
+        z = math.atan2(m[0][1], m[0][0])
+        return Vector3(math.degrees(x), math.degrees(y), math.degrees(z))
+
+
+class Matrix3(_MatrixBase):
+    N = 3
+
+    def _transform(self, v):
+        r = [sum(v[k] * self._m[k][j] for k in range(3)) for j in range(3)]
+        return Vector3(r)
+
+
+class Matrix4(_MatrixBase):
+    N = 4
+
+    def _transform(self, v):
+        if isinstance(v, Vector4):
+            r = [sum(v[k] * self._m[k][j] for k in range(4)) for j in range(4)]
+            return Vector4(r)
+        vv = list(v) + [1.0]
+        r = [sum(vv[k] * self._m[k][j] for k in range(4)) for j in range(4)]
+        if r[3] not in (0.0, 1.0):
+            return Vector3(r[0] / r[3], r[1] / r[3], r[2] / r[3])
+        return Vector3(r[:3])
+
+    def extractRotationMatrix3(self):
+        return Matrix3([row[:3] for row in self._m[:3]])
+
+
+def _rx(a):
+    c, s = math.cos(a), math.sin(a)
+    return [[1, 0, 0, 0], [0, c, s, 0], [0, -s, c, 0], [0, 0, 0, 1]]
+
+
+def _ry(a):
+    c, s = math.cos(a), math.sin(a)
+    return [[c, 0, -s, 0], [0, 1, 0, 0], [s, 0, c, 0], [0, 0, 0, 1]]
+
+
+def _rz(a):
+    c, s = math.cos(a), math.sin(a)
+    return [[c, s, 0, 0], [-s, c, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]
+
+
+class _hmath(object):
+
+    @staticmethod
+    def identityTransform():
+        return Matrix4(1)
+
+    @staticmethod
+    def buildScale(*args):
+        s = _seq(args)
+        if len(s) == 1:
+            s = s * 3
+        return Matrix4([[s[0], 0, 0, 0], [0, s[1], 0, 0], [0, 0, s[2], 0], [0, 0, 0, 1]])
+
+    @staticmethod
+    def buildTranslate(*args):
+        t = _seq(args)
+        return Matrix4([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [t[0], t[1], t[2], 1]])
+
+    @staticmethod
+    def buildRotate(*args):
+        r = [math.radians(v) for v in _seq(args[:3] if len(args) >= 3 else args[:1])]
+        return Matrix4(_rx(r[0])) * Matrix4(_ry(r[1])) * Matrix4(_rz(r[2]))
+
+    @staticmethod
+    def buildRotateAboutAxis(axis, angle_in_deg):
+        q = Quaternion(angle_in_deg, axis)
+        return Matrix4(q._matrix4())
+
+    @staticmethod
+    def buildRotateZToAxis(axis):
+        q = Quaternion()
+        q.setToVectors(Vector3(0, 0, 1), Vector3(axis))
+        return Matrix4(q._matrix4())
+
+    @staticmethod
+    def intersectPlane(plane_point, plane_normal, line_origin, line_dir):
+        denom = Vector3(plane_normal).dot(line_dir)
+        if abs(denom) < 1e-12:
+            raise TypeError("no intersection")
+        t = (Vector3(plane_point) - Vector3(line_origin)).dot(plane_normal) / denom
+        return Vector3(line_origin) + Vector3(line_dir) * t
+
+
+hmath = _hmath()
+
+
+class Quaternion(object):
+
+    def __init__(self, *args):
+        self._q = [0.0, 0.0, 0.0, 1.0]
+        if len(args) == 2:
+            angle, axis = args
+            axis = Vector3(axis).normalized()
+            h = math.radians(angle) * 0.5
+            s = math.sin(h)
+            self._q = [axis[0] * s, axis[1] * s, axis[2] * s, math.cos(h)]
+        elif len(args) == 1:
+            self._q = [float(v) for v in args[0]]
+        elif len(args) == 4:
+            self._q = [float(v) for v in args]
+
+    def __getitem__(self, i):
+        return self._q[i]
+
+    def setToVectors(self, v1, v2):
+        a = Vector3(v1).normalized()
+        b = Vector3(v2).normalized()
+        d = max(-1.0, min(1.0, a.dot(b)))
+        if d > 1.0 - 1e-12:
+            self._q = [0.0, 0.0, 0.0, 1.0]
+            return
+        axis = a.cross(b)
+        if axis.length() < 1e-12:
+            axis = a.cross(Vector3(1, 0, 0))
+            if axis.length() < 1e-6:
+                axis = a.cross(Vector3(0, 1, 0))
+        axis = axis.normalized()
+        h = math.acos(d) * 0.5
+        s = math.sin(h)
+        self._q = [axis[0] * s, axis[1] * s, axis[2] * s, math.cos(h)]
+
+    def _mul(self, o):
+        x1, y1, z1, w1 = self._q
+        x2, y2, z2, w2 = o._q
+        return Quaternion((
+            w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+            w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+            w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+            w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2))
+
+    def slerp(self, other, fraction):
+        a = self._q
+        b = list(other._q)
+        d = sum(x * y for x, y in zip(a, b))
+        if d < 0.0:
+            b = [-v for v in b]
+            d = -d
+        if d > 0.9995:
+            r = [x + (y - x) * fraction for x, y in zip(a, b)]
+        else:
+            theta = math.acos(d)
+            s = math.sin(theta)
+            wa = math.sin((1.0 - fraction) * theta) / s
+            wb = math.sin(fraction * theta) / s
+            r = [x * wa + y * wb for x, y in zip(a, b)]
+        n = math.sqrt(sum(v * v for v in r))
+        return Quaternion([v / n for v in r])
+
+    def _matrix3(self):
+        x, y, z, w = self._q
+        # row-vector convention (v * M)
+        return [
+            [1 - 2 * (y * y + z * z), 2 * (x * y + z * w), 2 * (x * z - y * w)],
+            [2 * (x * y - z * w), 1 - 2 * (x * x + z * z), 2 * (y * z + x * w)],
+            [2 * (x * z + y * w), 2 * (y * z - x * w), 1 - 2 * (x * x + y * y)]]
+
+    def _matrix4(self):
+        m = self._matrix3()
+        return [m[0] + [0.0], m[1] + [0.0], m[2] + [0.0], [0.0, 0.0, 0.0, 1.0]]
+
+    def extractRotationMatrix3(self):
+        return Matrix3(self._matrix3())
+
+    def rotate(self, v):
+        return Matrix3(self._matrix3())._transform(Vector3(v))
+
+    def setToEulerRotates(self, angles, rotate_order="xyz"):
+        m = _hmath.buildRotate(*list(angles))._m
+        self._from_matrix([row[:3] for row in m[:3]])
+
+    def _from_matrix(self, m):
+        # m is row-vector; use column form c = m^T
+        c = [[m[j][i] for j in range(3)] for i in range(3)]
+        tr = c[0][0] + c[1][1] + c[2][2]
+        if tr > 0:
+            s = math.sqrt(tr + 1.0) * 2
+            w = 0.25 * s
+            x = (c[2][1] - c[1][2]) / s
+            y = (c[0][2] - c[2][0]) / s
+            z = (c[1][0] - c[0][1]) / s
+        elif c[0][0] > c[1][1] and c[0][0] > c[2][2]:
+            s = math.sqrt(1.0 + c[0][0] - c[1][1] - c[2][2]) * 2
+            w = (c[2][1] - c[1][2]) / s
+            x = 0.25 * s
+            y = (c[0][1] + c[1][0]) / s
+            z = (c[0][2] + c[2][0]) / s
+        elif c[1][1] > c[2][2]:
+            s = math.sqrt(1.0 + c[1][1] - c[0][0] - c[2][2]) * 2
+            w = (c[0][2] - c[2][0]) / s
+            x = (c[0][1] + c[1][0]) / s
+            y = 0.25 * s
+            z = (c[1][2] + c[2][1]) / s
+        else:
+            s = math.sqrt(1.0 + c[2][2] - c[0][0] - c[1][1]) * 2
+            w = (c[1][0] - c[0][1]) / s
+            x = (c[0][2] + c[2][0]) / s
+            y = (c[1][2] + c[2][1]) / s
+            z = 0.25 * s
+        self._q = [x, y, z, w]
+
+    def extractEulerRotates(self, rotate_order="xyz"):
+        return Matrix3(self._matrix3()).extractRotates()
+
+
+class BoundingBox(object):
+
+    def __init__(self, mn, mx):
+        self._min = Vector3(mn)
+        self._max = Vector3(mx)
+
+    def center(self):
+        return (self._min + self._max) * 0.5
+
+    def minvec(self):
+        return self._min
+
+    def maxvec(self):
+        return self._max
+
+
+class _Enum(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return self._name
+
+    def name(self):
+        return self._name.split(".")[-1]
+
+
+def _enum_namespace(name, members):
+    ns = type(name, (object,), {})
+    for m in members:
+        setattr(ns, m, _Enum(name + "." + m))
+    return ns
+
+
+attribType = _enum_namespace("attribType", ["Point", "Prim", "Vertex", "Global"])
+attribData = _enum_namespace("attribData", ["Float", "Int", "String", "Dict"])
+numericData = _enum_namespace("numericData", ["Float32", "Float64", "Int32", "Int64"])
+primType = _enum_namespace("primType", ["BezierCurve", "Polygon", "NURBSCurve"])
+drawableGeometryType = _enum_namespace("drawableGeometryType", ["Point", "Line", "Face", "Vector"])
+drawableGeometryPointStyle = _enum_namespace("drawableGeometryPointStyle", ["SmoothCircle", "RingsCircle", "RingsSquare", "SmoothSquare", "LinearCircle"])
+drawableHighlightMode = _enum_namespace("drawableHighlightMode", ["MatteOverGlow", "Glow", "Matte"])
+drawableTextOrigin = _enum_namespace("drawableTextOrigin", ["UpperLeft", "BottomRight", "BottomLeft", "LowerLeft"])
+uiEventReason = _enum_namespace("uiEventReason", ["Active", "Located", "Picked", "Changed", "Start", "NoReason"])
+snappingPriority = _enum_namespace("snappingPriority", ["GridPoint", "GeoPoint", "GeoPrim"])
+snappingMode = _enum_namespace("snappingMode", ["Off", "Point", "Prim", "Grid"])
+rampBasis = _enum_namespace("rampBasis", ["Linear", "CatmullRom", "Constant"])
+valueLadderDataType = _enum_namespace("valueLadderDataType", ["Float", "Int"])
+nodeEventType = _enum_namespace("nodeEventType", ["InputRewired", "ParmTupleChanged"])
+
+
+import array as _array
+
+
+def _f32(v):
+    return _array.array("f", [float(v)])[0]
+
+
+class Attrib(object):
+
+    def __init__(self, geo, attrib_type, name, default):
+        self._geo = geo
+        self._type = attrib_type
+        self._name = name
+        if isinstance(default, str):
+            self._data, self._size, self._default = attribData.String, 1, default
+        elif hasattr(default, "__len__"):
+            default = list(default)
+            self._size = len(default)
+            self._data = attribData.Int if all(isinstance(v, int) for v in default) else attribData.Float
+            self._default = default
+        else:
+            self._size = 1
+            self._data = attribData.Int if isinstance(default, int) and not isinstance(default, bool) else attribData.Float
+            self._default = default
+        self.data_id = 0
+
+    def name(self):
+        return self._name
+
+    def size(self):
+        return self._size
+
+    def dataType(self):
+        return self._data
+
+    def type(self):
+        return self._type
+
+    def defaultValue(self):
+        return self._default
+
+    def incrementDataId(self):
+        self.data_id += 1
+
+    def dataId(self):
+        return self.data_id
+
+    def destroy(self):
+        if self._type == attribType.Point:
+            self._geo.destroyPointAttrib(self._name)
+        elif self._type == attribType.Prim:
+            del self._geo._prim_attribs[self._name]
+            del self._geo._prim_values[self._name]
+        else:
+            del self._geo._global_attribs[self._name]
+            self._geo._global_values.pop(self._name, None)
+
+    def _coerce(self, value):
+        if self._size > 1:
+            value = list(value)
+            return tuple(int(v) for v in value) if self._data == attribData.Int else tuple(_f32(v) for v in value)
+        if self._data == attribData.Int:
+            return int(value)
+        if self._data == attribData.Float:
+            return _f32(value)
+        return str(value)
+
+
+class Point(object):
+
+    def __init__(self, geo, number):
+        self._geo = geo
+        self._num = number
+
+    def __eq__(self, o):
+        return isinstance(o, Point) and o._geo is self._geo and o._num == self._num
+
+    __hash__ = object.__hash__
+
+    def number(self):
+        return self._num
+
+    def position(self):
+        return Vector3(self._geo._P[self._num])
+
+    def setPosition(self, position):
+        self._geo._P[self._num] = [_f32(v) for v in Vector3(position)]
+
+    def attribValue(self, attrib):
+        name = attrib if isinstance(attrib, str) else attrib.name()
+        if name == "P":
+            return tuple(self._geo._P[self._num])
+        values = self._geo._point_values[name]
+        return values[self._num]
+
+    def setAttribValue(self, attrib, value):
+        name = attrib if isinstance(attrib, str) else attrib.name()
+        a = self._geo._point_attribs[name]
+        self._geo._point_values[name][self._num] = a._coerce(value)
+
+
+class Vertex(object):
+
+    def __init__(self, prim, point):
+        self._prim = prim
+        self._point = point
+
+    def point(self):
+        return self._point
+
+
+class Prim(object):
+
+    def __init__(self, geo, number, point_numbers, closed=False, prim_type=None):
+        self._geo = geo
+        self._num = number
+        self._pts = list(point_numbers)
+        self._closed = closed
+        self._type = prim_type or primType.BezierCurve
+
+    def number(self):
+        return self._num
+
+    def type(self):
+        return self._type
+
+    def isClosed(self):
+        return self._closed
+
+    def points(self):
+        return [Point(self._geo, p) for p in self._pts]
+
+    def vertices(self):
+        return [Vertex(self, Point(self._geo, p)) for p in self._pts]
+
+    def numVertices(self):
+        return len(self._pts)
+
+    def addVertex(self, point):
+        self._pts.append(point.number())
+        return Vertex(self, point)
+
+    def intrinsicNames(self):
+        return ["order"]
+
+    def intrinsicValue(self, name):
+        return 4
+
+    def attribValue(self, attrib):
+        name = attrib if isinstance(attrib, str) else attrib.name()
+        return self._geo._prim_values[name][self._num]
+
+    def stringAttribValue(self, attrib):
+        return self.attribValue(attrib)
+
+    def setAttribValue(self, attrib, value):
+        name = attrib if isinstance(attrib, str) else attrib.name()
+        a = self._geo._prim_attribs[name]
+        self._geo._prim_values[name][self._num] = a._coerce(value)
+
+    def boundingBox(self):
+        pts = [self._geo._P[p] for p in self._pts]
+        return BoundingBox([min(c) for c in zip(*pts)], [max(c) for c in zip(*pts)])
+
+    def positionAtInterior(self, u, v=0.0, w=0.0):
+        pts = [self._geo._P[p] for p in self._pts]
+        if self._closed:
+            pts = pts + [pts[0]]
+        segments = max(1, (len(pts) - 1) // 3)
+        f = min(max(u, 0.0), 1.0) * segments
+        seg = min(int(f), segments - 1)
+        t = f - seg
+        p0, p1, p2, p3 = [Vector3(pts[min(seg * 3 + k, len(pts) - 1)]) for k in range(4)]
+        mt = 1.0 - t
+        return p0 * (mt * mt * mt) + p1 * (3 * mt * mt * t) + p2 * (3 * mt * t * t) + p3 * (t * t * t)
+
+    def attribValueAtInterior(self, attrib, u, v=0.0, w=0.0):
+        return (0.0, 1.0, 0.0)
+
+
+Face = Prim
+PackedPrim = type("PackedPrim", (Prim,), {})
+
+
+class Geometry(object):
+
+    def __init__(self, src=None):
+        self._P = []
+        self._point_attribs = {}
+        self._point_values = {}
+        self._prim_attribs = {}
+        self._prim_values = {}
+        self._global_attribs = {}
+        self._global_values = {}
+        self._prims = []
+        self.data_id = 0
+        if src is not None:
+            self.copy(src)
+
+    def copy(self, src):
+        import copy as _copy
+        self._P = [list(p) for p in src._P]
+        self._point_attribs = {}
+        for name, a in src._point_attribs.items():
+            na = Attrib(self, a._type, name, a._default)
+            self._point_attribs[name] = na
+        self._point_values = {k: list(v) for k, v in src._point_values.items()}
+        self._prim_attribs = {}
+        for name, a in src._prim_attribs.items():
+            self._prim_attribs[name] = Attrib(self, a._type, name, a._default)
+        self._prim_values = {k: list(v) for k, v in src._prim_values.items()}
+        self._global_attribs = {name: Attrib(self, a._type, name, a._default) for name, a in src._global_attribs.items()}
+        self._global_values = dict(src._global_values)
+        self._prims = [Prim(self, p._num, p._pts, p._closed, p._type) for p in src._prims]
+
+    def freeze(self):
+        return Geometry(self)
+
+    # attributes
+
+    def addAttrib(self, attrib_type, name, default_value, transform_as_normal=False, create_local_variable=True):
+        attrib = Attrib(self, attrib_type, name, default_value)
+        if attrib_type == attribType.Point:
+            if name == "P":
+                return attrib
+            self._point_attribs[name] = attrib
+            self._point_values[name] = [attrib._coerce(default_value)] * len(self._P)
+        elif attrib_type == attribType.Prim:
+            self._prim_attribs[name] = attrib
+            self._prim_values[name] = [attrib._coerce(default_value)] * len(self._prims)
+        else:
+            self._global_attribs[name] = attrib
+            self._global_values[name] = default_value
+        return attrib
+
+    def findPointAttrib(self, name):
+        if name == "P":
+            return Attrib(self, attribType.Point, "P", (0.0, 0.0, 0.0))
+        return self._point_attribs.get(name)
+
+    def intrinsicValue(self, name):
+        if name == "pointcount":
+            return len(self._P)
+        if name == "primitivecount":
+            return len(self._prims)
+        raise KeyError(name)
+
+    def findPrimAttrib(self, name):
+        return self._prim_attribs.get(name)
+
+    def findVertexAttrib(self, name):
+        return None
+
+    def findGlobalAttrib(self, name):
+        return self._global_attribs.get(name)
+
+    def pointAttribs(self):
+        return [self.findPointAttrib("P")] + list(self._point_attribs.values())
+
+    def setGlobalAttribValue(self, name, value):
+        self._global_values[name] = value
+
+    def attribValue(self, name):
+        return self._global_values[name]
+
+    def destroyPointAttrib(self, name):
+        del self._point_attribs[name]
+        del self._point_values[name]
+
+    # points
+
+    def _add_points(self, count):
+        start = len(self._P)
+        self._P.extend([[0.0, 0.0, 0.0] for _ in range(count)])
+        for name, a in self._point_attribs.items():
+            self._point_values[name].extend([a._coerce(a._default)] * count)
+        return start
+
+    def createPoint(self):
+        return Point(self, self._add_points(1))
+
+    def createPoints(self, positions):
+        positions = list(positions)
+        start = self._add_points(len(positions))
+        for i, p in enumerate(positions):
+            self._P[start + i] = [_f32(v) for v in p]
+        return [Point(self, start + i) for i in range(len(positions))]
+
+    def points(self):
+        return [Point(self, i) for i in range(len(self._P))]
+
+    def point(self, index):
+        return Point(self, index) if 0 <= index < len(self._P) else None
+
+    def iterPoints(self):
+        return self.points()
+
+    def pointFloatAttribValues(self, name):
+        if name == "P":
+            return tuple(v for p in self._P for v in p)
+        values = self._point_values[name]
+        if self._point_attribs[name]._size > 1:
+            return tuple(float(v) for t in values for v in t)
+        return tuple(float(v) for v in values)
+
+    def pointIntAttribValues(self, name):
+        values = self._point_values[name]
+        if self._point_attribs[name]._size > 1:
+            return tuple(int(v) for t in values for v in t)
+        return tuple(int(v) for v in values)
+
+    def pointStringAttribValues(self, name):
+        return tuple(self._point_values[name])
+
+    def pointFloatAttribValuesAsString(self, name, float_type=None):
+        import array
+        return array.array("f", self.pointFloatAttribValues(name)).tobytes()
+
+    def pointIntAttribValuesAsString(self, name, int_type=None):
+        import array
+        return array.array("i", self.pointIntAttribValues(name)).tobytes()
+
+    def _set_point_values(self, name, flat, cast):
+        flat = list(flat)
+        if name == "P":
+            if len(flat) != 3 * len(self._P):
+                raise ValueError("wrong number of P values")
+            self._P = [[cast(flat[i * 3 + k]) for k in range(3)] for i in range(len(self._P))]
+            return
+        a = self._point_attribs[name]
+        size = a._size
+        if len(flat) != size * len(self._P):
+            raise ValueError("wrong number of values for {}".format(name))
+        if size > 1:
+            self._point_values[name] = [tuple(cast(flat[i * size + k]) for k in range(size)) for i in range(len(self._P))]
+        else:
+            self._point_values[name] = [cast(v) for v in flat]
+
+    def setPointFloatAttribValues(self, name, values):
+        self._set_point_values(name, values, _f32)
+
+    def setPointIntAttribValues(self, name, values):
+        self._set_point_values(name, values, int)
+
+    def setPointStringAttribValues(self, name, values):
+        values = list(values)
+        if len(values) != len(self._P):
+            raise ValueError("wrong number of string values")
+        self._point_values[name] = [str(v) for v in values]
+
+    def setPointFloatAttribValuesFromString(self, name, values, float_type=None):
+        import array
+        a = array.array("f")
+        a.frombytes(values)
+        self._set_point_values(name, a, _f32)
+
+    def setPointIntAttribValuesFromString(self, name, values, int_type=None):
+        import array
+        a = array.array("i")
+        a.frombytes(values)
+        self._set_point_values(name, a, int)
+
+    # prims
+
+    def createBezierCurve(self, num_vertices=4, is_closed=False, order=4):
+        start = self._add_points(num_vertices)
+        prim = Prim(self, len(self._prims), range(start, start + num_vertices), is_closed)
+        self._prims.append(prim)
+        for name, a in self._prim_attribs.items():
+            self._prim_values[name].append(a._coerce(a._default))
+        return prim
+
+    def createPolygon(self, is_closed=True):
+        prim = Prim(self, len(self._prims), [], is_closed, primType.Polygon)
+        self._prims.append(prim)
+        for name, a in self._prim_attribs.items():
+            self._prim_values[name].append(a._coerce(a._default))
+        return prim
+
+    def createPolygons(self, point_numbers, is_closed=True):
+        prims = []
+        for pts in point_numbers:
+            prim = self.createPolygon(is_closed)
+            prim._pts = list(pts)
+            prims.append(prim)
+        return prims
+
+    def prims(self):
+        return list(self._prims)
+
+    def prim(self, index):
+        return self._prims[index] if 0 <= index < len(self._prims) else None
+
+    def deletePrims(self, prims, keep_points=False):
+        numbers = set(p.number() for p in prims)
+        removed_points = set()
+        for p in prims:
+            removed_points.update(p._pts)
+        keep = [p for p in self._prims if p._num not in numbers]
+        for name in self._prim_values:
+            self._prim_values[name] = [v for i, v in enumerate(self._prim_values[name]) if i not in numbers]
+        self._prims = keep
+        for i, p in enumerate(self._prims):
+            p._num = i
+        if not keep_points:
+            still_used = set()
+            for p in self._prims:
+                still_used.update(p._pts)
+            removed_points -= still_used
+            self._delete_point_numbers(removed_points)
+
+    def _delete_point_numbers(self, numbers):
+        if not numbers:
+            return
+        remap = {}
+        new_P = []
+        for i, p in enumerate(self._P):
+            if i not in numbers:
+                remap[i] = len(new_P)
+                new_P.append(p)
+        self._P = new_P
+        for name in self._point_values:
+            self._point_values[name] = [v for i, v in enumerate(self._point_values[name]) if i not in numbers]
+        for p in self._prims:
+            p._pts = [remap[v] for v in p._pts]
+
+    def deletePoints(self, points):
+        self._delete_point_numbers(set(p.number() for p in points))
+
+    def boundingBox(self):
+        if not self._P:
+            return BoundingBox((0, 0, 0), (0, 0, 0))
+        return BoundingBox([min(c) for c in zip(*self._P)], [max(c) for c in zip(*self._P)])
+
+    def incrementAllDataIds(self):
+        self.data_id += 1
+
+    def dataId(self):
+        return self.data_id
+
+    def modificationCounter(self):
+        return self.data_id
+
+    def merge(self, geo):
+        offset = len(self._P)
+        self._P.extend([list(p) for p in geo._P])
+        for prim in geo._prims:
+            self._prims.append(Prim(self, len(self._prims), [p + offset for p in prim._pts], prim._closed, prim._type))
+
+
+class Ramp(object):
+
+    def __init__(self, basis, keys, values):
+        self._keys = list(keys)
+        self._values = list(values)
+
+    def lookup(self, pos):
+        keys, values = self._keys, self._values
+        for i in range(len(keys) - 1):
+            if keys[i] <= pos <= keys[i + 1]:
+                f = (pos - keys[i]) / (keys[i + 1] - keys[i])
+                a, b = values[i], values[i + 1]
+                if hasattr(a, "__len__"):
+                    return tuple(x + (y - x) * f for x, y in zip(a, b))
+                return a + (b - a) * f
+        return values[-1]
+
+
+class _NodeType(object):
+
+    def hdaModule(self):
+        return None
+
+
+def nodeType(category, name):
+    return _NodeType()
+
+
+def sopNodeTypeCategory():
+    class _Cat(object):
+        def nodeVerb(self, name):
+            class _Verb(object):
+                def setParms(self, parms):
+                    pass
+
+                def execute(self, geo, inputs):
+                    src, tgt = inputs
+                    if not src._P:
+                        geo.merge(tgt)
+                        return
+                    names = [n for n in tgt._point_attribs if n != "N"]
+                    for n in names:
+                        a = tgt._point_attribs[n]
+                        geo.addAttrib(attribType.Point, n, a._default)
+                    for i, p in enumerate(tgt._P):
+                        scale = tgt._point_values["pscale"][i] if "pscale" in tgt._point_values else 1.0
+                        nrm = tgt._point_values["N"][i] if "N" in tgt._point_values else (0.0, 1.0, 0.0)
+                        start = len(geo._P)
+                        geo.createPoints([[(s + n) * scale + c for s, n, c in zip(sp, nrm, p)] for sp in src._P])
+                        for n in names:
+                            for k in range(len(src._P)):
+                                geo._point_values[n][start + k] = tgt._point_values[n][i]
+            return _Verb()
+    return _Cat()
+
+
+def applicationVersion():
+    return (18, 5, 0)
+
+
+def nodeBySessionId(session_id):
+    return None
+
+
+class _undos(object):
+
+    @staticmethod
+    @contextmanager
+    def disabler():
+        yield
+
+
+undos = _undos()
+
+
+class _ui(object):
+
+    @staticmethod
+    def selectFromList(*args, **kwargs):
+        return ()
+
+
+ui = _ui()
+
+
+class Color(object):
+
+    def __init__(self, *args):
+        self._rgb = _seq(args) if args else [0.0, 0.0, 0.0]
+
+    def rgb(self):
+        return tuple(self._rgb)
+
+
+def getenv(name, default=None):
+    import os
+    return os.environ.get(name, default)
+
+
+from headless import *
@@ -0,0 +1,26 @@
+import hou
+
+
+class GeometryIntersector(object):
+
+    def __init__(self, geometry, scene_viewer=None, tolerance=0.01):
+        self.geometry = geometry
+        self.tolerance = tolerance
+        self.intersected = -1
+        self.prim_num = -1
+        self.position = hou.Vector3()
+        self.normal = hou.Vector3()
+        self.uvw = hou.Vector3()
+        self.prim = None
+
+    def intersect(self, origin, direction, snap_to_guide=False):
+        self.intersected = -1
+        self.prim_num = -1
+
+
+def hotkey(*args, **kwargs):
+    return ""
+
+
+def cplaneIntersection(*args):
+    return hou.Vector3()
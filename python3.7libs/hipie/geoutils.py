@@ -0,0 +1,72 @@
+# Bulk point attribute reads and writes shared by the viewer states
+
+from __future__ import annotations
+
+import hou
+import numpy as np
+
+# bulk setters have no start offset, a partial write shorter than
+# 1/PARTIAL_WRITE_RATIO of the kept points is done point by point instead
+PARTIAL_WRITE_RATIO = 16
+
+
+def read_point_attrib_values(geo: hou.Geometry, attrib: hou.Attrib) -> list:
+    """ Values of all points with one bulk call, sized attributes as tuples like point.attribValue """
+    name = attrib.name()
+    data_type = attrib.dataType()
+
+    if data_type == hou.attribData.String:
+        return list(geo.pointStringAttribValues(name))
+
+    if data_type == hou.attribData.Int:
+        values = np.frombuffer(geo.pointIntAttribValuesAsString(name), dtype=np.int32)
+    else:
+        values = np.frombuffer(geo.pointFloatAttribValuesAsString(name), dtype=np.float32)
+
+    if attrib.size() > 1:
+        return [tuple(value) for value in values.reshape(-1, attrib.size()).tolist()]
+    return values.tolist()
+
+
+def set_point_attrib_values(geo: hou.Geometry, attrib_name: str, values, point_start: int = 0):
+    """ Write values of all points starting from point_start. Points before
+        point_start keep their current values. """
+    attrib: hou.Attrib = geo.findPointAttrib(attrib_name)
+    data_type = attrib.dataType()
+
+    if point_start and len(values) * PARTIAL_WRITE_RATIO < point_start:
+        set_point_attrib_slice(geo, attrib_name, data_type, values, point_start)
+        return
+
+    if data_type == hou.attribData.String:
+        values = list(values)
+        if point_start:
+            values = list(geo.pointStringAttribValues(attrib_name)[:point_start]) + values
+        geo.setPointStringAttribValues(attrib_name, values)
+        return
+
+    prefix_size = point_start * attrib.size() * 4
+
+    if data_type == hou.attribData.Int:
+        values = np.asarray(values, dtype=np.int32).ravel()
+        prefix = geo.pointIntAttribValuesAsString(attrib_name)[:prefix_size] if point_start else b""
+        geo.setPointIntAttribValuesFromString(attrib_name, prefix + values.tobytes())
+    else:
+        values = np.asarray(values, dtype=np.float32).ravel()
+        prefix = geo.pointFloatAttribValuesAsString(attrib_name)[:prefix_size] if point_start else b""
+        geo.setPointFloatAttribValuesFromString(attrib_name, prefix + values.tobytes())
+
+
+def set_point_attrib_slice(geo: hou.Geometry, attrib_name: str, data_type: hou.attribData, values, point_start: int):
+    if isinstance(values, np.ndarray):
+        values = values.tolist()
+
+    if attrib_name == "P":
+        for point_number, value in enumerate(values, point_start):
+            geo.point(point_number).setPosition(value)
+        return
+
+    for point_number, value in enumerate(values, point_start):
+        if data_type == hou.attribData.Int:
+            value = [int(v) for v in value] if isinstance(value, (list, tuple)) else int(value)
+        geo.point(point_number).setAttribValue(attrib_name, value)
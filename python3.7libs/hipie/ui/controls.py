@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import inspect
+import math
 import traceback
 from collections import Iterable
 from typing import Optional
@@ -11,6 +12,12 @@ import hou
 import numpy as np
 import viewerstate.utils as su
 
+from hipie.geoutils import read_point_attrib_values, set_point_attrib_values
+from hipie.ui.profiler import Profiler, ProfilerHUD, profiled
+from hipie.ui.throttle import EditThrottle
+from hipie.ui.viewport import (DrawablesLayout, PointControlDrawable, ScreenProjection, ScreenSpaceGrid,
+                               SurfaceIntersector, ViewportContext, viewport_event)
+
 def_pcontrol_params = {
     "radius": 11,
     "color1": (1.0,1.0,0.8,1.0),
@@ -60,53 +67,64 @@ class MovingType:
 class PointControl(object):
 
     def __init__(self, position = hou.Vector3(0, 0, 0), drawable_index=0, tag=""):
+        self._projection: ScreenProjection = None
+        self._layout: DrawablesLayout = None
         self.position = position
-        self.drawable_index = drawable_index
-        self.is_visible = True
+        self._drawable_index = drawable_index
+        self._is_visible = True
         self._on_move = None
         self._on_select = None
         self.tag = tag
         self.attributes = {} 
         self.geo_point = None # type: hou.Point
+        self.point_number = -1
+        self.points_geometry: PointsGeometry = None
+
+    @property
+    def position(self) -> hou.Vector3:
+        return self._position
+
+    @position.setter
+    def position(self, position: hou.Vector3):
+        self._position = position
+        if self._projection is not None:
+            self._projection.mark_moved(self)
+        if self._layout is not None:
+            self._layout.mark_moved(self)
+
+    @property
+    def drawable_index(self) -> int:
+        return self._drawable_index
+
+    @drawable_index.setter
+    def drawable_index(self, drawable_index: int):
+        if drawable_index != self._drawable_index and self._layout is not None:
+            self._layout.mark_changed(self)
+        self._drawable_index = drawable_index
+
+    @property
+    def is_visible(self) -> bool:
+        return self._is_visible
+
+    @is_visible.setter
+    def is_visible(self, is_visible: bool):
+        if is_visible != self._is_visible and self._layout is not None:
+            self._layout.mark_changed(self)
+        self._is_visible = is_visible
 
     def set_attribute_value(self, name, value):
         self.attributes[name] = value
         self.geo_point.setAttribValue(name, value)
+        self.points_geometry.mark_changed(name)
 
     def move_to(self, position):
         self.position = position
         if self.geo_point is not None:
             self.geo_point.setPosition(position)
+            self.points_geometry.mark_changed("P")
         if self._on_move:
             self._on_move(position)
 
-# Drawable container for point cotrols
-class PointControlDrawable(object):
-
-    def __init__(self, name, scene_viewer):
-        self.name = name
-        self.scene_viewer = scene_viewer
-
-        self._points_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_points_geo_drawable") # type: hou.GeometryDrawable
-        self._hovered_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_hovered_drawable") # type: hou.GeometryDrawable
-        self._selected_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_hovered_drawable") # type: hou.GeometryDrawable
-
-    def set_drawing_params(self, params):
-        self._points_drawable.setParams(params)
-        self._hovered_drawable.setParams(params)
-        self._selected_drawable.setParams(params)
-
-    def set_hovered_params(self, params):
-        self._hovered_drawable.setParams(params)
-
-    def set_selected_params(self, params):
-        self._selected_drawable.setParams(params)
-
-    def draw(self, handle):
-        self._points_drawable.draw(handle)
-        self._hovered_drawable.draw(handle)
-        self._selected_drawable.draw(handle)
-
 
 # Container of point controls. Handling drawing, dragging etc
 class PointControlGroup(object):
@@ -121,6 +139,9 @@ class PointControlGroup(object):
         self.hovered_control = None # type: PointControl
         self.dragged_control = None # type: PointControl
         self.hover_tolerance = 100.0
+        self.screen_projection = ScreenProjection()
+        self.hover_grid = ScreenSpaceGrid()
+        self.drawables_layout = DrawablesLayout()
 
         self._points_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, "points_geo_drawable") # type: hou.GeometryDrawable
         self._hovered_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, "hovered_drawable") # type: hou.GeometryDrawable
@@ -135,6 +156,9 @@ class PointControlGroup(object):
         self.surface_geo = None # type: hou.Geometry
         self.surface_normal = None # type: hou.Vector3
         self.surface_hit_prim = -1 # type: int
+        self.surface_intersector = SurfaceIntersector()
+        self.viewport_context = ViewportContext(scene_viewer)
+        self.profiler = Profiler()
 
         self.on_hover_update = lambda hover_control, prev_control: None
         self.on_control_moved = lambda control, new_position, old_position: None
@@ -144,7 +168,13 @@ class PointControlGroup(object):
         self.cached_construction_point = None # type: hou.Vector3
 
     def clear_controls(self):
+        for control in self.point_controls:
+            control._projection = None
+            control._layout = None
         self.point_controls = []
+        self.screen_projection.invalidate_layout()
+        self.drawables_layout.invalidate()
+        self.hover_grid.clear()
         self.selected_controls = []
         self.dragged_control = None
         self.hovered_control = None
@@ -155,6 +185,7 @@ class PointControlGroup(object):
 
     def add_drawable(self, name):
         self.drawables.append(PointControlDrawable(name, self.scene_viewer))
+        self.drawables_layout.invalidate()
 
     def get_drawable(self, name):
         # type: (str) -> PointControlDrawable
@@ -176,62 +207,87 @@ class PointControlGroup(object):
         drawable = self.get_drawable(name)
         drawable.set_selected_params(params)
 
+    def split_by_drawable(self, controls: list[PointControl]) -> list[list[PointControl]]:
+        drawables_controls = [[] for drawable in self.drawables]
+        for control in controls:
+            if control.is_visible:
+                drawables_controls[control.drawable_index].append(control)
+        return drawables_controls
+
     def update_points_geo(self):
-        for index, drawable in enumerate(self.drawables):
-            geo = hou.Geometry()
-            point_positions = [control.position for control in self.point_controls if control.drawable_index == index and control.is_visible]
-            geo.createPoints(point_positions)
-            drawable._points_drawable.setGeometry(geo)
+        layout = self.drawables_layout
+        if layout.dirty:
+            for drawable, controls in zip(self.drawables, self.split_by_drawable(self.point_controls)):
+                drawable.set_controls(controls)
+        else:
+            for drawable, removed, added in zip(self.drawables, *layout.split_changes(len(self.drawables))):
+                drawable.remove_controls(removed)
+                drawable.add_controls(added)
+            if layout.moved_controls:
+                for drawable in self.drawables:
+                    drawable.move_controls(layout.moved_controls)
+        layout.clear_changes()
 
     def update_hovered_geo(self):
         for index, drawable in enumerate(self.drawables):
-            geo = hou.Geometry()
             if self.hovered_control is not None and index == self.hovered_control.drawable_index:
-                geo.createPoints([self.hovered_control.position])
-            drawable._hovered_drawable.setGeometry(geo) 
+                drawable.set_hovered(self.hovered_control)
+            else:
+                drawable.set_hovered(None)
 
     def show_hovered(self, show):
         for drawable in self.drawables:
             drawable._hovered_drawable.show(show)
 
     def update_selected_geo(self):
-        for index, drawable in enumerate(self.drawables):
-            point_positions = [c.position for c in self.selected_controls if c.drawable_index == index and c.is_visible]
-            geo = hou.Geometry()
-            if point_positions:
-                geo.createPoints(point_positions)
-            drawable._selected_drawable.setGeometry(geo)
+        for drawable, controls in zip(self.drawables, self.split_by_drawable(self.selected_controls)):
+            drawable.set_selected(controls)
 
     def add_control(self, position: hou.Vector3, drawable_index=0, tag=""):
         control = PointControl(position, drawable_index, tag)
+        control._projection = self.screen_projection
+        control._layout = self.drawables_layout
+        self.screen_projection.mark_added(control)
+        self.drawables_layout.mark_added(control)
         self.point_controls.append(control)
         return control
+
+    def add_controls(self, positions: list[hou.Vector3], drawable_index=0, tag="") -> list[PointControl]:
+        controls = [PointControl(position, drawable_index, tag) for position in positions]
+        for control in controls:
+            control._projection = self.screen_projection
+            control._layout = self.drawables_layout
+        self.screen_projection.invalidate_layout()
+        self.drawables_layout.invalidate()
+        self.point_controls.extend(controls)
+        return controls
+
+    def remove_control(self, control: PointControl):
+        self.point_controls.remove(control)
+        self.screen_projection.invalidate_layout()
+        self.drawables_layout.mark_removed(control)
+        control._projection = None
+        control._layout = None
+
+    def update_screen_projection(self, viewport: hou.GeometryViewport = None) -> ScreenProjection:
+        self.screen_projection.update(self.viewport_context, self.point_controls, viewport)
+        return self.screen_projection
  
+    @profiled
     def hover_points(self, ui_event):
         # type: (hou.UIEvent) -> None
 
-        max_distance = self.hover_tolerance + 0.1
         prev_control = self.hovered_control
 
-        self.hovered_control = None
-        for point_control in self.point_controls: # type: int, PointControl
-            if not point_control.is_visible:
-                continue
-
-            viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
-            point_screen_pos = viewport.mapToScreen(point_control.position * viewport.modelToGeometryTransform().inverted()) # type: hou.Vector2
-
-            dev = ui_event.device() # type: hou.UIEventDevice
+        projection = self.update_screen_projection()
+        self.hover_grid.sync(projection, max(math.sqrt(self.hover_tolerance), 1.0))
 
-            mouse_pos = hou.Vector3(dev.mouseX(), dev.mouseY(), 0.0)
-            mouse_pos *= viewport.windowToViewportTransform()
-            mouse_pos = hou.Vector2(mouse_pos.x(), mouse_pos.y())
+        dev = ui_event.device() # type: hou.UIEventDevice
 
-            distance_to_cursor = (point_screen_pos - mouse_pos).lengthSquared()
+        mouse_pos = hou.Vector3(dev.mouseX(), dev.mouseY(), 0.0)
+        mouse_pos *= self.viewport_context.window_to_viewport()
 
-            if distance_to_cursor < self.hover_tolerance and distance_to_cursor < max_distance:
-                self.hovered_control = point_control
-                max_distance = distance_to_cursor
+        self.hovered_control = self.hover_grid.find_nearest(projection, mouse_pos.x(), mouse_pos.y(), self.hover_tolerance)
 
         if self.hovered_control is not None and self.hovered_control is not prev_control:
             self.update_hovered_geo()
@@ -279,6 +335,14 @@ class PointControlGroup(object):
     def clear_selection(self):
         self.selected_controls[:] = []
         self.update_selected_geo()
+
+    def change_selection(self, added_controls: list[PointControl], removed_controls: list[PointControl]):
+        if removed_controls:
+            removed = set(removed_controls)
+            self.selected_controls[:] = [c for c in self.selected_controls if c not in removed]
+        selected = set(self.selected_controls)
+        self.selected_controls.extend(c for c in added_controls if c not in selected)
+        self.update_selected_geo()
     
     def on_mouse_move(self, ui_event):
         # type: (hou.UIEvent) -> None
@@ -297,6 +361,8 @@ class PointControlGroup(object):
     def get_surface_hit_prim(self):
         # type: () -> hou.Prim
         if self.surface_geo is not None and self.surface_hit_prim >= 0:
+            if self.surface_intersector.geo is self.surface_geo:
+                return self.surface_intersector.hit_prim()
             return self.surface_geo.prim(self.surface_hit_prim)
         return None
 
@@ -318,8 +384,7 @@ class PointControlGroup(object):
 
         # construction_point = su.cplaneIntersection(self.scene_viewer, origin, direction) # type: hou.Vector3
 
-        viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
-        view_transform = viewport.viewTransform() # type: hou.Matrix4
+        view_transform = self.viewport_context.view_transform() # type: hou.Matrix4
 
         plane_point = self.plane_point # hou.Vector3(0, 0, 0)
         plane_normal = ProjectionType.plane_normal[self.projection_mode]
@@ -332,12 +397,11 @@ class PointControlGroup(object):
             plane_point = self.plane_point
             plane_normal = -camera_look
 
-            cplane = self.scene_viewer.constructionPlane() # type: hou.ConstructionPlane
+            cplane_visible, cplane_transform, cplane_normal_transform = self.viewport_context.construction_plane()
 
-            if cplane.isVisible():
-                cplane_transform = cplane.transform() # type: hou.Matrix4
+            if cplane_visible:
                 plane_point = hou.Vector3(0.0, 0.0, 0.0) * cplane_transform
-                plane_normal = hou.Vector3(0.0, 0.0, 1.0) * cplane_transform.inverted().transposed()
+                plane_normal = hou.Vector3(0.0, 0.0, 1.0) * cplane_normal_transform
 
         try:
             construction_point = hou.hmath.intersectPlane(plane_point, plane_normal, origin, direction)
@@ -387,25 +451,13 @@ class PointControlGroup(object):
 
         if self.surface_geo is not None and self.enable_snapping:
 
-            gi = su.GeometryIntersector(self.surface_geo, tolerance=0.02)
-            gi.intersect(origin, direction)
+            surface = self.surface_intersector
+            self.surface_hit_prim = surface.intersect(self.surface_geo, origin, direction)
 
-            self.surface_hit_prim = -1
+            if self.surface_hit_prim > -1:
+                construction_point = surface.hit_position()
+                self.surface_normal = surface.get_hit_normal()
 
-            if gi.prim_num > -1:
-                
-                construction_point = gi.position 
-                self.surface_normal = gi.normal
-                self.surface_hit_prim = gi.prim_num
-
-                # currently hou.Geometry.intersect doesn't give you correct normal with non-uniform scales
-                prim = self.surface_geo.prim(gi.prim_num) # type: hou.PackedPrim
-                if isinstance(prim, hou.PackedPrim):
-                    prim_transform = prim.transform() # type: hou.Matrix4
-                    self.surface_normal *= prim_transform.inverted()
-                    prim_full_transform = prim.fullTransform()
-                    self.surface_normal *= prim_full_transform.inverted().transposed()
-                    
 
         self.cached_construction_point = construction_point
         return construction_point
@@ -460,6 +512,77 @@ BUILTIN_TO_ATTRIBDATA = {
 #    hou.attribData.Dict: dict # Disable for now
 }
 
+# Persistent points geometry of the controls. Point numbers follow the controls order,
+# edits are applied to the mapped points and only changed attributes get new data ids
+class PointsGeometry(object):
+
+    def __init__(self):
+        self.geo: hou.Geometry = None
+        self.changed_attribs: set[str] = set()
+        self.topology_changed = True
+
+    def mark_changed(self, attrib_name: str):
+        self.changed_attribs.add(attrib_name)
+
+    def map_controls(self, controls: list[PointControl], geo_points: list[hou.Point], start=0):
+        for number, (control, point) in enumerate(zip(controls, geo_points), start):
+            control.geo_point = point
+            control.point_number = number
+            control.points_geometry = self
+
+    def rebuild(self, controls: list[PointControl], attributes_meta: dict[str, AttributeMeta]):
+        self.geo = hou.Geometry()
+        geo_points = self.geo.createPoints([control.position for control in controls])
+
+        for attrib, meta in attributes_meta.items():
+            self.geo.addAttrib(hou.attribType.Point, attrib, meta.default_value)
+            set_point_attrib_values(self.geo, attrib, [control.attributes[attrib] for control in controls])
+
+        self.map_controls(controls, geo_points)
+        self.topology_changed = True
+
+    def add_controls(self, controls: list[PointControl], attributes_meta: dict[str, AttributeMeta]):
+        """ Append points of controls added at the end of the controls list """
+        start = self.geo.intrinsicValue("pointcount")
+        geo_points = self.geo.createPoints([control.position for control in controls])
+
+        for attrib in attributes_meta:
+            set_point_attrib_values(self.geo, attrib, [control.attributes[attrib] for control in controls], start)
+
+        self.map_controls(controls, geo_points, start)
+        self.topology_changed = True
+
+    def remove_controls(self, removed_controls: list[PointControl], controls: list[PointControl]):
+        """ Delete points of removed controls, points of the remaining controls are renumbered """
+        self.geo.deletePoints([control.geo_point for control in removed_controls])
+
+        for control in removed_controls:
+            control.geo_point = None
+            control.point_number = -1
+            control.points_geometry = None
+
+        self.map_controls(controls, self.geo.points())
+        self.topology_changed = True
+
+    def set_positions(self, controls: list[PointControl], positions: np.ndarray):
+        """ Write (n, 3) positions of controls' points in one bulk call """
+        all_positions = np.frombuffer(self.geo.pointFloatAttribValuesAsString("P"), dtype=np.float32).reshape(-1, 3).copy()
+        all_positions[[control.point_number for control in controls]] = positions
+        self.geo.setPointFloatAttribValuesFromString("P", all_positions.tobytes())
+        self.mark_changed("P")
+
+    def commit(self, stash: hou.Parm):
+        # bump first so the stash copy carries the ids of this commit's changes
+        if self.topology_changed:
+            self.geo.incrementAllDataIds()
+        else:
+            for attrib_name in self.changed_attribs:
+                self.geo.findPointAttrib(attrib_name).incrementDataId()
+
+        stash.set(self.geo)
+        self.changed_attribs.clear()
+        self.topology_changed = False
+
 class AttributeMeta:
 
     def __init__(self, name, default_value, control_parm=None, allow_multiedit=False):
@@ -665,6 +788,11 @@ class BoxSelection:
         self._drawable.show(True)
         self.in_progress = False
 
+        # per projection row membership while rubber-banding
+        self.selection_mask: np.ndarray = None
+        self.initial_mask: np.ndarray = None
+        self.layout_revision = -1
+
     def set_mode(self, mode: BoxSelection.Mode):
         self.mode = mode
         self._drawable.setParams(BoxSelection.MODE_PARAMS[mode])
@@ -675,6 +803,7 @@ class BoxSelection:
         self.set_mode(mode)
         self.selection_start = start_position
         self.selection_viewport = viewport
+        self.selection_mask = None
         self.in_progress = True
 
     def build_geo(self, mouse_pos):
@@ -683,7 +812,8 @@ class BoxSelection:
 
         geo: hou.Geometry = hou.Geometry()
 
-        mouse_pos *= self.selection_viewport.windowToViewportTransform()
+        context = self.state.point_controls.viewport_context
+        mouse_pos *= context.window_to_viewport(self.selection_viewport)
 
         pt1 = self.selection_start
         pt2 = mouse_pos
@@ -694,7 +824,7 @@ class BoxSelection:
         pt4_ray = self.selection_viewport.mapToWorld(pt2.x(), pt1.y())
 
 
-        view_transform = self.selection_viewport.viewTransform() # type: hou.Matrix4
+        view_transform = context.view_transform(self.selection_viewport) # type: hou.Matrix4
 
         camera_pos = hou.Vector3(0, 0, 0) * view_transform # type: hou.Vector3
         camera_look =  hou.Vector3(0, 0, -1) * view_transform - camera_pos # type: hou.Vector3
@@ -713,8 +843,11 @@ class BoxSelection:
 
     def check_point(self, point: hou.Vector3) -> bool:
         viewport: hou.GeometryViewport = self.selection_viewport
-        screen_pos: hou.Vector2 = viewport.mapToScreen(point * viewport.modelToGeometryTransform().inverted())
+        geo_to_model = self.state.point_controls.viewport_context.geo_to_model(viewport)
+        screen_pos: hou.Vector2 = viewport.mapToScreen(point * geo_to_model)
+        return bool(self.check_screen_points(np.array([[screen_pos.x(), screen_pos.y()]]))[0])
 
+    def check_screen_points(self, screen_positions: np.ndarray) -> np.ndarray:
         start_x = self.selection_start.x()
         start_y = self.selection_start.y()
 
@@ -727,7 +860,10 @@ class BoxSelection:
         bottom = min(start_y, end_y)
         top = bottom + abs(start_y - end_y)
 
-        return left <= screen_pos.x() <= right and bottom <= screen_pos.y() <= top
+        screen_x = screen_positions[:, 0]
+        screen_y = screen_positions[:, 1]
+
+        return (left <= screen_x) & (screen_x <= right) & (bottom <= screen_y) & (screen_y <= top)
 
 
     def draw(self, handle):
@@ -749,6 +885,10 @@ class PointControlsState(object):
         self.state_label = state_name
 
         self.point_controls: PointControlGroup = PointControlGroup(scene_viewer)
+        self.viewport_context = self.point_controls.viewport_context
+        self.profiler = self.point_controls.profiler
+        self.profiler.name = state_name
+        self.profiler_hud = ProfilerHUD(scene_viewer, self.profiler)
         self.point_controls.add_drawable("controls")
         self.point_controls.set_drawing_params("controls", def_pcontrol_params)
         self.point_controls.set_hovered_params("controls", def_pcontrol_hover_params)
@@ -767,7 +907,8 @@ class PointControlsState(object):
 
         self.point_stash_name = "points_stash"
         self.points_stash = None # type: hou.Parm
-        self.points_geo = None # type: hou.Geometry
+        self.points_geometry = PointsGeometry()
+        self.stash_throttle = EditThrottle()
 
         self.point_controls.on_hover_update = self.on_control_hovered
         self.dragger = hou.ViewerStateDragger("dragger")
@@ -786,7 +927,8 @@ class PointControlsState(object):
         self.box_transform_bounds = None
         self.box_transform_size = None
         self.reset_box_transform_handle = False
-        self.box_transform_positions: list[hou.Vector3] = []
+        # (n, 3) rest positions of the selection relative to the box center
+        self.box_transform_positions = np.zeros((0, 3))
 
         self.edit_transaction = False
         self.is_editing_by_handle = False
@@ -818,6 +960,10 @@ class PointControlsState(object):
 
         self.box_transform_handle = hou.Handle(self.scene_viewer, BOX_TRANSFORM_HANDLE)
 
+    @property
+    def points_geo(self) -> hou.Geometry:
+        return self.points_geometry.geo
+
     def begin_edit(self):
         self.log("Start edit transaction")
         self.edit_transaction = True
@@ -825,6 +971,9 @@ class PointControlsState(object):
 
     def end_edit(self):
         self.log("End edit transaction")
+        # flush before leaving the transaction so the stash callback doesn't reload it
+        if self.stash_throttle.pending:
+            self.on_update(force=True)
         self.edit_transaction = False
         self.scene_viewer.endStateUndo()
 
@@ -849,10 +998,10 @@ class PointControlsState(object):
             self.box_transform_bounds = None
             return
 
-        selected_positions = [control.position for control in selected_controls]
+        selected_positions = np.array([control.position for control in selected_controls], dtype=np.float64)
 
-        max_pos = hou.Vector3(np.max(selected_positions, axis=0))
-        min_pos = hou.Vector3(np.min(selected_positions, axis=0))
+        max_pos = hou.Vector3(selected_positions.max(axis=0).tolist())
+        min_pos = hou.Vector3(selected_positions.min(axis=0).tolist())
 
         origin = (min_pos + max_pos) * 0.5
         size = (max_pos - origin) * 2.0
@@ -860,24 +1009,38 @@ class PointControlsState(object):
         self.box_transform_bounds = (origin, size)
         self.box_transform_size = size
 
-        self.box_transform_positions = [position - origin for position in selected_positions]
+        self.box_transform_positions = selected_positions - tuple(origin)
         self.reset_box_transform_handle = True
 
+    @profiled
     def process_box_selection(self):
         # type(hou.UIEventDevice) -> bool
 
-        points_in_pox = [point for point in self.point_controls.point_controls if self.box_selection.check_point(point.position)]
+        box_selection = self.box_selection
+        projection = self.point_controls.update_screen_projection(box_selection.selection_viewport)
 
-        self.point_controls.clear_selection()
+        if box_selection.selection_mask is None or box_selection.layout_revision != projection.layout_revision:
+            box_selection.selection_mask = projection.get_rows_mask(self.point_controls.selected_controls)
+            box_selection.initial_mask = projection.get_rows_mask(self.initial_selection)
+            box_selection.layout_revision = projection.layout_revision
+
+        points_in_box = box_selection.check_screen_points(projection.screen_positions)
        
-        if self.box_selection.mode == BoxSelection.Mode.NEW_SELECTION:
-            selected_points = points_in_pox
-        elif self.box_selection.mode == BoxSelection.Mode.ADD_TO_SELECTION:
-            selected_points = set(self.initial_selection + points_in_pox)
+        if box_selection.mode == BoxSelection.Mode.NEW_SELECTION:
+            selection_mask = points_in_box
+        elif box_selection.mode == BoxSelection.Mode.ADD_TO_SELECTION:
+            selection_mask = box_selection.initial_mask | points_in_box
         else:
-            selected_points = set(self.initial_selection) - set(points_in_pox)
+            selection_mask = box_selection.initial_mask & ~points_in_box
 
-        self.point_controls.select_controls(selected_points)
+        if np.array_equal(selection_mask, box_selection.selection_mask):
+            return
+
+        added_rows = np.nonzero(selection_mask & ~box_selection.selection_mask)[0]
+        removed_rows = np.nonzero(box_selection.selection_mask & ~selection_mask)[0]
+        box_selection.selection_mask = selection_mask
+
+        self.point_controls.change_selection(projection.get_controls(added_rows), projection.get_controls(removed_rows))
         self.on_control_selected()
 
     
@@ -914,6 +1077,7 @@ class PointControlsState(object):
                 self.disable_state_parms_callback = False
 
 
+    @viewport_event
     def onMenuAction(self, kwargs):
         """ Callback implementing the actions of a bound menu. Called 
         when a menu item has been selected. 
@@ -1095,10 +1259,10 @@ class PointControlsState(object):
             self.point_controls.hovered_control = None
 
         for control in self.point_controls.selected_controls:
-            self.point_controls.point_controls.remove(control)
+            self.point_controls.remove_control(control)
 
         self.begin_edit()
-        self.rebuild_points_geo()
+        self.points_geometry.remove_controls(self.point_controls.selected_controls, self.point_controls.point_controls)
         self.on_update()
         self.end_edit()
 
@@ -1121,32 +1285,39 @@ class PointControlsState(object):
 
         if rebuild_geo:
             self.begin_edit()
-            self.rebuild_points_geo()
+            if self.points_geo is None:
+                self.rebuild_points_geo()
+            else:
+                self.points_geometry.add_controls([control], self.attributes_meta)
             self.on_update()
             self.end_edit()
 
         return control
+
+    def add_controls(self, positions: list[hou.Vector3], attribute_values: dict[str, list] = None) -> list[PointControl]:
+        """ Add controls in one batch without selecting them or touching geo.
+            Attributes missing from attribute_values get their default value """
+        controls = self.point_controls.add_controls(positions)
+        attribute_values = attribute_values or {}
+
+        for attrib, meta in self.attributes_meta.items():
+            values = attribute_values.get(attrib)
+            if values is None:
+                values = [meta.default_value] * len(controls)
+            for control, value in zip(controls, values):
+                control.attributes[attrib] = value
+
+        return controls
     
     def get_one_selected_control(self):
         # type: () -> PointControl
         selected_controls = self.point_controls.selected_controls
         return selected_controls[0] if len(selected_controls) == 1 else None
 
+    @profiled
     def rebuild_points_geo(self):
 
-        self.points_geo = hou.Geometry()
-        self.points_geo.createPoints([p.position for p in self.point_controls.point_controls])
-
-        geo_attribs = []
-
-        for attrib in self.attributes_meta:
-            geo_attribs.append(self.points_geo.addAttrib(hou.attribType.Point, attrib, self.attributes_meta[attrib].default_value))
-
-        for point in self.points_geo.points(): # type: hou.Point
-            control = self.point_controls.point_controls[point.number()]
-            control.geo_point = point
-            for attrib in geo_attribs: # type: hou.Attrib
-                point.setAttribValue(attrib, control.attributes[attrib.name()])
+        self.points_geometry.rebuild(self.point_controls.point_controls, self.attributes_meta)
 
     def load_from_stash(self):
         self.log("Load controls from stash")
@@ -1158,19 +1329,15 @@ class PointControlsState(object):
             self.rebuild_points_geo()
             return
 
-        geo_points = geo.points()
-
         point_attribs = geo.pointAttribs() # type: list[hou.Attrib]
 
         point_attribs = [attrib for attrib in point_attribs 
                         if attrib.name() in self.attributes_meta and self.attributes_meta[attrib.name()].is_same_type(attrib)]
 
+        positions = np.frombuffer(geo.pointFloatAttribValuesAsString("P"), dtype=np.float32).reshape(-1, 3).tolist()
+        attribute_values = {attrib.name(): read_point_attrib_values(geo, attrib) for attrib in point_attribs}
 
-        #NOTE: In the future can be optimized with pointFloatAttribValues(name), currently not worth it
-        for point in geo_points: # type: hou.Point
-            control = self.add_control(point.position(), rebuild_geo=False, select=False)
-            for attrib in point_attribs:
-                control.attributes[attrib.name()] = point.attribValue(attrib)
+        self.add_controls([hou.Vector3(position) for position in positions], attribute_values)
 
         self.rebuild_points_geo()
 
@@ -1178,9 +1345,14 @@ class PointControlsState(object):
 
         self.point_controls.update_points_geo()
 
-    def on_update(self):
-        self.points_stash.set(self.points_geo)
-        self.points_geo.incrementAllDataIds()
+    @profiled
+    def on_update(self, force=False):
+        """ Commit controls to the stash. While editing the drawables are updated on every
+            event and the stash at most stash_rate times per second unless forced """
+        if not self.stash_throttle.should_commit(self.edit_transaction, force):
+            return
+
+        self.points_geometry.commit(self.points_stash)
 
     def on_mouse_move(self, ui_event):
         # type: (hou.UIEvent) -> None
@@ -1205,6 +1377,7 @@ class PointControlsState(object):
             self.box_selection.in_progress = False
 
 
+    @profiled
     def on_mouse_down(self, ui_event):
         # type: (hou.UIEvent) -> None
 
@@ -1242,9 +1415,9 @@ class PointControlsState(object):
 
             self.clicked_on_control = False
 
-            viewport = self.scene_viewer.curViewport()
+            viewport = self.point_controls.viewport_context.viewport()
             mouse_pos = hou.Vector3(device.mouseX(), device.mouseY(), 0.0)
-            mouse_pos *= viewport.windowToViewportTransform()
+            mouse_pos *= self.point_controls.viewport_context.window_to_viewport(viewport)
 
             if self.allow_multiselection and (is_shift_key or is_ctrl_key) and self.allow_box_selection:
                 self.disable_dragging()
@@ -1278,6 +1451,7 @@ class PointControlsState(object):
     def onResume(self, kwargs):
         self.show(True)
 
+    @viewport_event
     def onStateToHandle(self, kwargs):
         handle = kwargs["handle"]
         parms = kwargs["parms"]
@@ -1307,7 +1481,6 @@ class PointControlsState(object):
     def process_box_transform(self, parms):
         rx, ry, rz = parms["rx"], parms["ry"], parms["rz"]
         tx, ty, tz = parms["centerx"], parms["centery"], parms["centerz"]
-        box_center = hou.Vector3((tx, ty, tz))
         sizex, sizey, sizez = parms["sizex"], parms["sizey"], parms["sizez"]
         
         size_tolerance = 0.000001
@@ -1322,8 +1495,25 @@ class PointControlsState(object):
         transform *= hou.hmath.buildScale(sx, sy, sz)
         transform *= hou.hmath.buildRotate(rx, ry, rz)
 
-        for index, control in enumerate(self.point_controls.selected_controls):
-            control.move_to(box_center + self.box_transform_positions[index] * transform)
+        # row vectors, same as hou.Vector3 * hou.Matrix4
+        matrix = np.array(transform.asTupleOfTuples())
+        positions = self.box_transform_positions.dot(matrix[:3, :3]) + matrix[3, :3] + (tx, ty, tz)
+        self.move_controls(self.point_controls.selected_controls, positions)
+
+    def move_controls(self, controls: list[PointControl], positions: np.ndarray):
+        """ move_to for many controls with (n, 3) positions, points geo is written in bulk """
+        bulk_write = self.points_geo is not None and all(control.points_geometry is self.points_geometry for control in controls)
+        if bulk_write:
+            self.points_geometry.set_positions(controls, positions)
+
+        for control, position in zip(controls, positions.tolist()):
+            position = hou.Vector3(position)
+            if bulk_write:
+                control.position = position
+                if control._on_move:
+                    control._on_move(position)
+            else:
+                control.move_to(position)
 
     def onBeginHandleToState(self, kwargs):
         self.is_editing_by_handle = True
@@ -1334,6 +1524,8 @@ class PointControlsState(object):
         self.end_edit()
 
 
+    @profiled
+    @viewport_event
     def onHandleToState(self, kwargs):
         handle = kwargs["handle"]
         parms = kwargs["parms"]
@@ -1364,6 +1556,9 @@ class PointControlsState(object):
         self.node = kwargs["node"]
         if self.point_stash_name:
             self.points_stash = self.node.parm(self.point_stash_name)
+        stash_rate_parm = self.node.parm("stash_rate")
+        if stash_rate_parm is not None:
+            self.stash_throttle.rate = stash_rate_parm.eval()
         for handle in self.point_handles.values():
             if handle.disabled_parms:
                 handle.handle.disableParms(handle.disabled_parms)
@@ -1379,8 +1574,11 @@ class PointControlsState(object):
     def onExit(self, kwargs):
         self.node.removeAllEventCallbacks()
         self.on_exit(kwargs)
+        if self.profiler.enabled and self.profiler.trace_events:
+            self.log(f"Profile trace saved to {self.profiler.dump_trace()}")
         self.log("== EXIT ==")        
 
+    @viewport_event
     def onKeyEvent(self, kwargs):
         ui_event: hou.UIEvent = kwargs["ui_event"] 
         device: hou.UIEventDevice = ui_event.device()
@@ -1396,6 +1594,8 @@ class PointControlsState(object):
 
         
     
+    @profiled
+    @viewport_event
     def onMouseEvent(self, kwargs):
 
         ui_event = kwargs["ui_event"] # type: hou.UIEvent
@@ -1449,6 +1649,8 @@ class PointControlsState(object):
     def on_draw(self, handle):
         pass
 
+    @profiled
+    @viewport_event
     def onDraw(self, kwargs ):
         """ This callback is used for rendering the drawables
         """
@@ -1466,7 +1668,9 @@ class PointControlsState(object):
             self.toggle_handles_visibility()
 
         self.on_draw(handle)
+        self.profiler_hud.draw(handle)
 
+    @viewport_event
     def onDrawInterrupt(self, kwargs ):
         handle = kwargs["draw_handle"]
         self.point_controls.draw(handle) 
@@ -0,0 +1,176 @@
+# Opt-in timing of viewer state callbacks
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import hou
+import numpy as np
+
+PROFILE_ENV = "HIPIE_PROFILE"
+
+
+def profiling_requested() -> bool:
+    return os.environ.get(PROFILE_ENV, "0") not in ("", "0")
+
+
+# Last durations of one callback
+class RingBuffer(object):
+
+    def __init__(self, capacity: int):
+        self.samples = np.zeros(capacity, dtype=np.float64)
+        self.index = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+
+    def values(self) -> np.ndarray:
+        return self.samples[:min(self.count, len(self.samples))]
+
+
+class Profiler(object):
+
+    def __init__(self, name="hipie", capacity=256, trace_capacity=200000):
+        self.name = name
+        self.enabled = profiling_requested()
+        self.capacity = capacity
+        self.timings: dict[str, RingBuffer] = {}
+        self.trace_events: deque = deque(maxlen=trace_capacity)
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def clear(self):
+        self.timings = {}
+        self.trace_events.clear()
+        self.origin = time.perf_counter()
+
+    def record(self, label: str, start: float, duration: float):
+        timings = self.timings.get(label)
+        if timings is None:
+            timings = self.timings[label] = RingBuffer(self.capacity)
+        timings.add(duration * 1000.0)
+
+        self.trace_events.append((label, start, duration, threading.get_ident()))
+
+    def stats(self) -> list[tuple[str, float, float, float, int]]:
+        """ (label, p50, p95, max, calls) in milliseconds, slowest first """
+        stats = []
+        for label, timings in self.timings.items():
+            values = timings.values()
+            p50, p95 = np.percentile(values, (50, 95))
+            stats.append((label, float(p50), float(p95), float(values.max()), timings.count))
+        return sorted(stats, key=lambda s: s[2], reverse=True)
+
+    def chrome_trace(self) -> dict:
+        events = [{
+            "name": label,
+            "cat": self.name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": self.pid,
+            "tid": tid,
+        } for label, start, duration, tid in self.trace_events]
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_trace(self, path: Optional[str] = None) -> str:
+        if path is None:
+            temp_dir = hou.getenv("HOUDINI_TEMP_DIR") or tempfile.gettempdir()
+            path = os.path.join(temp_dir, f"{self.name}_{time.strftime('%Y%m%d_%H%M%S')}.trace.json")
+
+        with open(path, "w") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+        return path
+
+    def section(self, label: str) -> ProfilerSection:
+        return ProfilerSection(self, label)
+
+
+class ProfilerSection(object):
+
+    def __init__(self, profiler: Profiler, label: str):
+        self.profiler = profiler
+        self.label = label
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler.enabled:
+            self.profiler.record(self.label, self.start, time.perf_counter() - self.start)
+        return False
+
+
+def profiled(method):
+    """ Time the method into the owner's profiler when it's enabled """
+    label = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        profiler = self.profiler
+        if not profiler.enabled:
+            return method(self, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            profiler.record(label, start, time.perf_counter() - start)
+
+    return wrapper
+
+
+# Live p50/p95/max table drawn over the viewport
+class ProfilerHUD(object):
+
+    def __init__(self, scene_viewer: hou.SceneViewer, profiler: Profiler, refresh_rate=4.0, max_rows=12):
+        self.profiler = profiler
+        self.refresh_interval = 1.0 / refresh_rate
+        self.max_rows = max_rows
+        self.last_refresh = 0.0
+        self._drawable = hou.TextDrawable(scene_viewer, f"{profiler.name}_profiler_hud")
+        self._drawable.setParams({
+            "text": "",
+            "color1": (1.0, 1.0, 1.0, 1.0),
+            "color2": (0.0, 0.0, 0.0, 1.0),
+            "origin": hou.drawableTextOrigin.BottomLeft,
+            "margins": hou.Vector2(10, 10),
+            "highlight_mode": hou.drawableHighlightMode.MatteOverGlow,
+            "glow_width": 1.0,
+        })
+
+    def get_text(self) -> str:
+        rows = ["<b>callback  p50  p95  max (ms)  calls</b>"]
+        for label, p50, p95, max_time, calls in self.profiler.stats()[:self.max_rows]:
+            rows.append(f"{label}  {p50:.2f}  {p95:.2f}  {max_time:.2f}  {calls}")
+        return "<font face='Source Code Pro' size=3>" + "<br>".join(rows) + "</font>"
+
+    def draw(self, handle):
+        enabled = self.profiler.enabled
+        self._drawable.show(enabled)
+        if not enabled:
+            return
+
+        now = time.perf_counter()
+        if now - self.last_refresh > self.refresh_interval:
+            self.last_refresh = now
+            self._drawable.setParams({"text": self.get_text()})
+
+        self._drawable.draw(handle)
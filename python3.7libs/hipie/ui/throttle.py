@@ -0,0 +1,30 @@
+# Rate limiting of stash commits during edit transactions, shared by the viewer states
+
+from __future__ import annotations
+
+import time
+
+# max commits per second during an edit transaction (drags, handles),
+# 0 commits on every event, negative only when the edit ends
+EDIT_COMMIT_RATE = 30.0
+
+
+class EditThrottle(object):
+    """ Outside of an edit transaction or when forced every commit goes through, 
+        skipped commits leave pending set until the next one """
+
+    def __init__(self, rate: float = EDIT_COMMIT_RATE):
+        self.rate = rate
+        self.last_time = 0.0
+        self.pending = False
+
+    def should_commit(self, editing: bool, force: bool = False) -> bool:
+        now = time.time()
+        if not force and editing and self.rate != 0:
+            if self.rate < 0 or now - self.last_time < 1.0 / self.rate:
+                self.pending = True
+                return False
+
+        self.last_time = now
+        self.pending = False
+        return True
@@ -0,0 +1,528 @@
+# Viewport side of point controls shared by the viewer states: per event HOM query cache,
+# screen space projection and picking of controls, surface snapping and control drawables.
+# Controls only need a position and drawable_index/is_visible
+
+from __future__ import annotations
+
+import functools
+import math
+from collections import Iterable
+from typing import TYPE_CHECKING, Optional
+
+import hou
+import numpy as np
+import viewerstate.utils as su
+
+if TYPE_CHECKING:
+    from hipie.ui.controls import PointControl
+
+
+# Split of the visible controls between the drawables. Redone only when invalidated, otherwise
+# added, removed, shown or hidden controls and moved controls are collected until the next update
+class DrawablesLayout(object):
+
+    def __init__(self):
+        self.dirty = True
+        self.moved_controls: set[PointControl] = set()
+        # drawable index changed controls were drawn in at the last update, None if they weren't drawn
+        self.changed_controls: dict[PointControl, Optional[int]] = {}
+        self.removed_controls: set[PointControl] = set()
+
+    @staticmethod
+    def drawn_index(control: PointControl) -> Optional[int]:
+        return control.drawable_index if control.is_visible else None
+
+    def invalidate(self):
+        self.dirty = True
+        self.moved_controls = set()
+        self.changed_controls = {}
+        self.removed_controls = set()
+
+    def mark_moved(self, control: PointControl):
+        if not self.dirty:
+            self.moved_controls.add(control)
+
+    def mark_changed(self, control: PointControl):
+        """ Call before the control visibility or drawable index changes """
+        if not self.dirty and control not in self.changed_controls:
+            self.changed_controls[control] = self.drawn_index(control)
+
+    def mark_added(self, control: PointControl):
+        if not self.dirty:
+            self.changed_controls.setdefault(control, None)
+            self.removed_controls.discard(control)
+
+    def mark_removed(self, control: PointControl):
+        self.mark_changed(control)
+        if not self.dirty:
+            self.removed_controls.add(control)
+
+    def split_changes(self, num_drawables: int) -> tuple[list[list[PointControl]], list[list[PointControl]]]:
+        """ Controls to take out of and to add to each drawable since the last update """
+        removed = [[] for _ in range(num_drawables)]
+        added = [[] for _ in range(num_drawables)]
+        for control, drawn_index in self.changed_controls.items():
+            current_index = None if control in self.removed_controls else self.drawn_index(control)
+            if current_index == drawn_index:
+                continue
+            if drawn_index is not None:
+                removed[drawn_index].append(control)
+            if current_index is not None:
+                added[current_index].append(control)
+        return removed, added
+
+    def clear_changes(self):
+        self.dirty = False
+        self.moved_controls = set()
+        self.changed_controls = {}
+        self.removed_controls = set()
+
+# Drawable container for point cotrols
+class PointControlDrawable(object):
+
+    def __init__(self, name, scene_viewer):
+        self.name = name
+        self.scene_viewer = scene_viewer
+
+        self._points_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_points_geo_drawable") # type: hou.GeometryDrawable
+        self._hovered_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_hovered_drawable") # type: hou.GeometryDrawable
+        self._selected_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_hovered_drawable") # type: hou.GeometryDrawable
+
+        # geometries are kept between updates, moves only rewrite P
+        self.controls: list[PointControl] = []
+        self.control_rows: dict[PointControl, int] = {}
+        self.positions = np.zeros((0, 3), dtype=np.float32)
+        self.points_geo = hou.Geometry()
+        self.selected_controls: list[PointControl] = []
+        self.selected_geo = hou.Geometry()
+        self.hovered_geo = hou.Geometry()
+        self.hovered_point: hou.Point = None
+
+    def set_controls(self, controls: list[PointControl]):
+        self.controls = controls
+        self.control_rows = {control: row for row, control in enumerate(controls)}
+        self.positions = np.array([control.position for control in controls], dtype=np.float32).reshape(-1, 3)
+        self.points_geo = hou.Geometry()
+        self.points_geo.createPoints(self.positions.tolist())
+        self._points_drawable.setGeometry(self.points_geo)
+
+    def add_controls(self, controls: list[PointControl]):
+        """ Append points of new controls, existing controls keep their points """
+        if not controls:
+            return
+
+        positions = np.array([control.position for control in controls], dtype=np.float32).reshape(-1, 3)
+        self.control_rows.update((control, row) for row, control in enumerate(controls, len(self.controls)))
+        self.controls.extend(controls)
+        self.positions = np.concatenate((self.positions, positions))
+        self.points_geo.createPoints(positions.tolist())
+        self.points_geo.incrementAllDataIds()
+        self._points_drawable.setGeometry(self.points_geo)
+
+    def remove_controls(self, controls: list[PointControl]):
+        if controls:
+            removed = set(controls)
+            self.set_controls([control for control in self.controls if control not in removed])
+
+    def move_controls(self, controls: Iterable[PointControl]):
+        moved_controls = [control for control in controls if control in self.control_rows]
+        if not moved_controls:
+            return
+
+        rows = [self.control_rows[control] for control in moved_controls]
+        self.positions[rows] = [control.position for control in moved_controls]
+        self.points_geo.setPointFloatAttribValuesFromString("P", self.positions.tobytes())
+        self.points_geo.incrementAllDataIds()
+        self._points_drawable.setGeometry(self.points_geo)
+
+    def set_selected(self, controls: list[PointControl]):
+        """ The selected geo gets new points only when the selection changes """
+        positions = [control.position for control in controls]
+        if controls != self.selected_controls:
+            self.selected_controls = controls
+            self.selected_geo = hou.Geometry()
+            if positions:
+                self.selected_geo.createPoints(positions)
+        elif positions:
+            self.selected_geo.setPointFloatAttribValuesFromString("P", np.array(positions, dtype=np.float32).tobytes())
+            self.selected_geo.incrementAllDataIds()
+        self._selected_drawable.setGeometry(self.selected_geo)
+
+    def set_hovered(self, control: PointControl):
+        if control is None:
+            if self.hovered_point is not None:
+                self.hovered_geo = hou.Geometry()
+                self.hovered_point = None
+        else:
+            if self.hovered_point is None:
+                self.hovered_point = self.hovered_geo.createPoint()
+            self.hovered_point.setPosition(control.position)
+            self.hovered_geo.incrementAllDataIds()
+        self._hovered_drawable.setGeometry(self.hovered_geo)
+
+    def set_drawing_params(self, params):
+        self._points_drawable.setParams(params)
+        self._hovered_drawable.setParams(params)
+        self._selected_drawable.setParams(params)
+
+    def set_hovered_params(self, params):
+        self._hovered_drawable.setParams(params)
+
+    def set_selected_params(self, params):
+        self._selected_drawable.setParams(params)
+
+    def draw(self, handle):
+        self._points_drawable.draw(handle)
+        self._hovered_drawable.draw(handle)
+        self._selected_drawable.draw(handle)
+
+
+# Viewport queries of a single ui event, each one asked from HOM only once
+class ViewportContext(object):
+
+    def __init__(self, scene_viewer: hou.SceneViewer):
+        self.scene_viewer = scene_viewer
+        self.depth = 0
+        self.values: dict[tuple[str, int], tuple] = {}
+        self.hom_calls = 0
+        self.saved_calls = 0
+        self.events = 0
+        self.last_hom_calls = 0
+        self.last_saved_calls = 0
+        self.total_saved_calls = 0
+
+    def begin(self):
+        if self.depth == 0:
+            self.values = {}
+            self.hom_calls = 0
+            self.saved_calls = 0
+        self.depth += 1
+
+    def end(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self.values = {}
+            self.events += 1
+            self.last_hom_calls = self.hom_calls
+            self.last_saved_calls = self.saved_calls
+            self.total_saved_calls += self.saved_calls
+
+    def get(self, name: str, source, compute, calls=1):
+        if source is None:
+            source = self.viewport()
+
+        if self.depth == 0:
+            return compute(source)
+
+        key = (name, id(source))
+        if key in self.values:
+            self.saved_calls += calls
+            return self.values[key][1]
+
+        self.hom_calls += calls
+        value = compute(source)
+        # keep the source alive so its id stays unique within the event
+        self.values[key] = (source, value)
+        return value
+
+    def viewport(self) -> hou.GeometryViewport:
+        return self.get("viewport", self.scene_viewer, lambda viewer: viewer.curViewport())
+
+    def viewport_name(self, viewport: hou.GeometryViewport = None) -> str:
+        return self.get("name", viewport, lambda vp: vp.name())
+
+    def viewport_size(self, viewport: hou.GeometryViewport = None) -> tuple[int, int, int, int]:
+        return self.get("size", viewport, lambda vp: vp.size())
+
+    def view_transform(self, viewport: hou.GeometryViewport = None) -> hou.Matrix4:
+        return self.get("view", viewport, lambda vp: vp.viewTransform())
+
+    def ndc_to_camera(self, viewport: hou.GeometryViewport = None) -> hou.Matrix4:
+        return self.get("ndc_to_camera", viewport, lambda vp: vp.ndcToCameraTransform())
+
+    def window_to_viewport(self, viewport: hou.GeometryViewport = None) -> hou.Matrix4:
+        return self.get("window_to_viewport", viewport, lambda vp: vp.windowToViewportTransform())
+
+    def geo_to_model(self, viewport: hou.GeometryViewport = None) -> hou.Matrix4:
+        return self.get("geo_to_model", viewport, lambda vp: vp.modelToGeometryTransform().inverted(), 2)
+
+    def view_to_geo(self, viewport: hou.GeometryViewport = None) -> hou.Matrix4:
+        return self.get("view_to_geo", viewport,
+            lambda vp: (vp.viewportToNDCTransform() * vp.ndcToCameraTransform() 
+                        * vp.cameraToModelTransform() * vp.modelToGeometryTransform()), 7)
+
+    def construction_plane(self) -> tuple[bool, Optional[hou.Matrix4], Optional[hou.Matrix4]]:
+        def compute(viewer: hou.SceneViewer):
+            cplane: hou.ConstructionPlane = viewer.constructionPlane()
+            if not cplane.isVisible():
+                return False, None, None
+            cplane_transform: hou.Matrix4 = cplane.transform()
+            return True, cplane_transform, cplane_transform.inverted().transposed()
+
+        return self.get("cplane", self.scene_viewer, compute, 5)
+
+
+def viewport_event(method):
+    """ Run a state event handler with the viewport queries memoized """
+    @functools.wraps(method)
+    def wrapper(self, kwargs):
+        context = self.viewport_context
+        context.begin()
+        try:
+            return method(self, kwargs)
+        finally:
+            context.end()
+
+    return wrapper
+
+
+# Cached screen space positions of point controls
+class ScreenProjection(object):
+
+    def __init__(self):
+        self.controls: list[PointControl] = []
+        self.control_rows: dict[PointControl, int] = {}
+        self.positions = np.zeros((0, 3))
+        self.screen_positions = np.zeros((0, 2))
+        self.row_revisions = np.zeros(0, dtype=np.int64)
+        self.world_to_screen = np.identity(4)
+        self.moved_controls: set[PointControl] = set()
+        self.added_controls: list[PointControl] = []
+        self.layout_dirty = True
+        self.view_key = None
+        self.revision = 0
+        self.layout_revision = 0
+        # bumped only when control positions change, not the view
+        self.positions_revision = 0
+
+    def invalidate_layout(self):
+        self.layout_dirty = True
+        self.moved_controls = set()
+        self.added_controls = []
+
+    def mark_added(self, control: PointControl):
+        """ Controls appended to the projected controls get rows after the existing ones """
+        if not self.layout_dirty:
+            self.added_controls.append(control)
+
+    def mark_moved(self, control: PointControl):
+        if not self.layout_dirty:
+            self.moved_controls.add(control)
+
+    def project(self, positions: np.ndarray) -> np.ndarray:
+        homogeneous = np.hstack((positions, np.ones((len(positions), 1)))).dot(self.world_to_screen)
+        return homogeneous[:, :2] / homogeneous[:, 3:]
+
+    def update(self, context: ViewportContext, controls: list[PointControl], viewport: hou.GeometryViewport = None):
+        view_to_geo: hou.Matrix4 = context.view_to_geo(viewport)
+        view_key = (context.viewport_name(viewport), view_to_geo.asTuple())
+        full_update = False
+
+        if view_key != self.view_key:
+            self.view_key = view_key
+            self.world_to_screen = np.array(view_to_geo.inverted().asTupleOfTuples())
+            full_update = True
+
+        rows = np.zeros(0, dtype=np.int64)
+
+        if self.layout_dirty:
+            self.layout_dirty = False
+            self.controls = list(controls)
+            self.control_rows = {control: row for row, control in enumerate(self.controls)}
+            self.positions = np.array([control.position for control in self.controls], dtype=np.float64).reshape(-1, 3)
+            self.positions_revision += 1
+            full_update = True
+        else:
+            if self.added_controls:
+                num_controls = len(self.controls)
+                self.controls.extend(self.added_controls)
+                self.control_rows.update((control, row) for row, control in enumerate(self.added_controls, num_controls))
+                added_positions = np.array([control.position for control in self.added_controls], dtype=np.float64).reshape(-1, 3)
+                self.positions = np.concatenate((self.positions, added_positions))
+                self.screen_positions = np.concatenate((self.screen_positions, np.zeros((len(added_positions), 2))))
+                self.row_revisions = np.concatenate((self.row_revisions, np.zeros(len(added_positions), dtype=np.int64)))
+                rows = np.arange(num_controls, len(self.controls))
+                self.positions_revision += 1
+
+            if self.moved_controls:
+                moved_rows = np.array([self.control_rows[control] for control in self.moved_controls], dtype=np.int64)
+                self.positions[moved_rows] = [control.position for control in self.moved_controls]
+                rows = np.union1d(rows, moved_rows)
+                self.positions_revision += 1
+
+        if full_update:
+            self.revision += 1
+            self.layout_revision = self.revision
+            self.screen_positions = self.project(self.positions)
+            self.row_revisions = np.full(len(self.controls), self.revision, dtype=np.int64)
+        elif len(rows):
+            self.revision += 1
+            self.screen_positions[rows] = self.project(self.positions[rows])
+            self.row_revisions[rows] = self.revision
+
+        self.moved_controls = set()
+        self.added_controls = []
+
+    def screen_position(self, control: PointControl) -> np.ndarray:
+        return self.screen_positions[self.control_rows[control]]
+
+    def get_rows_mask(self, controls: Iterable[PointControl]) -> np.ndarray:
+        mask = np.zeros(len(self.controls), dtype=bool)
+        mask[[self.control_rows[control] for control in controls]] = True
+        return mask
+
+    def get_controls(self, rows: np.ndarray) -> list[PointControl]:
+        return [self.controls[row] for row in rows.tolist()]
+
+
+# Screen space buckets of projected point controls for hover picking
+class ScreenSpaceGrid(object):
+
+    def __init__(self):
+        self.cell_size = 1.0
+        self.cells: dict[tuple[int, int], set[int]] = {}
+        self.row_cells = np.zeros((0, 2), dtype=np.int64)
+        self.synced_revision = -1
+
+    def clear(self):
+        self.cells = {}
+        self.row_cells = np.zeros((0, 2), dtype=np.int64)
+        self.synced_revision = -1
+
+    def sync(self, projection: ScreenProjection, cell_size: float):
+        if projection.layout_revision > self.synced_revision or cell_size != self.cell_size:
+            self.cell_size = cell_size
+            self.row_cells = np.floor(projection.screen_positions / cell_size).astype(np.int64)
+            self.cells = {}
+            for row, cell in enumerate(map(tuple, self.row_cells.tolist())):
+                self.cells.setdefault(cell, set()).add(row)
+        elif projection.revision > self.synced_revision:
+            # appended rows have no cell yet
+            num_synced = len(self.row_cells)
+            num_added = len(projection.screen_positions) - num_synced
+            if num_added > 0:
+                self.row_cells = np.concatenate((self.row_cells, np.zeros((num_added, 2), dtype=np.int64)))
+
+            rows = np.nonzero(projection.row_revisions > self.synced_revision)[0]
+            new_cells = np.floor(projection.screen_positions[rows] / cell_size).astype(np.int64)
+            for row, cell in zip(rows.tolist(), map(tuple, new_cells.tolist())):
+                if row >= num_synced:
+                    self.cells.setdefault(cell, set()).add(row)
+                    continue
+                old_cell = tuple(self.row_cells[row].tolist())
+                if old_cell == cell:
+                    continue
+                self.cells[old_cell].discard(row)
+                if not self.cells[old_cell]:
+                    del self.cells[old_cell]
+                self.cells.setdefault(cell, set()).add(row)
+            self.row_cells[rows] = new_cells
+
+        self.synced_revision = projection.revision
+
+    def find_nearest(self, projection: ScreenProjection, x: float, y: float, max_distance: float) -> Optional[PointControl]:
+        cell_x = int(math.floor(x / self.cell_size))
+        cell_y = int(math.floor(y / self.cell_size))
+
+        rows = []
+        for i in range(cell_x - 1, cell_x + 2):
+            for j in range(cell_y - 1, cell_y + 2):
+                rows.extend(self.cells.get((i, j), ()))
+
+        nearest_control = None
+        nearest_key = None
+        for row in rows:
+            control = projection.controls[row]
+            if not control.is_visible:
+                continue
+            screen_x, screen_y = projection.screen_positions[row]
+            distance = (screen_x - x) ** 2 + (screen_y - y) ** 2
+            if distance >= max_distance:
+                continue
+            if nearest_key is None or (distance, row) < nearest_key:
+                nearest_control = control
+                nearest_key = (distance, row)
+
+        return nearest_control
+
+
+class SurfaceIntersector(object):
+    """ GeometryIntersector kept alive across events, rebuilt only when the surface geometry changes """
+
+    def __init__(self, tolerance: float = 0.02):
+        self.tolerance = tolerance
+        self.geo: Optional[hou.Geometry] = None
+        self.intersector: Optional[su.GeometryIntersector] = None
+        self.data_key = None
+        self.ray = None
+        self.prims: dict[int, hou.Prim] = {}
+        self.hit_values: dict[str, hou.Vector3] = {}
+        self.hit_normal: Optional[hou.Vector3] = None
+
+    def clear(self):
+        self.geo = None
+        self.intersector = None
+        self.data_key = None
+        self.ray = None
+        self.prims = {}
+        self.hit_values = {}
+        self.hit_normal = None
+
+    def get_data_key(self, geo: hou.Geometry) -> tuple:
+        return (id(geo), geo.modificationCounter(), geo.findPointAttrib("P").dataId())
+
+    def intersect(self, geo: hou.Geometry, origin: hou.Vector3, direction: hou.Vector3) -> int:
+        data_key = self.get_data_key(geo)
+        if self.intersector is None or data_key != self.data_key:
+            self.geo = geo
+            self.intersector = su.GeometryIntersector(geo, tolerance=self.tolerance)
+            self.data_key = data_key
+            self.ray = None
+            self.prims = {}
+
+        ray = (tuple(origin), tuple(direction))
+        if ray != self.ray:
+            self.ray = ray
+            self.hit_values = {}
+            self.hit_normal = None
+            self.intersector.intersect(origin, direction)
+
+        return self.intersector.prim_num
+
+    def hit_prim(self) -> hou.Prim:
+        prim_num = self.intersector.prim_num
+        prim = self.prims.get(prim_num)
+        if prim is None:
+            prim = self.prims[prim_num] = self.geo.prim(prim_num)
+        return prim
+
+    def hit_position(self) -> hou.Vector3:
+        return hou.Vector3(self.intersector.position)
+
+    def hit_interior_position(self) -> hou.Vector3:
+        """ Hit position evaluated on the prim at the hit uvw """
+        if "P" not in self.hit_values:
+            uvw = self.intersector.uvw
+            self.hit_values["P"] = self.hit_prim().positionAtInterior(uvw[0], uvw[1], uvw[2])
+        return hou.Vector3(self.hit_values["P"])
+
+    def hit_attrib_value(self, attrib: hou.Attrib) -> hou.Vector3:
+        if attrib.name() not in self.hit_values:
+            uvw = self.intersector.uvw
+            self.hit_values[attrib.name()] = hou.Vector3(self.hit_prim().attribValueAtInterior(attrib, uvw[0], uvw[1], uvw[2]))
+        return hou.Vector3(self.hit_values[attrib.name()])
+
+    def get_hit_normal(self) -> hou.Vector3:
+        if self.hit_normal is None:
+            normal = hou.Vector3(self.intersector.normal)
+
+            # currently hou.Geometry.intersect doesn't give you correct normal with non-uniform scales
+            prim = self.hit_prim()
+            if isinstance(prim, hou.PackedPrim):
+                prim_transform: hou.Matrix4 = prim.transform()
+                normal *= prim_transform.inverted()
+                prim_full_transform = prim.fullTransform()
+                normal *= prim_full_transform.inverted().transposed()
+
+            self.hit_normal = normal
+        return hou.Vector3(self.hit_normal)
@@ -8,6 +8,8 @@ Date Created:   August 17, 2020 - 14:07:37
 
 import hou
 import json
+import base64
+import struct
 import string
 import math
 import numpy as np
@@ -15,8 +17,15 @@ import functools as ft
 import itertools as it
 import viewerstate.utils as su
 
+from hipie.geoutils import set_point_attrib_values
+from hipie.ui.profiler import Profiler, ProfilerHUD, profiled
+from hipie.ui.throttle import EditThrottle
+from hipie.ui.viewport import (DrawablesLayout, PointControlDrawable, ScreenProjection, ScreenSpaceGrid,
+                               SurfaceIntersector, ViewportContext, viewport_event)
+
 from collections import Iterable
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 
 ONE_THIRD = 0.333333333333333333
@@ -170,13 +179,22 @@ class TextDrawableGroup(object):
             if style not in self.styles:
                 self.styles.append(style)
 
+    # past declutter_density labels per min_distance square of the viewport no two shown labels
+    # are closer than min_distance (in pixels), at most max_visible are drawn
+    min_distance = 24.0
+    declutter_density = 0.05
+    max_visible = 500
+
     def __init__(self, scene_viewer):
         self.texts = [] # type: list[TextDrawableGroup.Text]
+        self.visible_texts = None # type: list[TextDrawableGroup.Text]
         self.params = {}
         self.scene_viewer = scene_viewer # type: hou.SceneViewer
         self.global_size = 3
         self.global_color = hou.Color(1.0, 1.0, 1.0)
         self.visible = False
+        self.layout_anchors = None # type: np.ndarray
+        self.layout_view = None
 
     def create_text_drawable(self, text):
         text_id = "Text_" + str(hash(self)) + "_" + str(hash(text))
@@ -191,8 +209,10 @@ class TextDrawableGroup(object):
         text.format_text()
 
     def allocate_texts(self, length):
-        self.texts = []
-        for _ in range(length):
+        """ Resize to length texts. Existing drawables are reused, their texts are expected to be set again """
+        del self.texts[length:]
+        self.visible_texts = None
+        for _ in range(len(self.texts), length):
             text = TextDrawableGroup.Text()
             text.size = self.global_size
             self.texts.append(text)
@@ -216,9 +236,68 @@ class TextDrawableGroup(object):
         elif index >= 0 and index < len(self.texts):
             self.texts[index].setParams(params)
 
+    def update_layout(self, anchors, projection, viewport_size, force=False):
+        # type: (np.ndarray, ScreenProjection, tuple[int, int, int, int], bool) -> None
+        """ Layout texts at world space anchors, skipped while the anchors and the view stay the same """
+        layout_view = (projection.view_key, viewport_size)
+        if not force and layout_view == self.layout_view and self.layout_anchors is not None \
+                and np.array_equal(anchors, self.layout_anchors):
+            return
+
+        self.layout_view = layout_view
+        self.layout_anchors = np.array(anchors, dtype=np.float64)
+        self.layout(projection.project(self.layout_anchors), viewport_size)
+
+    def layout(self, screen_positions, viewport_size):
+        # type: (np.ndarray, tuple[int, int, int, int]) -> None
+        """ Place texts at screen positions. Texts outside of the viewport are culled and dense labels are decluttered """
+        _, _, width, height = viewport_size
+        x = screen_positions[:, 0]
+        y = screen_positions[:, 1]
+
+        candidates = (x >= -self.min_distance) & (x <= width) & (y >= -self.min_distance) & (y <= height)
+        candidates &= np.array([bool(text.text) for text in self.texts], dtype=bool).reshape(-1)
+        candidates = np.flatnonzero(candidates)
+
+        if len(candidates) * self.min_distance ** 2 > width * height * self.declutter_density:
+            shown = self.declutter(screen_positions, candidates)
+        else:
+            shown = candidates[:self.max_visible]
+
+        self.visible_texts = [self.texts[index] for index in shown.tolist()]
+        for text, (screen_x, screen_y) in zip(self.visible_texts, screen_positions[shown].tolist()):
+            text.position = hou.Vector3(screen_x, screen_y, 0.0)
+
+    def declutter(self, screen_positions, candidates):
+        # type: (np.ndarray, np.ndarray) -> np.ndarray
+        """ Keep texts in order unless a kept text is closer than min_distance. Texts sharing a cell 
+            with min_distance diagonal are always that close so only the first one of a cell is tested """
+        min_distance = self.min_distance
+        fine_cells = np.floor(screen_positions[candidates] * (math.sqrt(2.0) / min_distance)).astype(np.int64)
+        _, first_in_cell = np.unique(fine_cells.reshape(-1, 2), axis=0, return_index=True)
+        candidates = candidates[np.sort(first_in_cell)]
+
+        min_distance_sq = min_distance * min_distance
+        kept_cells = {} # type: dict[tuple[int, int], list[tuple[float, float]]]
+        shown = []
+
+        for index, (x, y) in zip(candidates.tolist(), screen_positions[candidates].tolist()):
+            cell_x, cell_y = int(math.floor(x / min_distance)), int(math.floor(y / min_distance))
+            if any((x - kept_x) ** 2 + (y - kept_y) ** 2 < min_distance_sq
+                   for near_x in (cell_x - 1, cell_x, cell_x + 1) for near_y in (cell_y - 1, cell_y, cell_y + 1)
+                   for kept_x, kept_y in kept_cells.get((near_x, near_y), ())):
+                continue
+
+            kept_cells.setdefault((cell_x, cell_y), []).append((x, y))
+            shown.append(index)
+            if len(shown) >= self.max_visible:
+                break
+
+        return np.array(shown, dtype=np.int64)
+
     def draw(self, handle):
 
-        for text in self.texts:
+        for text in self.texts if self.visible_texts is None else self.visible_texts:
             text.drawable.setParams({"translate": text.position})
             text.drawable.draw(handle)
 
@@ -233,44 +312,58 @@ class TextDrawableGroup(object):
 class PointControl(object):
 
     def __init__(self, position = hou.Vector3(0, 0, 0), drawable_index=0, tag=""):
+        self._projection = None # type: ScreenProjection
+        self._layout = None # type: DrawablesLayout
         self.world_position = position
-        self.drawable_index = drawable_index
-        self.is_visible = True
+        self._drawable_index = drawable_index
+        self._is_visible = True
         self._on_move = None
         self._on_select = None
         self.tag = tag
+        self.owner = None
+        self.is_selected = False
 
-    def move_to(self, position):
-        self.world_position = position
-        if self._on_move:
-            self._on_move(position)
+    @property
+    def world_position(self):
+        return self._world_position
 
-# Drawable container for point cotrols
-class PointControlDrawable(object):
+    @world_position.setter
+    def world_position(self, position):
+        self._world_position = position
+        if self._projection is not None:
+            self._projection.mark_moved(self)
+        if self._layout is not None:
+            self._layout.mark_moved(self)
 
-    def __init__(self, name, scene_viewer):
-        self.name = name
-        self.scene_viewer = scene_viewer
+    @property
+    def position(self):
+        # shared viewport code reads controls by position
+        return self._world_position
 
-        self._points_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_points_geo_drawable") # type: hou.GeometryDrawable
-        self._hovered_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_hovered_drawable") # type: hou.GeometryDrawable
-        self._selected_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, name + "_hovered_drawable") # type: hou.GeometryDrawable
+    @property
+    def drawable_index(self):
+        return self._drawable_index
 
-    def set_drawing_params(self, params):
-        self._points_drawable.setParams(params)
-        self._hovered_drawable.setParams(params)
-        self._selected_drawable.setParams(params)
+    @drawable_index.setter
+    def drawable_index(self, drawable_index):
+        if drawable_index != self._drawable_index and self._layout is not None:
+            self._layout.mark_changed(self)
+        self._drawable_index = drawable_index
 
-    def set_hovered_params(self, params):
-        self._hovered_drawable.setParams(params)
+    @property
+    def is_visible(self):
+        return self._is_visible
 
-    def set_selected_params(self, params):
-        self._selected_drawable.setParams(params)
+    @is_visible.setter
+    def is_visible(self, is_visible):
+        if is_visible != self._is_visible and self._layout is not None:
+            self._layout.mark_changed(self)
+        self._is_visible = is_visible
 
-    def draw(self, handle):
-        self._points_drawable.draw(handle)
-        self._hovered_drawable.draw(handle)
-        self._selected_drawable.draw(handle)
+    def move_to(self, position):
+        self.world_position = position
+        if self._on_move:
+            self._on_move(position)
 
 
 # Container of point controls. Handling drawing, dragging etc
@@ -286,6 +379,9 @@ class PointControlGroup(object):
         self.hovered_control = None # type: PointControl
         self.dragged_control = None # type: PointControl
         self.hover_tolerance = 100.0
+        self.screen_projection = ScreenProjection()
+        self.hover_grid = ScreenSpaceGrid()
+        self.drawables_layout = DrawablesLayout()
 
         self._points_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, "points_geo_drawable") # type: hou.GeometryDrawable
         self._hovered_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, "hovered_drawable") # type: hou.GeometryDrawable
@@ -299,9 +395,19 @@ class PointControlGroup(object):
         self.surface_geo = None # type: hou.Geometry
         self.surface_normal_attrib = False # hou.Attrib
         self.surface_normal = None # type: hou.Vector3
+        self.surface_intersector = SurfaceIntersector()
+        self.viewport_context = ViewportContext(scene_viewer)
+        self.profiler = Profiler()
 
     def clear_controls(self):
+        for control in self.point_controls:
+            control._projection = None
+            control._layout = None
         self.point_controls = []
+        self.screen_projection.invalidate_layout()
+        self.drawables_layout.invalidate()
+        self.hover_grid.clear()
+        self.set_selected(self.selected_controls, False)
         self.selected_controls = []
         self.dragged_control = None
         self.hovered_control = None
@@ -312,6 +418,7 @@ class PointControlGroup(object):
 
     def add_drawable(self, name):
         self.drawables.append(PointControlDrawable(name, self.scene_viewer))
+        self.drawables_layout.invalidate()
 
     def get_drawable(self, name):
         # type: (str) -> PointControlDrawable
@@ -333,63 +440,81 @@ class PointControlGroup(object):
         drawable = self.get_drawable(name)
         drawable.set_selected_params(params)
 
+    def split_by_drawable(self, controls):
+        # type: (list[PointControl]) -> list[list[PointControl]]
+        drawables_controls = [[] for drawable in self.drawables]
+        for control in controls:
+            if control.is_visible:
+                drawables_controls[control.drawable_index].append(control)
+        return drawables_controls
+
     def update_points_geo(self):
-        for index, drawable in enumerate(self.drawables):
-            geo = hou.Geometry()
-            point_positions = [control.world_position for control in self.point_controls if control.drawable_index == index and control.is_visible]
-            geo.createPoints(point_positions)
-            drawable._points_drawable.setGeometry(geo)
+        layout = self.drawables_layout
+        if layout.dirty:
+            for drawable, controls in zip(self.drawables, self.split_by_drawable(self.point_controls)):
+                drawable.set_controls(controls)
+        else:
+            for drawable, removed, added in zip(self.drawables, *layout.split_changes(len(self.drawables))):
+                drawable.remove_controls(removed)
+                drawable.add_controls(added)
+            if layout.moved_controls:
+                for drawable in self.drawables:
+                    drawable.move_controls(layout.moved_controls)
+        layout.clear_changes()
 
     def update_hovered_geo(self):
         for index, drawable in enumerate(self.drawables):
-            geo = hou.Geometry()
             if self.hovered_control and index == self.hovered_control.drawable_index:
-                geo.createPoints([self.hovered_control.world_position])
-            drawable._hovered_drawable.setGeometry(geo) 
+                drawable.set_hovered(self.hovered_control)
+            else:
+                drawable.set_hovered(None)
 
     def show_hovered(self, show):
         for drawable in self.drawables:
             drawable._hovered_drawable.show(show)
 
     def update_selected_geo(self):
-        for index, drawable in enumerate(self.drawables):
-            point_positions = [c.world_position for c in self.selected_controls if c.drawable_index == index and c.is_visible]
-            geo = hou.Geometry()
-            if point_positions:
-                geo.createPoints(point_positions)
-            drawable._selected_drawable.setGeometry(geo)
+        for drawable, controls in zip(self.drawables, self.split_by_drawable(self.selected_controls)):
+            drawable.set_selected(controls)
 
     def add_control(self, position, drawable_index=0, tag=""):
         # type: (hou.Vector3) -> PointControl
         control = PointControl(position, drawable_index, tag)
+        control._projection = self.screen_projection
+        control._layout = self.drawables_layout
+        self.screen_projection.mark_added(control)
+        self.drawables_layout.mark_added(control)
         self.point_controls.append(control)
         return control
+
+    def remove_control(self, control):
+        # type: (PointControl) -> None
+        self.point_controls.remove(control)
+        self.screen_projection.invalidate_layout()
+        self.drawables_layout.mark_removed(control)
+        control._projection = None
+        control._layout = None
+
+    def update_screen_projection(self, viewport=None):
+        # type: (hou.GeometryViewport) -> ScreenProjection
+        self.screen_projection.update(self.viewport_context, self.point_controls, viewport)
+        return self.screen_projection
  
+    @profiled
     def hover_points(self, ui_event):
         # type: (hou.UIEvent) -> None
 
-        max_distance = self.hover_tolerance + 0.1
         prev_control = self.hovered_control
 
-        self.hovered_control = None
-        for point_control in self.point_controls: # type: int, PointControl
-            if not point_control.is_visible:
-                continue
-
-            viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
-            point_screen_pos = viewport.mapToScreen(point_control.world_position * viewport.modelToGeometryTransform().inverted()) # type: hou.Vector2
-
-            dev = ui_event.device() # type: hou.UIEventDevice
+        projection = self.update_screen_projection()
+        self.hover_grid.sync(projection, max(math.sqrt(self.hover_tolerance), 1.0))
 
-            mouse_pos = hou.Vector3(dev.mouseX(), dev.mouseY(), 0.0)
-            mouse_pos *= viewport.windowToViewportTransform()
-            mouse_pos = hou.Vector2(mouse_pos.x(), mouse_pos.y())
+        dev = ui_event.device() # type: hou.UIEventDevice
 
-            distance_to_cursor = (point_screen_pos - mouse_pos).lengthSquared()
+        mouse_pos = hou.Vector3(dev.mouseX(), dev.mouseY(), 0.0)
+        mouse_pos *= self.viewport_context.window_to_viewport()
 
-            if distance_to_cursor < self.hover_tolerance and distance_to_cursor < max_distance:
-                self.hovered_control = point_control
-                max_distance = distance_to_cursor
+        self.hovered_control = self.hover_grid.find_nearest(projection, mouse_pos.x(), mouse_pos.y(), self.hover_tolerance)
 
         if self.hovered_control and self.hovered_control is not prev_control:
             self.update_hovered_geo()
@@ -407,26 +532,46 @@ class PointControlGroup(object):
         else:
             return None
 
+    def set_selected(self, controls, is_selected):
+        # type: (list[PointControl], bool) -> None
+        for control in controls:
+            control.is_selected = is_selected
+
     def select_control(self, point_control):
         # type (PointControl) -> None
-        self.selected_controls[:] = []
-        self.selected_controls.append(point_control)
+        self.set_selected(self.selected_controls, False)
+        self.selected_controls[:] = [point_control]
+        point_control.is_selected = True
         self.dragged_control = point_control
         self.update_selected_geo()
 
     def unselect_control(self, point_control):
-        if point_control in self.selected_controls:
+        if point_control.is_selected:
+            point_control.is_selected = False
             self.selected_controls.remove(point_control)
 
     def add_control_to_selection(self, point_control, update_geo=True):
-        if point_control not in self.selected_controls:
+        if not point_control.is_selected:
+            point_control.is_selected = True
             self.selected_controls.append(point_control)
             if update_geo:
                 self.update_selected_geo()
 
     def clear_selection(self):
+        self.set_selected(self.selected_controls, False)
         self.selected_controls[:] = []
         self.update_selected_geo()
+
+    def change_selection(self, added_controls, removed_controls):
+        # type: (list[PointControl], list[PointControl]) -> None
+        if removed_controls:
+            self.set_selected(removed_controls, False)
+            self.selected_controls[:] = [c for c in self.selected_controls if c.is_selected]
+        for control in added_controls:
+            if not control.is_selected:
+                control.is_selected = True
+                self.selected_controls.append(control)
+        self.update_selected_geo()
     
     def on_mouse_move(self, ui_event):
         # type: (hou.UIEvent) -> None
@@ -448,8 +593,7 @@ class PointControlGroup(object):
 
         # construction_point = su.cplaneIntersection(self.scene_viewer, origin, direction) # type: hou.Vector3
 
-        viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
-        view_transform = viewport.viewTransform() # type: hou.Matrix4
+        view_transform = self.viewport_context.view_transform() # type: hou.Matrix4
 
         plane_point = self.plane_point # hou.Vector3(0, 0, 0)
         plane_normal = ProjectionType.plane_normal[self.projection_mode]
@@ -462,12 +606,11 @@ class PointControlGroup(object):
             plane_point = self.plane_point
             plane_normal = camera_look
 
-            cplane = self.scene_viewer.constructionPlane() # type: hou.ConstructionPlane
+            cplane_visible, cplane_transform, cplane_normal_transform = self.viewport_context.construction_plane()
 
-            if cplane.isVisible():
-                cplane_transform = cplane.transform() # type: hou.Matrix4
+            if cplane_visible:
                 plane_point = hou.Vector3(0, 0, 0) * cplane_transform
-                plane_normal = hou.Vector3(0, 0, 1) * cplane_transform.inverted().transposed()
+                plane_normal = hou.Vector3(0, 0, 1) * cplane_normal_transform
 
         try:
             construction_point = hou.hmath.intersectPlane(plane_point, plane_normal, origin, direction)
@@ -508,16 +651,14 @@ class PointControlGroup(object):
 
         if self.surface_geo is not None and self.enable_snapping:
 
-            gi = su.GeometryIntersector(self.surface_geo, tolerance=0.02)
-            gi.intersect(origin, direction)
+            surface = self.surface_intersector
 
-            if gi.prim_num > -1:
-                
-                hit_prim = self.surface_geo.prim(gi.prim_num) # type: hou.Prim
-                construction_point = hit_prim.positionAtInterior(gi.uvw[0], gi.uvw[1], gi.uvw[2])
+            if surface.intersect(self.surface_geo, origin, direction) > -1:
+
+                construction_point = surface.hit_interior_position()
 
                 if self.surface_normal_attrib is not None:
-                    self.surface_normal = hou.Vector3(hit_prim.attribValueAtInterior(self.surface_normal_attrib, gi.uvw[0], gi.uvw[1], gi.uvw[2]))
+                    self.surface_normal = surface.hit_attrib_value(self.surface_normal_attrib)
                 
 
         return construction_point
@@ -594,6 +735,118 @@ class AnchorAttributeType:
         tuple_size = AnchorAttributeType.meta[attribute_type][2]
         return list(default_value) if tuple_size > 1 else default_value
 
+def euler_to_matrices(angles):
+    # type: (np.ndarray) -> np.ndarray
+    """ Nx3 xyz euler rotates in degrees to Nx3x3 row-vector matrices, same as hou.hmath.buildRotate """
+    rx, ry, rz = np.radians(angles).T
+    cx, sx = np.cos(rx), np.sin(rx)
+    cy, sy = np.cos(ry), np.sin(ry)
+    cz, sz = np.cos(rz), np.sin(rz)
+
+    matrices = np.empty((len(angles), 3, 3))
+    matrices[:, 0] = np.stack((cy * cz, cy * sz, -sy), axis=-1)
+    matrices[:, 1] = np.stack((sx * sy * cz - cx * sz, sx * sy * sz + cx * cz, sx * cy), axis=-1)
+    matrices[:, 2] = np.stack((cx * sy * cz + sx * sz, cx * sy * sz - sx * cz, cx * cy), axis=-1)
+    return matrices
+
+def matrices_to_euler(matrices):
+    # type: (np.ndarray) -> np.ndarray
+    """ Nx3x3 row-vector matrices to Nx3 xyz euler rotates in degrees """
+    ry = np.arcsin(np.clip(-matrices[:, 0, 2], -1.0, 1.0))
+    rx = np.arctan2(matrices[:, 1, 2], matrices[:, 2, 2])
+    rz = np.arctan2(matrices[:, 0, 1], matrices[:, 0, 0])
+    return np.degrees(np.stack((rx, ry, rz), axis=-1))
+
+def matrices_to_quaternions(matrices):
+    # type: (np.ndarray) -> np.ndarray
+    """ Nx3x3 rotation matrices to Nx4 (x, y, z, w) quaternions """
+    m = matrices
+    trace = m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+    pivots = np.argmax(np.stack((trace, m[:, 0, 0], m[:, 1, 1], m[:, 2, 2]), axis=-1), axis=-1)
+
+    quaternions = np.empty((len(m), 4))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.sqrt(np.maximum(trace + 1.0, 0.0)) * 2.0
+        case = np.stack(((m[:, 2, 1] - m[:, 1, 2]) / s, (m[:, 0, 2] - m[:, 2, 0]) / s, (m[:, 1, 0] - m[:, 0, 1]) / s, 0.25 * s), axis=-1)
+        quaternions[pivots == 0] = case[pivots == 0]
+
+        s = np.sqrt(np.maximum(1.0 + m[:, 0, 0] - m[:, 1, 1] - m[:, 2, 2], 0.0)) * 2.0
+        case = np.stack((0.25 * s, (m[:, 0, 1] + m[:, 1, 0]) / s, (m[:, 0, 2] + m[:, 2, 0]) / s, (m[:, 2, 1] - m[:, 1, 2]) / s), axis=-1)
+        quaternions[pivots == 1] = case[pivots == 1]
+
+        s = np.sqrt(np.maximum(1.0 + m[:, 1, 1] - m[:, 0, 0] - m[:, 2, 2], 0.0)) * 2.0
+        case = np.stack(((m[:, 0, 1] + m[:, 1, 0]) / s, 0.25 * s, (m[:, 1, 2] + m[:, 2, 1]) / s, (m[:, 0, 2] - m[:, 2, 0]) / s), axis=-1)
+        quaternions[pivots == 2] = case[pivots == 2]
+
+        s = np.sqrt(np.maximum(1.0 + m[:, 2, 2] - m[:, 0, 0] - m[:, 1, 1], 0.0)) * 2.0
+        case = np.stack(((m[:, 0, 2] + m[:, 2, 0]) / s, (m[:, 1, 2] + m[:, 2, 1]) / s, 0.25 * s, (m[:, 1, 0] - m[:, 0, 1]) / s), axis=-1)
+        quaternions[pivots == 3] = case[pivots == 3]
+
+    return quaternions
+
+def quaternions_to_matrices(quaternions):
+    # type: (np.ndarray) -> np.ndarray
+    """ Inverse of matrices_to_quaternions """
+    x, y, z, w = quaternions.T
+
+    matrices = np.empty((len(quaternions), 3, 3))
+    matrices[:, 0] = np.stack((1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - z * w), 2.0 * (x * z + y * w)), axis=-1)
+    matrices[:, 1] = np.stack((2.0 * (x * y + z * w), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - x * w)), axis=-1)
+    matrices[:, 2] = np.stack((2.0 * (x * z - y * w), 2.0 * (y * z + x * w), 1.0 - 2.0 * (x * x + y * y)), axis=-1)
+    return matrices
+
+def slerp_quaternions(fr, to, factor):
+    # type: (np.ndarray, np.ndarray, float) -> np.ndarray
+    """ Shortest path slerp of Nx4 quaternions, falls back to nlerp for nearly equal rotations """
+    cos_theta = np.sum(fr * to, axis=-1)
+    to = np.where((cos_theta < 0.0)[:, None], -to, to)
+    cos_theta = np.abs(cos_theta)
+
+    theta = np.arccos(np.clip(cos_theta, -1.0, 1.0))
+    nearly_equal = cos_theta > 0.9995
+    sin_theta = np.where(nearly_equal, 1.0, np.sin(theta))
+
+    fr_weight = np.where(nearly_equal, 1.0 - factor, np.sin((1.0 - factor) * theta) / sin_theta)
+    to_weight = np.where(nearly_equal, factor, np.sin(factor * theta) / sin_theta)
+
+    result = fr * fr_weight[:, None] + to * to_weight[:, None]
+    return result / np.linalg.norm(result, axis=-1)[:, None]
+
+def slerp_vectors(fr, to, factor):
+    # type: (np.ndarray, np.ndarray, float) -> np.ndarray
+    """ Rotate Nx3 vectors fr towards to by factor of the angle between them keeping fr length.
+        Zero vectors are kept, opposite ones turn around any axis perpendicular to fr """
+    fr_length = np.linalg.norm(fr, axis=-1)
+    to_length = np.linalg.norm(to, axis=-1)
+    zero = (fr_length < 1e-12) | (to_length < 1e-12)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fr_dir = fr / fr_length[:, None]
+        to_dir = to / to_length[:, None]
+
+    cos_theta = np.clip(np.sum(fr_dir * to_dir, axis=-1), -1.0, 1.0)
+    theta = np.arccos(cos_theta)
+
+    axis = np.cross(fr_dir, to_dir)
+    axis_length = np.linalg.norm(axis, axis=-1)
+
+    opposite = ~zero & (axis_length < 1e-6) & (cos_theta < 0.0)
+    if opposite.any():
+        helper = np.where((np.abs(fr_dir[opposite, 0]) < 0.9)[:, None], (1.0, 0.0, 0.0), (0.0, 1.0, 0.0))
+        axis[opposite] = np.cross(fr_dir[opposite], helper)
+        axis_length = np.linalg.norm(axis, axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        axis = axis / axis_length[:, None]
+
+    # axis is perpendicular to fr so Rodrigues' formula loses its last term
+    angle = factor * theta
+    result = fr * np.cos(angle)[:, None] + np.cross(axis, fr) * np.sin(angle)[:, None]
+
+    keep = zero | (axis_length < 1e-12)
+    result[keep] = fr[keep]
+    return result
+
 class AnchorAttribute(object):
     def __init__(self, attr_type):
         self.type = attr_type
@@ -630,88 +883,302 @@ class AnchorAttribute(object):
         else:
             return int(np.round(lerp(fr, to, factor)))
 
-#TODO: this one duplicates state export (not sure what to do but at least remove interpolating duplicate)
-def rebuild_geo_from_json(data):
-    # type: (str) -> hou.Geometry
-    
+    def interpolate_batch(self, fr, to, factor):
+        # type: (np.ndarray, np.ndarray, float) -> np.ndarray
+        """ Vectorized interpolate over N values. Scalars are (N,), tuples are (N, size) """
+        fr = np.asarray(fr, dtype=np.float64)
+        to = np.asarray(to, dtype=np.float64)
+
+        if self.type == AnchorAttributeType.VECTOR_ARBITRARY:
+            return slerp_vectors(fr, to, factor)
+
+        if self.type == AnchorAttributeType.ORIENTATION:
+            fr_rotations = matrices_to_quaternions(euler_to_matrices(fr).transpose(0, 2, 1))
+            to_rotations = matrices_to_quaternions(euler_to_matrices(to).transpose(0, 2, 1))
+            rotations = slerp_quaternions(fr_rotations, to_rotations, factor)
+            return matrices_to_euler(quaternions_to_matrices(rotations).transpose(0, 2, 1))
+
+        return lerp(fr, to, factor)
+
+    def interpolate_to_neighbours(self, values, neighbour_values, factor):
+        # type: (list, list, float) -> list
+        """ Interpolate every value towards its neighbour value in one batch.
+            Values without a neighbour (None) are kept as is """
+        rows = [row for row, neighbour_value in enumerate(neighbour_values) if neighbour_value is not None]
+        result = list(values)
+
+        if not rows:
+            return result
+
+        interpolated = self.interpolate_batch([values[row] for row in rows], [neighbour_values[row] for row in rows], factor).tolist()
+
+        is_scalar = AnchorAttributeType.meta[self.type][2] < 2
+        for row, value in zip(rows, interpolated):
+            result[row] = value if not is_scalar or isinstance(values[row], float) else int(np.round(value))
+
+        return result
+
+# Controls parm data. Anchors are stored as columns:
+#   controls (n, 3, 3) float64, flags (n,) int, tags list[str], attribs {name: (n,) or (n, size) array}
+# Packed string is "<magic><version>:" followed by base64 of
+#   uint32 header size | json header | raw little endian blocks listed in the header
+CONTROLS_MAGIC = "hipie_pen"
+CONTROLS_VERSION = 1
+
+def attribute_dtype(attribute_type):
+    return np.int64 if attribute_type == AnchorAttributeType.INTEGER_LADDER else np.float64
+
+def attribute_column(attribute_type, values):
+    # type: (int, list) -> np.ndarray
+    tuple_size = AnchorAttributeType.meta[attribute_type][2]
+    column = np.array(values, dtype=attribute_dtype(attribute_type))
+    return column.reshape(-1, tuple_size) if tuple_size > 1 else column.reshape(-1)
+
+def controls_from_json(data):
+    # type: (dict) -> dict
+    """ Convert json controls data (the format used before packing) to columns """
     anchors = data["anchors"]
-    attrib_meta = data["attrib_meta"]
-    prims = data["prims"]
 
-    curve_geo = hou.Geometry()
+    attribs = {}
+    for attribute_name, attribute_type in data["attrib_meta"]:
+        default_value = AnchorAttributeType.default_value(attribute_type)
+        attribs[attribute_name] = attribute_column(attribute_type, 
+            [anchor["attribs"].get(attribute_name, default_value) for anchor in anchors])
+
+    return {
+        "attrib_meta": [list(attrib) for attrib in data["attrib_meta"]],
+        "controls": np.array([anchor["controls"] for anchor in anchors], dtype=np.float64).reshape(-1, 3, 3),
+        "flags": np.array([anchor["flag"] for anchor in anchors], dtype=np.int64),
+        "tags": [anchor.get("tag", "") for anchor in anchors],
+        "attribs": attribs,
+        "prims": data["prims"],
+        "selection": data.get("selection", [])
+    }
 
-    attrib_types = {}
+def dumps_controls(data):
+    # type: (dict) -> str
+    blocks = [("controls", data["controls"].astype("<f8"))]
+    blocks.append(("flags", data["flags"].astype("<i8")))
+    for attribute_name, attribute_type in data["attrib_meta"]:
+        blocks.append(("attrib:" + attribute_name, data["attribs"][attribute_name].astype(np.dtype(attribute_dtype(attribute_type)).newbyteorder("<"))))
+
+    header = {
+        "count": len(data["flags"]),
+        "attrib_meta": data["attrib_meta"],
+        "prims": data["prims"],
+        "selection": data["selection"],
+        # most anchors are untagged
+        "tags": [[anchor_index, tag] for anchor_index, tag in enumerate(data["tags"]) if tag],
+        "blocks": [[name, block.dtype.str, block.shape] for name, block in blocks]
+    }
+    header = json.dumps(header).encode("utf-8")
+
+    payload = b"".join([struct.pack("<I", len(header)), header] + [np.ascontiguousarray(block).tobytes() for _, block in blocks])
+    return "{}{}:{}".format(CONTROLS_MAGIC, CONTROLS_VERSION, base64.b64encode(payload).decode("ascii"))
+
+def loads_controls(controls):
+    # type: (str) -> dict
+    """ Read controls parm string, both packed and json """
+    if not controls.startswith(CONTROLS_MAGIC):
+        return controls_from_json(json.loads(controls))
+
+    version, packed = controls[len(CONTROLS_MAGIC):].split(":", 1)
+    if int(version) > CONTROLS_VERSION:
+        raise ValueError("Unsupported pen tool controls version: {}".format(version))
+
+    payload = base64.b64decode(packed)
+    header_size = struct.unpack_from("<I", payload)[0]
+    header = json.loads(payload[4:4 + header_size].decode("utf-8"))
+
+    blocks = {}
+    offset = 4 + header_size
+    for name, dtype, shape in header["blocks"]:
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        blocks[name] = np.frombuffer(payload, dtype=dtype, count=size // dtype.itemsize, offset=offset).reshape(shape).astype(dtype.newbyteorder("="))
+        offset += size
+
+    tags = [""] * header["count"]
+    for anchor_index, tag in header["tags"]:
+        tags[anchor_index] = tag
+
+    return {
+        "attrib_meta": header["attrib_meta"],
+        "controls": blocks["controls"],
+        "flags": blocks["flags"],
+        "tags": tags,
+        "attribs": {attribute_name: blocks["attrib:" + attribute_name] for attribute_name, _ in header["attrib_meta"]},
+        "prims": header["prims"],
+        "selection": header["selection"]
+    }
 
-    for attrib_data in attrib_meta:
-        attrib_name = attrib_data[0]
-        attrib_type = attrib_data[1]
-        curve_geo.addAttrib(hou.attribType.Point, attrib_name, AnchorAttributeType.meta[attrib_type][0], create_local_variable=False)
-        attrib_types[attrib_name] = attrib_type
+def set_curve_attribs_globals(geo, attrib_meta):
+    # type: (hou.Geometry, list) -> None
+    """ Detail attributes listing roll and orient attributes for the SOPs below """
+    for global_name, attribute_type in (("roll_attribs", AnchorAttributeType.VECTOR_UP), ("orient_attribs", AnchorAttributeType.ORIENTATION)):
+        attrib_names = [attrib_name for attrib_name, attrib_type in attrib_meta if attrib_type == attribute_type]
+        global_attrib = geo.findGlobalAttrib(global_name)
+
+        if attrib_names:
+            if global_attrib is None:
+                geo.addAttrib(hou.attribType.Global, global_name, "", create_local_variable=False)
+            geo.setGlobalAttribValue(global_name, " ".join(attrib_names))
+        elif global_attrib is not None:
+            global_attrib.destroy()
+
+def add_curve_attribs(geo, attrib_meta):
+    # type: (hou.Geometry, list) -> None
+    for attrib_name, attrib_type in attrib_meta:
+        geo.addAttrib(hou.attribType.Point, attrib_name, AnchorAttributeType.meta[attrib_type][0], create_local_variable=False)
+
+    set_curve_attribs_globals(geo, attrib_meta)
+
+def update_curve_attribs(geo, old_attrib_meta, attrib_meta):
+    # type: (hou.Geometry, list, list) -> None
+    """ Add, retype and drop anchor attributes of built curve geo in place.
+        Added attributes are constant defaults, same as interpolating them would give """
+    old_types = dict((attrib_name, attrib_type) for attrib_name, attrib_type in old_attrib_meta)
+    new_types = dict((attrib_name, attrib_type) for attrib_name, attrib_type in attrib_meta)
+
+    for attrib_name, attrib_type in old_attrib_meta:
+        if new_types.get(attrib_name) != attrib_type:
+            geo.findPointAttrib(attrib_name).destroy()
+
+    add_curve_attribs(geo, [(attrib_name, attrib_type) for attrib_name, attrib_type in attrib_meta if old_types.get(attrib_name) != attrib_type])
+    set_curve_attribs_globals(geo, attrib_meta)
+
+def curve_point_count(prims):
+    # type: (list) -> int
+    return sum(3 * (prim[1] - prim[0]) - (0 if prim[2] else 2) for prim in prims if (prim[1] - prim[0]) > 1)
+
+def build_prim_buffers(prims, controls, attribs, attrib_types):
+    # type: (list, np.ndarray, dict, dict) -> tuple
+    """ Point positions and attribute values of a batch of exported prims.
+        Works on plain arrays only, so batches can be built in parallel """
+    anchors = []
+    rows = []
+    control_indices = []
+    prev_rows = []
+    next_rows = []
+    num_anchors = 0
+
+    for start, end, is_closed in (prim[:3] for prim in prims):
+        prim_len = end - start
+        prim_rows = np.arange(num_anchors, num_anchors + prim_len)
+        num_anchors += prim_len
+
+        # outer handles of open prims are skipped
+        point_rows = np.repeat(prim_rows, 3)[1:-1]
+        point_controls = np.tile(np.arange(3), prim_len)[1:-1]
+
+        if is_closed:
+            point_rows = np.append(point_rows, (prim_rows[-1], prim_rows[0]))
+            point_controls = np.append(point_controls, (2, 0))
+
+        # ends of open prims point to themselves as they have no neighbour
+        prim_prev_rows = np.roll(prim_rows, 1)
+        prim_next_rows = np.roll(prim_rows, -1)
+        if not is_closed:
+            prim_prev_rows[0] = prim_rows[0]
+            prim_next_rows[-1] = prim_rows[-1]
+
+        anchors.append(np.arange(start, end))
+        rows.append(point_rows)
+        control_indices.append(point_controls)
+        prev_rows.append(prim_prev_rows)
+        next_rows.append(prim_next_rows)
+
+    anchors = np.concatenate(anchors)
+    rows = np.concatenate(rows)
+    control_indices = np.concatenate(control_indices)
+    prev_rows = np.concatenate(prev_rows)
+    next_rows = np.concatenate(next_rows)
+
+    no_prev = prev_rows == np.arange(num_anchors)
+    no_next = next_rows == np.arange(num_anchors)
+
+    positions = controls[anchors][rows, control_indices]
+
+    attrib_values = {}
+    for attrib_name, attrib_type in attrib_types.items():
+        values = attribs[attrib_name][anchors]
+
+        if attrib_type != AnchorAttributeType.INTEGER_LADDER:
+            attribute = AnchorAttribute(attrib_type)
+            prev_values = attribute.interpolate_batch(values, values[prev_rows], ONE_THIRD)
+            next_values = attribute.interpolate_batch(values, values[next_rows], ONE_THIRD)
+            prev_values[no_prev] = values[no_prev]
+            next_values[no_next] = values[no_next]
+        else:
+            prev_values = values[prev_rows]
+            next_values = values
 
-    roll_attribs = [attrib_name for attrib_name in attrib_types if attrib_types[attrib_name] == AnchorAttributeType.VECTOR_UP]
-    orient_attribs = [attrib_name for attrib_name in attrib_types if attrib_types[attrib_name] == AnchorAttributeType.ORIENTATION]
+        attrib_values[attrib_name] = np.stack((prev_values, values, next_values))[control_indices, rows]
 
-    if roll_attribs:
-        curve_geo.addAttrib(hou.attribType.Global, "roll_attribs", "", create_local_variable=False)
-        curve_geo.setGlobalAttribValue("roll_attribs", " ".join(roll_attribs))
+    return positions, attrib_values, anchors[rows], control_indices
 
-    if orient_attribs:
-        curve_geo.addAttrib(hou.attribType.Global, "orient_attribs", "", create_local_variable=False)
-        curve_geo.setGlobalAttribValue("orient_attribs", " ".join(orient_attribs))
+def create_curve_geo(attrib_meta):
+    # type: (list) -> hou.Geometry
+    curve_geo = hou.Geometry()
 
+    add_curve_attribs(curve_geo, attrib_meta)
+    curve_geo.addAttrib(hou.attribType.Point, "tag", "", create_local_variable=False)
     curve_geo.addAttrib(hou.attribType.Prim, "name", "", create_local_variable=False)
 
+    return curve_geo
 
-    for prim_num, prim in enumerate(prims):
+def build_curve_prims(curve_geo, prims, controls, attribs, attrib_types, tags, workers=1):
+    # type: (hou.Geometry, list, np.ndarray, dict, dict, list, int) -> tuple
+    """ Append bezier prims of exportable prims to curve geo, this is the only curve export path.
+        Returns anchor rows and control indices of the new points in point order.
+        Opt-in workers > 1 build prim buffers in a thread pool and only assemble the
+        geometry on the calling thread. Most of the build holds the GIL so it's rarely faster """
+    export_prims = [prim for prim in prims if (prim[1] - prim[0]) > 1]
 
-        prim_points = [anchor["controls"][index] for anchor in anchors[prim[0]:prim[1]] for index in range(3)]
-        prim_attribs = [(anchor_index, attrib_index) for anchor_index in range(prim[0], prim[1]) for attrib_index in range(3)]
+    if not export_prims:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
 
-        for anchor_index in range(prim[0], prim[1]):
-            
-            prev_index = anchor_index - 1 if anchor_index > prim[0] else prim[1] - 1 if prim[2] else None
-            next_index = anchor_index + 1 if anchor_index < prim[1] - 1 else prim[0] if prim[2] else None
+    point_start = curve_geo.intrinsicValue("pointcount")
 
-            anchors[anchor_index]["interp_attribs"] = {}
-            
-            for attrib_name in attrib_types:
+    for prim in export_prims:
+        bezier_prim = curve_geo.createBezierCurve(curve_point_count([prim]), prim[2], 4) # type: hou.Face
+        bezier_prim.setAttribValue("name", prim[3])
 
-                attribute = AnchorAttribute(attrib_types[attrib_name])
-                attrib_value = anchors[anchor_index]["attribs"][attrib_name]
-                attribute.value = attrib_value
+    build_prims = ft.partial(build_prim_buffers, controls=controls, attribs=attribs, attrib_types=attrib_types)
 
-                if attribute.type != AnchorAttributeType.INTEGER_LADDER:
-                    prev_value = attribute.interpolate(attrib_value, anchors[prev_index]["attribs"][attrib_name], ONE_THIRD) if prev_index is not None else attrib_value
-                    next_value = attribute.interpolate(attrib_value, anchors[next_index]["attribs"][attrib_name], ONE_THIRD) if next_index is not None else attrib_value
-                else:
-                    prev_value = anchors[prev_index]["attribs"][attrib_name] if prev_index is not None else attrib_value
-                    next_value = attrib_value
-                
-                anchors[anchor_index]["interp_attribs"][attrib_name] = (prev_value, attrib_value, next_value)
+    if workers > 1 and len(export_prims) > 1:
+        # contiguous batches keep the points in prim order
+        num_prims = len(export_prims)
+        batches = [export_prims[i * num_prims // workers:(i + 1) * num_prims // workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            buffers = list(executor.map(build_prims, [batch for batch in batches if batch]))
+    else:
+        buffers = [build_prims(export_prims)]
 
+    point_anchors = np.concatenate([buffer[2] for buffer in buffers])
+    point_controls = np.concatenate([buffer[3] for buffer in buffers])
 
-        if (prim[1]-prim[0]) > 1:
-            prim_export_points = prim_points[1:-1]
-            prim_export_attribs = prim_attribs[1:-1]
+    set_point_attrib_values(curve_geo, "P", np.concatenate([buffer[0] for buffer in buffers]), point_start)
 
-            # if closed
-            if prim[2]:
-                prim_export_points.extend((prim_points[-1], prim_points[0]))
-                prim_export_attribs.extend((prim_attribs[-1], prim_attribs[0]))
-            
-            bezier_prim = curve_geo.createBezierCurve(len(prim_export_points), prim[2], 4) # type: hou.Face
-            bezier_prim.setAttribValue("name", prim[3])
+    point_tags = [tags[anchor_index] if control_index == 1 else "" for anchor_index, control_index in zip(point_anchors.tolist(), point_controls.tolist())]
+    set_point_attrib_values(curve_geo, "tag", point_tags, point_start)
 
-            for ptnum, point in enumerate(bezier_prim.points()): # type: int, hou.Point
-                point.setPosition(prim_export_points[ptnum])
-                
-                anchor_index = prim_export_attribs[ptnum][0]
-                control_index = prim_export_attribs[ptnum][1]
+    for attrib_name in attrib_types:
+        set_point_attrib_values(curve_geo, attrib_name, np.concatenate([buffer[1][attrib_name] for buffer in buffers]), point_start)
 
-                for attrib_name in attrib_types:
-                    attrib_value = anchors[anchor_index]["interp_attribs"][attrib_name][control_index]
-                    point.setAttribValue(attrib_name, attrib_value)
-    
+    return point_anchors, point_controls
+
+def rebuild_geo_from_json(data, workers=1):
+    # type: (dict, int) -> hou.Geometry
+
+    if "anchors" in data:
+        data = controls_from_json(data)
+
+    attrib_meta = data["attrib_meta"]
+    curve_geo = create_curve_geo(attrib_meta)
+
+    attrib_types = dict((attrib_name, attrib_type) for attrib_name, attrib_type in attrib_meta)
+    build_curve_prims(curve_geo, data["prims"], data["controls"], data["attribs"], attrib_types, data["tags"], workers)
 
     return curve_geo
 
@@ -723,10 +1190,11 @@ def sync_attributes_with_node(node):
     if not len(controls):
         return
 
-    data = json.loads(controls)
+    data = loads_controls(controls)
 
-    anchors = data["anchors"]
+    num_anchors = len(data["flags"])
     attrib_meta = data["attrib_meta"]
+    old_attrib_meta = [list(attrib) for attrib in attrib_meta]
 
     num_attributes = node.parm("num_attributes").evalAsInt()
 
@@ -752,18 +1220,31 @@ def sync_attributes_with_node(node):
                 if type_mismatch:
                     a = next(a for a in attrib_meta if a[0] == attribute_name)
                     a[1] = attribute_type
-                for anchor in anchors:
-                    anchor["attribs"][attribute_name] = AnchorAttributeType.default_value(attribute_type)
+                data["attribs"][attribute_name] = attribute_column(attribute_type, 
+                    [AnchorAttributeType.default_value(attribute_type)] * num_anchors)
 
     for attribute_name, attribute_type in attrib_meta:
         if attribute_name not in attribute_names and attribute_name != "__pr":
-            for anchor in anchors:
-                if attribute_name in anchor["attribs"]:
-                    del anchor["attribs"][attribute_name]
+            data["attribs"].pop(attribute_name, None)
 
     data["attrib_meta"] = [a for a in attrib_meta if a[0] in attribute_names or a[0]=="__pr"]
 
-    node.parm("controls").set(json.dumps(data))
+    stash_geo = node.parm("stash").evalAsGeometry() # type: hou.Geometry
+    stash_built = stash_geo is not None and stash_geo.intrinsicValue("pointcount") == curve_point_count(data["prims"]) \
+        and all(stash_geo.findPointAttrib(attrib_name) is not None for attrib_name in [a[0] for a in old_attrib_meta] + ["tag"])
+
+    if data["attrib_meta"] != old_attrib_meta:
+        node.parm("controls").set(dumps_controls(data))
+    elif stash_built:
+        return
+
+    # curve shape doesn't change so the built stash only gets its attributes updated
+    if stash_built:
+        geo = stash_geo.freeze()
+        update_curve_attribs(geo, old_attrib_meta, data["attrib_meta"])
+        node.parm("stash").set(geo)
+        node.parm("guide_stash").set(geo)
+        return
 
     geo = rebuild_geo_from_json(data)
 
@@ -773,32 +1254,106 @@ def sync_attributes_with_node(node):
 
 # Anchor for Bezier curve
 class AnchorPoint(object):
+    """ Anchor view. Positions, type and geo points live in an AnchorStore row once
+        the anchor is added to the editor, detached anchors keep their own copy """
 
     def __init__(self):
-        self.position = hou.Vector3()
-        self.controls = [hou.Vector3(), hou.Vector3()]
-        self.anchor_type = AnchorType.SMOOTH
+        self.store = None # type: AnchorStore
+        self._row = -1
+
+        self._points = np.zeros((3, 3), dtype=np.float64)
+        self._anchor_type = AnchorType.SMOOTH
+        self._geo_points = np.full(3, -1, dtype=np.int64)
+
         self.tag = ""
         self.attributes = {} 
         self.interpolated_attribs = {}
 
-        self.geo_points = []
-        self.anchor_index = -1
+    def attach(self, store, row):
+        # type: (AnchorStore, int) -> None
+        store.points[row] = self._points
+        store.anchor_types[row] = self._anchor_type
+        store.geo_points[row] = self._geo_points
+        self.store = store
+        self._row = row
+        self._points = self._geo_points = None
+
+    def detach(self):
+        # the store sets the row right before detaching
+        self._points = self.store.points[self._row].copy()
+        self._anchor_type = int(self.store.anchor_types[self._row])
+        self._geo_points = self.store.geo_points[self._row].copy()
+        self.store = None
+        self._row = -1
+
+    @property
+    def row(self):
+        # rows at or past the store's valid_rows may be stale after an insert or remove
+        if self.store is not None and self._row >= self.store.valid_rows:
+            self.store.update_rows()
+        return self._row
+
+    @property
+    def points(self):
+        # type: () -> np.ndarray
+        """ (in control, position, out control) rows """
+        return self.store.points[self.row] if self.store is not None else self._points
+
+    @property
+    def anchor_index(self):
+        return self.row
+
+    @property
+    def position(self):
+        return hou.Vector3(self.points[1].tolist())
+
+    @position.setter
+    def position(self, position):
+        self.points[1] = tuple(position)
+
+    @property
+    def controls(self):
+        return AnchorControls(self)
+
+    @controls.setter
+    def controls(self, controls):
+        self.points[0] = tuple(controls[0])
+        self.points[2] = tuple(controls[1])
+
+    @property
+    def anchor_type(self):
+        return int(self.store.anchor_types[self.row]) if self.store is not None else self._anchor_type
+
+    @anchor_type.setter
+    def anchor_type(self, anchor_type):
+        if self.store is not None:
+            self.store.anchor_types[self.row] = anchor_type
+        else:
+            self._anchor_type = anchor_type
+
+    @property
+    def geo_points(self):
+        return AnchorGeoPoints(self)
+
+    @geo_points.setter
+    def geo_points(self, geo_points):
+        self.geo_point_numbers[:] = [-1 if point is None else point for point in geo_points]
+
+    @property
+    def geo_point_numbers(self):
+        # type: () -> np.ndarray
+        return self.store.geo_points[self.row] if self.store is not None else self._geo_points
 
     def __getitem__(self, key):
-        if key == 0:
-            return self.controls[0]
-        elif key == 1:
-            return self.position
-        return self.controls[1]
+        return hou.Vector3(self.points[key].tolist())
 
     @property
     def in_control(self):
-        return self.controls[0]
+        return self[0]
     
     @property
     def out_control(self):
-        return self.controls[1]
+        return self[2]
 
     def move_control(self, control_index, new_position, aligned=True, symmetric=False, rotate_corner=False):
         # type: (int, hou.Vector3, bool) -> None
@@ -838,11 +1393,283 @@ class AnchorPoint(object):
         self.controls[0] += diff
         self.controls[1] += diff
 
+class AnchorControls(object):
+    """ In and out controls of an anchor as a two items sequence """
+
+    def __init__(self, anchor):
+        # type: (AnchorPoint) -> None
+        self.anchor = anchor
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[control_index] for control_index in range(2)[index]]
+        return self.anchor[(0, 2)[index]]
+
+    def __setitem__(self, index, position):
+        self.anchor.points[(0, 2)[index]] = tuple(position)
+
+    def __iter__(self):
+        return iter(self[:])
+
+class AnchorGeoPoints(object):
+    """ Curve geo point numbers of an anchor controls, None if the control is not exported """
+
+    def __init__(self, anchor):
+        # type: (AnchorPoint) -> None
+        self.anchor = anchor
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        point = int(self.anchor.geo_point_numbers[index])
+        return point if point >= 0 else None
+
+    def __setitem__(self, index, point):
+        self.anchor.geo_point_numbers[index] = -1 if point is None else point
+
+    def __iter__(self):
+        return (self[index] for index in range(3))
+
+class AnchorStore(object):
+    """ Structure of arrays storage of the editor anchors. 
+        Rows follow the anchors order and AnchorPoint objects are views over them.
+        Rows of views are renumbered lazily, only views before valid_rows are up to date """
+
+    def __init__(self):
+        self.views = [] # type: list[AnchorPoint]
+        self.valid_rows = 0
+        self._points = np.zeros((0, 3, 3), dtype=np.float64)
+        self._anchor_types = np.zeros(0, dtype=np.int8)
+        self._geo_points = np.zeros((0, 3), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.views)
+
+    @property
+    def points(self):
+        # type: () -> np.ndarray
+        return self._points[:len(self.views)]
+
+    @property
+    def anchor_types(self):
+        # type: () -> np.ndarray
+        return self._anchor_types[:len(self.views)]
+
+    @property
+    def geo_points(self):
+        # type: () -> np.ndarray
+        return self._geo_points[:len(self.views)]
+
+    def columns(self, size):
+        return self._points[:size], self._anchor_types[:size], self._geo_points[:size]
+
+    def reserve(self, size):
+        capacity = len(self._anchor_types)
+        if size <= capacity:
+            return
+
+        capacity = max(size, 2 * capacity, 16)
+        count = len(self.views)
+        for column_name in ("_points", "_anchor_types", "_geo_points"):
+            column = getattr(self, column_name) # type: np.ndarray
+            grown_column = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown_column[:count] = column[:count]
+            setattr(self, column_name, grown_column)
+
+    def update_rows(self):
+        views = self.views
+        for row in range(self.valid_rows, len(views)):
+            views[row]._row = row
+        self.valid_rows = len(views)
+
+    def invalidate_rows(self, start):
+        self.valid_rows = min(self.valid_rows, start)
+
+    def insert(self, index, anchors):
+        # type: (int, list[AnchorPoint]) -> None
+        count = len(self.views)
+        num_anchors = len(anchors)
+        self.reserve(count + num_anchors)
+
+        if index < count:
+            for column in self.columns(count + num_anchors):
+                column[index + num_anchors:] = column[index:count]
+            self.invalidate_rows(index)
+        elif self.valid_rows == count:
+            self.valid_rows += num_anchors
+
+        self.views[index:index] = anchors
+        for row, anchor in enumerate(anchors, index):
+            anchor.attach(self, row)
+
+    def append(self, anchor):
+        # type: (AnchorPoint) -> None
+        self.insert(len(self.views), [anchor])
+
+    def extend(self, positions, anchor_types):
+        # type: (np.ndarray, np.ndarray) -> list[AnchorPoint]
+        """ Append anchors created straight from (n, 3, 3) positions and anchor types """
+        count = len(self.views)
+        num_anchors = len(positions)
+        self.reserve(count + num_anchors)
+
+        anchors = [AnchorPoint() for _ in range(num_anchors)]
+        for row, anchor in enumerate(anchors, count):
+            anchor.store = self
+            anchor._row = row
+            anchor._points = anchor._geo_points = None
+        self.views.extend(anchors)
+        if self.valid_rows == count:
+            self.valid_rows += num_anchors
+
+        self._points[count:count + num_anchors] = positions
+        self._anchor_types[count:count + num_anchors] = anchor_types
+        self._geo_points[count:count + num_anchors] = -1
+        return anchors
+
+    def remove(self, index, num_anchors=1):
+        count = len(self.views)
+        for row, anchor in enumerate(self.views[index:index + num_anchors], index):
+            anchor._row = row
+            anchor.detach()
+
+        for column in self.columns(count):
+            column[index:count - num_anchors] = column[index + num_anchors:]
+
+        del self.views[index:index + num_anchors]
+        self.invalidate_rows(index)
+
+    def clear(self):
+        self.update_rows()
+        for anchor in self.views:
+            anchor.detach()
+        self.views = []
+        self.valid_rows = 0
+
+    def reorder(self, start, order):
+        # type: (int, np.ndarray) -> None
+        """ Permute rows from start with relative order indices """
+        end = start + len(order)
+        for column in self.columns(end):
+            column[start:end] = column[start:end][order]
+
+        views = self.views[start:end]
+        self.views[start:end] = [views[index] for index in order.tolist()]
+        self.invalidate_rows(start)
+
+class PrimRow(object):
+    """ [start, end, closed, name] view of a PrimTable row """
+
+    def __init__(self, table, row):
+        # type: (PrimTable, int) -> None
+        self.table = table
+        self.row = row
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, index):
+        if index < 2:
+            return int(self.table.offsets[self.row, index])
+        if index == 2:
+            return bool(self.table.closed[self.row])
+        return self.table.names[self.row]
+
+    def __setitem__(self, index, value):
+        if index < 2:
+            self.table.offsets[self.row, index] = value
+        elif index == 2:
+            self.table.closed[self.row] = value
+        else:
+            self.table.names[self.row] = value
+
+    def __iter__(self):
+        return (self[index] for index in range(4))
+
+class PrimTable(object):
+    """ Prims as [start, end) anchor offsets with closed flags and names. 
+        Rows are accessed as [start, end, closed, name] sequences """
+
+    def __init__(self, prims=()):
+        prims = [list(prim) for prim in prims]
+        self._offsets = np.array([prim[:2] for prim in prims], dtype=np.int64).reshape(-1, 2)
+        self._closed = np.array([prim[2] for prim in prims], dtype=bool)
+        self.names = [prim[3] for prim in prims]
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def offsets(self):
+        # type: () -> np.ndarray
+        return self._offsets[:len(self.names)]
+
+    @property
+    def closed(self):
+        # type: () -> np.ndarray
+        return self._closed[:len(self.names)]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.names)
+        if index < 0 or index >= len(self.names):
+            raise IndexError("prim index out of range")
+        return PrimRow(self, index)
+
+    def __iter__(self):
+        return (PrimRow(self, index) for index in range(len(self.names)))
+
+    def __delitem__(self, index):
+        count = len(self.names)
+        self._offsets[index:count - 1] = self._offsets[index + 1:count]
+        self._closed[index:count - 1] = self._closed[index + 1:count]
+        del self.names[index]
+
+    def append(self, prim):
+        count = len(self.names)
+        if count == len(self._closed):
+            capacity = max(2 * count, 16)
+            self._offsets = np.resize(self._offsets, (capacity, 2))
+            self._closed = np.resize(self._closed, capacity)
+
+        self._offsets[count] = prim[:2]
+        self._closed[count] = prim[2]
+        self.names.append(prim[3])
+
+    def find(self, anchor_index):
+        # type: (int) -> int
+        """ Prim containing the anchor or None """
+        offsets = self.offsets
+        prims = np.flatnonzero((offsets[:, 0] <= anchor_index) & (anchor_index < offsets[:, 1]))
+        return int(prims[0]) if len(prims) else None
+
+    def find_many(self, anchor_indices):
+        # type: (list[int]) -> np.ndarray
+        """ Prims containing the anchors, -1 where there is none """
+        anchor_indices = np.asarray(anchor_indices, dtype=np.int64)
+        offsets = self.offsets
+        order = np.argsort(offsets[:, 0], kind="stable")
+        starts = offsets[order, 0]
+        found = np.searchsorted(starts, anchor_indices, side="right") - 1
+        prims = order[np.maximum(found, 0)]
+        valid = (found >= 0) & (anchor_indices < offsets[prims, 1])
+        return np.where(valid, prims, -1)
+
+    def to_list(self):
+        return [list(prim) for prim in self]
+
 CustomShapeAnchor = namedtuple("CustomShapeAnchor", ["in_control", "position", "out_control", "anchor_type"])
 
 UNTIE_TOLERANCE = 0.0001
 CORNER_TOLERANCE = 0.0000001
 
+# geo_prims entry of a removed prim
+DELETED_PRIM = -1
+
 class CustomShape:
 
     def __init__(self):
@@ -893,6 +1720,8 @@ class BezierEditor(object):
 
         self.editing_anchor = -1
         self.editable_handles = () # type: list[AnchorPoints]
+        # handle controls are hidden unless shown for the editing anchors
+        self.shown_handles = [] # type: list[PointControl]
         self.handle_points = [] # type: list[hou.Vector3]
         self.handle_lines = []
         self.curve_prim_under_cursor = None # type: int
@@ -915,7 +1744,7 @@ class BezierEditor(object):
         self.handles_snapping = True
 
         # Anchors
-        self.anchor_points = [] # type: list[AnchorPoint]
+        self.anchor_store = AnchorStore()
         self.anchor_points_controls = {} # type: dict[AnchorPoint, list[PointControl]]
 
         # Attributes
@@ -923,11 +1752,12 @@ class BezierEditor(object):
         
         # Editor controls
         self.point_controls = PointControlGroup(scene_viewer)
+        self.profiler = self.point_controls.profiler
         self.current_handle_controls = [] # type: list[PointControl]
 
         # Prims
         # Controls stored as flat list so prims are just ranges
-        self.prims = []
+        self.prims = PrimTable()
         self.geo_prims = []
         self.selection = []
         self.curve_geo = None # type: hou.Geometry
@@ -936,11 +1766,19 @@ class BezierEditor(object):
         self.custom_shapes = {} # type: dict[str, CustomShape]
         
         self.curve_geo_dirty = False
+        self.export_throttle = EditThrottle()
         self.attribs_dirty = True
         self.names_dirty = True
         self.tags_dirty = True
         self.disable_control_sync = False
 
+        # Incremental rebuild. Geo prims follow the prims order and geo_prims maps geo prim
+        # numbers back to prims, geo prims from the first dirty one on are rebuilt.
+        # DELETED_PRIM marks geo prims of removed prims waiting for the rebuild
+        self.geo_dirty_prims = set() # type: set[int]
+        self.geo_tracked = False
+        self.curve_geo_attribs = None # type: list[tuple[str, int]]
+
         self.point_controls.add_drawable("anchors")
         self.point_controls.add_drawable("handles")
 
@@ -1025,16 +1863,40 @@ class BezierEditor(object):
         self.selection_start = None 
         self.selection_viewport = None # type: hou.GeometryViewport
 
+        # per projection row membership while rubber-banding
+        self.box_selection_mask = None # type: np.ndarray
+        self.box_initial_mask = None # type: np.ndarray
+        self.box_anchors_mask = None # type: np.ndarray
+        self.box_layout_revision = -1
+
         # Houdini handles
         self.point_translate_handle = None # type: hou.Handle
         self.spin_handle = None # type: hou.Handle
         self.pscale_handle = None # type: hou.Handle
 
         # Multi-selection data
-        self.selection_box_positions = []
+        # (n, 3, 3) rest points of the selected anchors relative to the box center
+        self.selection_box_positions = np.zeros((0, 3, 3))
+        self.selection_box_anchors = [] # type: list[AnchorPoint]
         self.selection_box_size = hou.Vector3()
         self.reset_selection_box = False
 
+        # Text labels layout cache
+        self.names_geo_key = None
+        self.names_positions = np.zeros((0, 3))
+
+        # Arrowheads cache
+        self.arrowheads_geo = None # type: hou.Geometry
+        self.arrowheads_key = None
+        self.arrowheads_instances = None # type: np.ndarray
+        self.arrowheads_offsets = None # type: np.ndarray
+        self.arrowheads_scales = None # type: np.ndarray
+
+    @property
+    def anchor_points(self):
+        # type: () -> list[AnchorPoint]
+        return self.anchor_store.views
+
     def set_display_settings(self):
 
         guides_color = list(self.node.parmTuple("guides_color").eval()) + [1.0]
@@ -1174,9 +2036,9 @@ class BezierEditor(object):
         plane_transform = hou.hmath.identityTransform()
 
         if self.point_controls.projection_mode == ProjectionType.FREE:
-            cplane = self.scene_viewer.constructionPlane() # type: hou.ConstructionPlane
-            viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
-            plane_transform = cplane.transform if cplane.isVisible() else viewport.viewTransform() # type: hou.Matrix4
+            context = self.point_controls.viewport_context
+            cplane_visible, cplane_transform, _ = context.construction_plane()
+            plane_transform = cplane_transform if cplane_visible else context.view_transform() # type: hou.Matrix4
             plane_transform = hou.hmath.buildRotate(plane_transform.extractRotates())
         else:
             plane_transform = ProjectionType.plane_transform[self.point_controls.projection_mode]
@@ -1187,7 +2049,7 @@ class BezierEditor(object):
         for anchor in shape.anchors: # type: CustomShapeAnchor
             new_anchor = AnchorPoint()
 
-            self.anchor_points.append(new_anchor)
+            self.anchor_store.append(new_anchor)
 
             new_anchor.anchor_type = anchor.anchor_type
             new_anchor.position = position + anchor.position * plane_transform
@@ -1198,7 +2060,7 @@ class BezierEditor(object):
             self.sync_anchor_controls(new_anchor)
             self.reset_anchor_attributes(new_anchor)
 
-        self.update_anchors_indices()
+        self.mark_geo_dirty(primnum)
         self.select_prim(primnum)
         self.end_edit()
 
@@ -1222,29 +2084,20 @@ class BezierEditor(object):
         prim_anchors = self.anchor_points[prim[0]:prim[1]]
         numpt = len(self.anchor_points)
 
-        prim_points_pos = [anchor.position for anchor in prim_anchors]
-        prim_center = hou.Vector3(np.mean(prim_points_pos, axis=0))
+        prim_points = self.anchor_store.points[prim[0]:prim[1]]
+        prim_center = prim_points[:, 1].mean(axis=0)
+        new_points = prim_points - prim_center + tuple(position)
         
         self.prims.append([numpt, numpt + prim_len, prim[2], prim[3]])
         primnum = len(self.prims) - 1
 
-        for anchor in prim_anchors:
-
-            new_anchor = AnchorPoint()
-
-            self.anchor_points.append(new_anchor)
-
-            new_anchor.anchor_type = anchor.anchor_type
-            new_anchor.position = position + (anchor.position - prim_center)
-            new_anchor.controls[0] = position + (anchor.controls[0] - prim_center)
-            new_anchor.controls[1] = position + (anchor.controls[1] - prim_center)
+        new_anchors = self.anchor_store.extend(new_points, self.anchor_store.anchor_types[prim[0]:prim[1]])
 
+        for anchor, new_anchor in zip(prim_anchors, new_anchors):
             new_anchor.attributes = deepcopy(anchor.attributes)
-
             self.add_anchor_controls(new_anchor)
-            self.sync_anchor_controls(new_anchor)
 
-        self.update_anchors_indices()
+        self.mark_geo_dirty(primnum)
         self.select_prim(primnum)
         self.end_edit()
 
@@ -1287,6 +2140,8 @@ class BezierEditor(object):
         if self.curve_geo is None:
             return
 
+        layout_dirty = self.names_dirty
+
         if self.names_dirty:
 
             self.names_dirty = False
@@ -1295,28 +2150,36 @@ class BezierEditor(object):
                 value_text = self.prim_names_drawer.texts[index]
                 value_text.set_text(prim[3])
 
-        viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
+        projection = self.point_controls.update_screen_projection()
+        viewport_size = self.point_controls.viewport_context.viewport_size()
 
-        curve_prims = self.curve_geo.prims()
+        # label anchors on the curve only change with the geo, screen layout also with the camera
+        names_geo_key = (projection.positions_revision, id(self.curve_geo), 
+            self.curve_geo.intrinsicValue("pointcount"), tuple(self.geo_prims), frozenset(self.geo_dirty_prims), len(self.prims))
+        if layout_dirty or names_geo_key != self.names_geo_key:
+            self.names_geo_key = names_geo_key
+            self.names_positions = self.get_prim_names_positions()
 
-        geo_prim_index = 0       
+        self.prim_names_drawer.update_layout(self.names_positions, projection, viewport_size, layout_dirty)
 
-        for index, prim in enumerate(self.prims):
-            value_text = self.prim_names_drawer.texts[index]
+    def get_prim_names_positions(self):
+        # type: () -> np.ndarray
+        geo_prim_indices = dict((prim_num, geo_prim_index) for geo_prim_index, prim_num in enumerate(self.geo_prims))
+        names_positions = []
 
-            if prim[1] - prim[0] > 1:
-                
-                geo_prim = curve_prims[geo_prim_index] # type: hou.Prim
-                geo_prim_index += 1
-                prim_pos = geo_prim.boundingBox().center() if prim[2] else geo_prim.positionAtInterior(0.5, 0.0)
-                value_pos = viewport.mapToScreen(prim_pos)
-                value_text.position = hou.Vector3(value_pos.x(), value_pos.y(), 0.0)
+        for prim_num, prim in enumerate(self.prims):
+            if prim[1] - prim[0] > 1 and prim_num in geo_prim_indices:
+                geo_prim = self.curve_geo.prim(geo_prim_indices[prim_num]) # type: hou.Prim
+                names_positions.append(geo_prim.boundingBox().center() if prim[2] else geo_prim.positionAtInterior(0.5, 0.0))
             else:
-                value_pos = viewport.mapToScreen(self.anchor_points[prim[0]].position)
-                value_text.position = hou.Vector3(value_pos.x(), value_pos.y(), 0.0)
+                names_positions.append(self.anchor_points[prim[0]].position)
+
+        return np.array(names_positions, dtype=np.float64).reshape(-1, 3)
 
     def sync_attrib_value_drawer(self, attribute_name):
 
+        layout_dirty = self.attribs_dirty
+
         if self.attribs_dirty:
 
             self.attribs_dirty = False
@@ -1329,16 +2192,16 @@ class BezierEditor(object):
                 value = anchor.attributes[attribute_name]
                 formatted_attrib = formatter.format(*value) if isinstance(value, Iterable) else formatter.format(value)
                 value_text.set_text(formatted_attrib)
-        
-        viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
 
-        for index, anchor in enumerate(self.anchor_points):
-            value_text = self.attrib_value_drawer.texts[index]
-            anchor_screen_pos = viewport.mapToScreen(anchor.position)
-            value_text.position = hou.Vector3(anchor_screen_pos.x(), anchor_screen_pos.y(), 0)
+        # labels follow the anchors only, handle moves don't relayout them
+        projection = self.point_controls.update_screen_projection()
+        viewport_size = self.point_controls.viewport_context.viewport_size()
+        self.attrib_value_drawer.update_layout(self.anchor_store.points[:, 1], projection, viewport_size, layout_dirty)
 
     def sync_tags_drawer(self):
 
+        layout_dirty = self.tags_dirty
+
         if self.tags_dirty:
             
             self.tags_dirty = False
@@ -1347,12 +2210,10 @@ class BezierEditor(object):
                 value_text = self.anchor_tags_drawer.texts[index]
                 value_text.set_text(anchor.tag)
 
-        viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
-
-        for index, anchor in enumerate(self.anchor_points):
-            value_text = self.anchor_tags_drawer.texts[index]
-            anchor_screen_pos = viewport.mapToScreen(anchor.position)
-            value_text.position = hou.Vector3(anchor_screen_pos.x(), anchor_screen_pos.y(), 0)
+        # labels follow the anchors only, handle moves don't relayout them
+        projection = self.point_controls.update_screen_projection()
+        viewport_size = self.point_controls.viewport_context.viewport_size()
+        self.anchor_tags_drawer.update_layout(self.anchor_store.points[:, 1], projection, viewport_size, layout_dirty)
 
 
     def add_attributes_from_node(self):
@@ -1372,10 +2233,10 @@ class BezierEditor(object):
             self.multiselect_box = None
             return
 
-        selected_positions = [control.world_position for control in selected_controls]
+        selected_positions = np.array([control.world_position for control in selected_controls], dtype=np.float64)
 
-        max_pos = hou.Vector3(np.max(selected_positions, axis=0))
-        min_pos = hou.Vector3(np.min(selected_positions, axis=0))
+        max_pos = hou.Vector3(selected_positions.max(axis=0).tolist())
+        min_pos = hou.Vector3(selected_positions.min(axis=0).tolist())
 
         origin = (min_pos + max_pos) * 0.5
         size = (max_pos - origin) * 2.0
@@ -1383,14 +2244,29 @@ class BezierEditor(object):
         self.multiselect_box = (origin, size)
         self.selection_box_size = size
 
-        self.selection_box_positions = []
-
-        for control in selected_controls:
-            anchor = self.get_anchor_from_control(control)
-            self.selection_box_positions.append((anchor[0]-origin, anchor[1]-origin, anchor[2]-origin))
+        self.selection_box_anchors = [self.get_anchor_from_control(control) for control in selected_controls]
+        anchor_rows = [anchor.row for anchor in self.selection_box_anchors]
+        self.selection_box_positions = self.anchor_store.points[anchor_rows] - tuple(origin)
 
         self.reset_selection_box = True
 
+    def transform_selection_box(self, transform, box_center):
+        # type: (hou.Matrix4, hou.Vector3) -> None
+        """ Move the selected anchors to their rest points transformed by the box handle """
+        # row vectors, same as hou.Vector3 * hou.Matrix4
+        matrix = np.array(transform.asTupleOfTuples())
+        points = self.selection_box_positions.dot(matrix[:3, :3]) + matrix[3, :3] + tuple(box_center)
+
+        anchor_rows = [anchor.row for anchor in self.selection_box_anchors]
+        self.anchor_store.points[anchor_rows] = points
+        self.update_anchors_geo_positions(anchor_rows)
+
+        for anchor, anchor_points in zip(self.selection_box_anchors, points.tolist()):
+            controls = self.anchor_points_controls[anchor]
+            controls[0].world_position = hou.Vector3(anchor_points[0])
+            controls[1].world_position = hou.Vector3(anchor_points[2])
+            controls[2].world_position = hou.Vector3(anchor_points[1])
+
     def get_current_attribute(self):
         attribute_name = self.node.parm("current_attribute").evalAsString()
         self.current_attribute = self.current_attribute_class = None
@@ -1398,46 +2274,56 @@ class BezierEditor(object):
             self.current_attribute = attribute_name
             self.current_attribute_class = self.attribute_names[attribute_name]
 
-    def interpolate_anchor_attributes(self, anchor, anchor_index):
-        prev_index = self.get_prev_index(anchor_index)
-        next_index = self.get_next_index(anchor_index)
+    def interpolate_anchors_attributes(self, anchor_indices):
+        # type: (Iterable[int]) -> None
+        """ Interpolate prev/next attribute values of anchors, one batch per attribute """
+        anchors = [] # type: list[AnchorPoint]
+        prev_anchors = [] # type: list[AnchorPoint]
+        next_anchors = [] # type: list[AnchorPoint]
+
+        for anchor_index in anchor_indices:
+            anchor = self.anchor_points[anchor_index]
+            prev_index = self.get_prev_index(anchor_index)
+            next_index = self.get_next_index(anchor_index)
+
+            prev_anchor = self.anchor_points[prev_index] if prev_index is not None else None
+            next_anchor = self.anchor_points[next_index] if next_index is not None else None
+
+            anchors.append(anchor)
+            prev_anchors.append(prev_anchor)
+            next_anchors.append(next_anchor)
+
+        if not anchors:
+            return
 
         for attrib_name in self.attribute_names:
             attribute = self.attribute_names[attrib_name]
-            attrib_value = anchor.attributes[attrib_name]
+            values = [anchor.attributes[attrib_name] for anchor in anchors]
+            prev_neighbour_values = [prev_anchor.attributes[attrib_name] if prev_anchor is not None else None for prev_anchor in prev_anchors]
+
             if attribute.type != AnchorAttributeType.INTEGER_LADDER:
-                prev_value = attribute.interpolate(attrib_value, self.anchor_points[prev_index].attributes[attrib_name], ONE_THIRD) if prev_index is not None else attrib_value
-                next_value = attribute.interpolate(attrib_value, self.anchor_points[next_index].attributes[attrib_name], ONE_THIRD) if next_index is not None else attrib_value
+                next_neighbour_values = [next_anchor.attributes[attrib_name] if next_anchor is not None else None for next_anchor in next_anchors]
+                prev_values = attribute.interpolate_to_neighbours(values, prev_neighbour_values, ONE_THIRD)
+                next_values = attribute.interpolate_to_neighbours(values, next_neighbour_values, ONE_THIRD)
             else:
-                prev_value = self.anchor_points[prev_index].attributes[attrib_name] if prev_index is not None else attrib_value
-                next_value = attrib_value
-            anchor.interpolated_attribs[attrib_name] = (prev_value, next_value)
-
-    def interpolate_all_attributes(self):
-        if not self.anchor_points:
-            return
-
-        if len(self.anchor_points) == 1:
-            for attrib_name in self.attribute_names:
-                self.anchor_points[0].interpolated_attribs[attrib_name] = (
-                    self.anchor_points[0].attributes[attrib_name],
-                    self.anchor_points[0].attributes[attrib_name]
-                )
-            return
+                prev_values = [prev_value if prev_value is not None else value for value, prev_value in zip(values, prev_neighbour_values)]
+                next_values = values
 
-        for index, anchor in enumerate(self.anchor_points):
-            self.interpolate_anchor_attributes(anchor, index)
-             
+            for anchor, prev_value, next_value in zip(anchors, prev_values, next_values):
+                anchor.interpolated_attribs[attrib_name] = (prev_value, next_value)
 
     def begin_edit(self):
         self.state.log("Start edit transaction")
         self.edit_transaction = True
+        self.geo_dirty_prims = set()
+        self.geo_tracked = False
         self.scene_viewer.beginStateUndo("IE|Pen: Curve Modify")
 
     def end_edit(self):
         # commit changes
         self.edit_transaction = False
-        self.rebuild_geo()
+        self.rebuild_dirty_geo()
+        self.export_to_SOP(force=True)
         self.save_anchor_points()
         self.scene_viewer.endStateUndo()
 
@@ -1461,6 +2347,10 @@ class BezierEditor(object):
         self.update_geo_on_edit = self.node.parm("update_geo_on_edit").eval()
         self.handles_snapping = self.node.parm("handles_snapping").eval()
 
+        export_rate_parm = self.node.parm("export_rate")
+        if export_rate_parm is not None:
+            self.export_throttle.rate = export_rate_parm.eval()
+
         self.reads(self.controls_parm.evalAsString())
         resampled_guide_geo = self.resampled_guide_node.geometry()
         self._curve_drawable.setGeometry(resampled_guide_geo)
@@ -1479,7 +2369,8 @@ class BezierEditor(object):
     def reset(self):
         self.attribute_names = {}
         self.point_controls.clear_controls()
-        self.anchor_points = []
+        self.shown_handles = []
+        self.anchor_store.clear()
         self.editing_anchor = -1
         self.show_editing_handles()
         self.update_handles_geo()
@@ -1488,18 +2379,12 @@ class BezierEditor(object):
         self.allocate_names_drawer()
 
     def writes(self):
-        # type: () -> (str, str)
+        # type: () -> str
 
-        anchors = [
-            {
-                "controls": [tuple(anchor[index]) for index in range(3)],
-                "attribs": anchor.attributes,
-                "flag": anchor.anchor_type,
-                "tag": anchor.tag
-            } for anchor in self.anchor_points]
-
-        attrib_meta = [(name, self.attribute_names[name].type) for name in self.attribute_names]
-        prims = self.prims
+        attrib_meta = [[name, self.attribute_names[name].type] for name in self.attribute_names]
+        attribs = {name: attribute_column(attribute_type, [anchor.attributes[name] for anchor in self.anchor_points]) 
+                    for name, attribute_type in attrib_meta}
+        prims = self.prims.to_list()
 
         selection = []
         selected_controls = self.point_controls.selected_controls
@@ -1510,12 +2395,15 @@ class BezierEditor(object):
 
         data = {
             "attrib_meta": attrib_meta,
-            "anchors": anchors,
+            "controls": self.anchor_store.points,
+            "flags": self.anchor_store.anchor_types,
+            "tags": [anchor.tag for anchor in self.anchor_points],
+            "attribs": attribs,
             "prims": prims,
             "selection": selection
         }
 
-        return json.dumps(data)
+        return dumps_controls(data)
 
     def reads(self, state, update_geo=True):
         # type: ((str, str)) -> None
@@ -1527,38 +2415,34 @@ class BezierEditor(object):
             self.add_attributes_from_node()
             return
 
-        data = json.loads(state)
+        data = loads_controls(state)
 
-        anchors = data["anchors"]
         attrib_meta = data["attrib_meta"]
 
-        if not len(anchors):
+        if not len(data["flags"]):
             self.add_default_attributes()
             self.add_attributes_from_node()
             return
 
         self.reset()
 
-        self.prims = data["prims"]
-        self.selection = data["selection"] if "selection" in data else []
+        self.prims = PrimTable(data["prims"])
+        self.selection = data["selection"]
 
         for attrib in attrib_meta:
             self.add_attribute(attrib[0], attrib[1])
 
         self.add_attributes_from_node()
 
-        for anchor_index, anchor in enumerate(anchors):
-            anchor_point = AnchorPoint()
-            
-            anchor_point.controls[0] = hou.Vector3(anchor["controls"][0])
-            anchor_point.controls[1] = hou.Vector3(anchor["controls"][2])
-            anchor_point.position = hou.Vector3(anchor["controls"][1])
-            anchor_point.anchor_type = anchor["flag"]
-            anchor_point.tag = anchor["tag"] if "tag" in anchor else ""
+        anchor_points = self.anchor_store.extend(data["controls"], data["flags"])
 
-            self.anchor_points.append(anchor_point)
+        attribute_names = list(data["attribs"])
+        attribute_columns = [data["attribs"][name].tolist() for name in attribute_names]
+        attribute_values = zip(*attribute_columns) if attribute_columns else it.repeat(())
 
-            anchor_point.attributes = anchor["attribs"]
+        for anchor_point, tag, values in zip(anchor_points, data["tags"], attribute_values):
+            anchor_point.tag = tag
+            anchor_point.attributes = dict(zip(attribute_names, values))
             self.add_anchor_controls(anchor_point, update_geo=False)
 
         self.point_controls.update_points_geo()
@@ -1567,7 +2451,6 @@ class BezierEditor(object):
 
         self.allocate_value_drawer()
         self.allocate_names_drawer()
-        self.update_anchors_indices()
 
     def get_editing_anchor_from_selection(self):
         selected_controls = self.point_controls.selected_controls
@@ -1576,16 +2459,12 @@ class BezierEditor(object):
             self.editing_anchor = -1
             return
 
-        for index, anchor in enumerate(self.anchor_points):
-            if any((True for c in self.anchor_points_controls[anchor] if c in selected_controls)):
-                self.editing_anchor = index
-                break
-        else:
-            self.editing_anchor = -1
+        anchor = selected_controls[0].owner if selected_controls else None
+        self.editing_anchor = anchor.anchor_index if anchor is not None else -1
 
     def get_anchor_from_control(self, control):
         # type: (PointControl) -> AnchorPoint
-        return next(anchor for anchor in self.anchor_points if control in self.anchor_points_controls[anchor])
+        return control.owner
 
     def need_handles(self, anchor):
         # type: (AnchorPoint) -> AnchorPoint
@@ -1608,18 +2487,16 @@ class BezierEditor(object):
 
     def get_anchor_prim(self, anchor_index):
         # type: (int) -> int
-        return next((index for index in range(len(self.prims)) 
-            if anchor_index>=self.prims[index][0] and anchor_index<self.prims[index][1] ), 
-            None)
+        return self.prims.find(anchor_index)
 
     # get prim to add (at begin or end) from selected anchor
     def get_prim_to_add_anchor(self, anchor_index):
         selected_prim = self.get_anchor_prim(anchor_index)
         if self.prims[selected_prim][2]:
             return None, None
-        prim = next((index for index in range(len(self.prims)) 
-            if anchor_index==self.prims[index][0] or anchor_index==(self.prims[index][1]-1) ), 
-            None)
+        offsets = self.prims.offsets
+        prims = np.flatnonzero((offsets[:, 0] == anchor_index) | (offsets[:, 1] - 1 == anchor_index))
+        prim = int(prims[0]) if len(prims) else None
         at_end = None
         if prim is not None:
             at_end = anchor_index == (self.prims[prim][1] - 1)
@@ -1627,38 +2504,45 @@ class BezierEditor(object):
         return prim, at_end
 
     def sort_prims_after_insert(self, insert_index):
+        offsets = self.prims.offsets
         prim = self.get_anchor_prim(insert_index)
         if prim is not None:
-            self.prims[prim][1] += 1
-            for p in range(prim+1, len(self.prims)):
-                self.prims[p][0] += 1
-                self.prims[p][1] += 1
+            offsets[prim, 1] += 1
+            offsets[prim+1:] += 1
         else:
-            prim = next((index for index in range(len(self.prims)) 
-                if insert_index==self.prims[index][0] and insert_index==self.prims[index][1] ), 
-                None)
-            if prim is not None:
-                self.prims[prim][1] += 1
+            empty_prims = np.flatnonzero((offsets[:, 0] == insert_index) & (offsets[:, 1] == insert_index))
+            if len(empty_prims):
+                offsets[empty_prims[0], 1] += 1
 
     def sort_prims_after_delete(self, delete_index):
+        offsets = self.prims.offsets
         prim = self.get_anchor_prim(delete_index)
 
         if prim is not None:
-            self.prims[prim][1] -= 1
-            for p in range(prim+1, len(self.prims)):
-                self.prims[p][0] -= 1
-                self.prims[p][1] -= 1
+            offsets[prim, 1] -= 1
+            offsets[prim+1:] -= 1
+
+            if offsets[prim, 1] == offsets[prim, 0]:
+                self.delete_prim(prim)
 
-            if self.prims[prim][1] == self.prims[prim][0]:
-                del self.prims[prim]
+    def delete_prim(self, prim_index):
+        # type: (int) -> None
+        """ Remove a prim keeping geo prims and dirty prims numbered after it in sync """
+        del self.prims[prim_index]
 
-    def update_anchors_indices(self):
-        for anchor_index, anchor in enumerate(self.anchor_points):
-            anchor.anchor_index = anchor_index
+        # geo prim of a removed prim is left for the next rebuild to delete
+        if prim_index in self.geo_prims:
+            self.geo_dirty_prims.add(DELETED_PRIM)
+
+        self.geo_prims = [prim_num - 1 if prim_num > prim_index else (DELETED_PRIM if prim_num == prim_index else prim_num) 
+                          for prim_num in self.geo_prims]
+        self.geo_dirty_prims = set(prim_num - 1 if prim_num > prim_index else prim_num 
+                                   for prim_num in self.geo_dirty_prims if prim_num != prim_index)
 
     def hide_all_handles(self):
-        for control in self.point_controls.point_controls: # type: PointControl
-            control.is_visible = False if control.drawable_index == 1 else control.is_visible
+        for control in self.shown_handles: # type: PointControl
+            control.is_visible = False
+        self.shown_handles = []
 
     def restore_selection(self):
         for selection_index in self.selection:
@@ -1675,16 +2559,19 @@ class BezierEditor(object):
 
         if self.editable_handles[0] is not None:
             out_control = self.anchor_points_controls[self.editable_handles[0]][1] 
-            out_control.is_visible = True
+            self.shown_handles.append(out_control)
 
         if self.editable_handles[1] is not None:
             in_control = self.anchor_points_controls[self.editable_handles[1]][0]
             out_control = self.anchor_points_controls[self.editable_handles[1]][1]
-            in_control.is_visible = out_control.is_visible = True
+            self.shown_handles.extend((in_control, out_control))
 
         if self.editable_handles[2] is not None:
             in_control = self.anchor_points_controls[self.editable_handles[2]][0]
-            in_control.is_visible = True
+            self.shown_handles.append(in_control)
+
+        for control in self.shown_handles:
+            control.is_visible = True
 
         self.point_controls.update_points_geo()
 
@@ -1769,43 +2656,39 @@ class BezierEditor(object):
         # type: (AnchorPoint) -> bool
         if not self.point_controls.selected_controls:
             return False
-        elif any((True for c in self.anchor_points_controls[anchor] if c in self.point_controls.selected_controls)):
+        elif any(c.is_selected for c in self.anchor_points_controls[anchor]):
             return True
         return False
 
     def close_prim(self, prim_index, is_closed):
         self.prims[prim_index][2] = is_closed
-        self.rebuild_geo()
+        self.rebuild_geo_prims([prim_index])
         self.update_all_editor_geo()
 
     def reverse_prim(self, prim_index):
         prim = self.prims[prim_index]
 
         if prim[1] - prim[0] > 1:
-            self.anchor_points[prim[0]:prim[1]] = self.anchor_points[prim[0]:prim[1]][::-1]
-            self.update_anchors_indices()
+            self.anchor_store.reorder(prim[0], np.arange(prim[1] - prim[0])[::-1])
+            prim_points = self.anchor_store.points[prim[0]:prim[1]]
+            prim_points[:] = prim_points[:, ::-1]
 
             for anchor in self.anchor_points[prim[0]:prim[1]]:
-                anchor.controls = anchor.controls[::-1]
-                #anchor.tag = tag
                 self.sync_anchor_controls(anchor)
 
         self.on_anchor_selected()
 
         self.attribs_dirty = True    
         self.tags_dirty = True    
-        self.rebuild_geo()
+        self.rebuild_geo_prims([prim_index])
         self.update_all_editor_geo()
 
     def rewire_prim(self, anchor_index):
-        prim = self.prims[self.get_anchor_prim(anchor_index)]
+        prim_index = self.get_anchor_prim(anchor_index)
+        prim = self.prims[prim_index]
 
         if prim[1] - prim[0] > 1:
-            anchors_before = self.anchor_points[prim[0]:anchor_index]
-            self.anchor_points[prim[0]:prim[0] + prim[1] - anchor_index] = self.anchor_points[anchor_index:prim[1]]
-            self.anchor_points[prim[0] + prim[1] - anchor_index:prim[1]] = anchors_before
-
-            self.update_anchors_indices()
+            self.anchor_store.reorder(prim[0], np.roll(np.arange(prim[1] - prim[0]), prim[0] - anchor_index))
 
             for anchor in self.anchor_points[prim[0]:prim[1]]:
                 self.sync_anchor_controls(anchor)
@@ -1814,7 +2697,7 @@ class BezierEditor(object):
 
         self.attribs_dirty = True
         self.tags_dirty = True             
-        self.rebuild_geo()
+        self.rebuild_geo_prims([prim_index])
         self.update_all_editor_geo()
 
 
@@ -1836,8 +2719,10 @@ class BezierEditor(object):
         selected_anchors = [self.get_anchor_from_control(control) for control in selected_controls]
         anchors_indicies = sorted([anchor.anchor_index for anchor in selected_anchors])
 
+        anchors_prims = self.prims.find_many(anchors_indicies).tolist()
+
         # get sequences for straighten
-        straighten_seqs = it.groupby(enumerate(anchors_indicies), lambda ia: (self.get_anchor_prim(ia[1]), ia[0] - ia[1]))
+        straighten_seqs = it.groupby(enumerate(anchors_indicies), lambda ia: (anchors_prims[ia[0]], ia[0] - ia[1]))
         straighten_seqs = [[a[1] for a in seq] for k, seq in straighten_seqs]
 
         if not any(len(s) > 1 for s in straighten_seqs):
@@ -1854,6 +2739,8 @@ class BezierEditor(object):
                 start_anchor = self.anchor_points[anchors[0]]
                 end_anchor = self.anchor_points[anchors[-1]]
 
+                self.mark_anchor_geo_dirty(start_anchor)
+
                 line = end_anchor.position - start_anchor.position
                 line_direction = line.normalized()
                 segment_length = line.length() / num_segments
@@ -1895,8 +2782,7 @@ class BezierEditor(object):
     def select_all(self):
         self.point_controls.clear_selection()
         for anchor in self.anchor_points:
-            anchor_control = self.anchor_points_controls[self.anchor_points[anchor.anchor_index]][2]
-            self.point_controls.add_control_to_selection(anchor_control)
+            self.point_controls.add_control_to_selection(self.anchor_points_controls[anchor][2], update_geo=False)
 
         self.update_all_editor_geo()
         self.on_anchor_selected()
@@ -1907,7 +2793,7 @@ class BezierEditor(object):
 
         for anchor_index in range(self.prims[prim_index][0], self.prims[prim_index][1]):
             anchor_control = self.anchor_points_controls[self.anchor_points[anchor_index]][2]
-            self.point_controls.add_control_to_selection(anchor_control)
+            self.point_controls.add_control_to_selection(anchor_control, update_geo=False)
 
         self.update_all_editor_geo()
         self.on_anchor_selected()
@@ -1933,19 +2819,19 @@ class BezierEditor(object):
             self.point_controls.update_selected_geo()
 
         for control in self.anchor_points_controls[anchor]: # type: PointControl
-            self.point_controls.point_controls.remove(control)
+            self.point_controls.remove_control(control)
 
-        anchor_index = self.anchor_points.index(anchor)
+        anchor_index = anchor.anchor_index
+        self.mark_geo_dirty(self.get_anchor_prim(anchor_index))
         self.sort_prims_after_delete(anchor_index)      
 
-        self.anchor_points.remove(anchor)
+        self.anchor_store.remove(anchor_index)
 
         if update:
             self.allocate_value_drawer()
             self.allocate_names_drawer()
 
-            self.update_anchors_indices()
-            self.rebuild_geo()
+            self.rebuild_dirty_geo()
             self.on_anchor_selected()
 
     def remove_selected_anchors(self):
@@ -1970,8 +2856,7 @@ class BezierEditor(object):
         self.allocate_value_drawer()
         self.allocate_names_drawer()
 
-        self.update_anchors_indices()
-        self.rebuild_geo()
+        self.rebuild_dirty_geo()
 
         self.end_edit()
 
@@ -2045,7 +2930,7 @@ class BezierEditor(object):
                 return hou.Vector3(0, 0, 1)
 
     def get_next_anchor(self, anchor):
-        current_index = self.anchor_points.index(anchor)
+        current_index = anchor.anchor_index
         next_index = self.get_next_index(current_index)
         if next_index is not None:
             return self.anchor_points[next_index]
@@ -2053,7 +2938,7 @@ class BezierEditor(object):
             return None
 
     def get_prev_anchor(self, anchor):
-        current_index = self.anchor_points.index(anchor)
+        current_index = anchor.anchor_index
         prev_index = self.get_prev_index(current_index)
         if prev_index is not None:
             return self.anchor_points[prev_index]
@@ -2099,7 +2984,7 @@ class BezierEditor(object):
         self.sync_anchor_controls(anchor)
         self.update_handles_geo()
         self.point_controls.update_points_geo()
-        self.rebuild_geo()
+        self.rebuild_geo_prims([self.get_anchor_prim(anchor.anchor_index)])
         self.update_all_editor_geo()
 
     def toggle_anchor_smoothness(self, anchor):
@@ -2166,11 +3051,9 @@ class BezierEditor(object):
             self.sort_prims_after_insert(prev_anchor_index + 1)
         else:
             self.sort_prims_after_insert(prev_anchor_index)
-        self.anchor_points.insert(prev_anchor_index + 1, new_anchor)
+        self.anchor_store.insert(prev_anchor_index + 1, [new_anchor])
         self.add_anchor_controls(new_anchor)
 
-        self.update_anchors_indices()
-
         self.point_controls.select_control(self.anchor_points_controls[new_anchor][2])
         self.point_controls.plane_point = new_anchor.position        
         self.get_editing_anchor_from_selection()
@@ -2206,7 +3089,7 @@ class BezierEditor(object):
 
             new_anchor.attributes[attrib_name] = value
 
-        self.rebuild_geo()
+        self.rebuild_geo_prims([prim_num])
         self.on_anchor_selected()
 
     def append_anchor(self, pos, anchor_index, at_end, prim_to_add):
@@ -2220,12 +3103,10 @@ class BezierEditor(object):
 
         self.sort_prims_after_insert(anchor_index)
         insert_index = anchor_index + 1 if at_end else anchor_index
-        self.anchor_points.insert(insert_index, anchor)
+        self.anchor_store.insert(insert_index, [anchor])
         
         self.add_anchor_controls(anchor)
         
-        self.update_anchors_indices()
-
         self.editing_anchor = insert_index
 
         handle_to_select = 1 if at_end or is_new_prim else 0
@@ -2239,7 +3120,8 @@ class BezierEditor(object):
         self.attribs_dirty = True
         self.reset_anchor_attributes(anchor)
 
-        self.rebuild_geo()
+        if not (at_end and self.append_anchor_geo(prim_to_add)):
+            self.rebuild_geo_prims([prim_to_add])
         self.on_anchor_selected()
 
     def add_anchor_controls(self, anchor, update_geo=True):
@@ -2249,10 +3131,12 @@ class BezierEditor(object):
 
         in_control = self.point_controls.add_control(anchor.controls[0], 1, tag="handle")
         out_control = self.point_controls.add_control(anchor.controls[1], 1, tag="handle")
+        in_control.is_visible = out_control.is_visible = False
 
         in_control._on_move = ft.partial(BezierEditor.update_anchor_control_position, self, anchor, 0)
         out_control._on_move = ft.partial(BezierEditor.update_anchor_control_position, self, anchor, 1)
 
+        in_control.owner = out_control.owner = position_control.owner = anchor
         self.anchor_points_controls[anchor] = (in_control, out_control, position_control)
         if update_geo:
             self.point_controls.update_points_geo()
@@ -2357,6 +3241,7 @@ class BezierEditor(object):
         self.sync_parmpane_with_selection()
 
 
+    @profiled
     def on_mouse_down(self, ui_event):
         device = ui_event.device() # type: hou.UIEventDevice
 
@@ -2385,7 +3270,7 @@ class BezierEditor(object):
                         at_end = False
                     elif selected_before is not None:
                         anchor_before = self.get_anchor_from_control(selected_before)
-                        anchor_index = self.anchor_points.index(anchor_before)
+                        anchor_index = anchor_before.anchor_index
                         prim_to_add, at_end = self.get_prim_to_add_anchor(anchor_index)
 
                     if prim_to_add is None:
@@ -2424,7 +3309,7 @@ class BezierEditor(object):
                             self.update_all_editor_geo()
                             self.on_anchor_selected()
                             if new_prim or first_prim:
-                                del self.prims[prim_to_add]
+                                self.delete_prim(prim_to_add)
                     
                     self.allocate_names_drawer()
                 else:
@@ -2441,7 +3326,7 @@ class BezierEditor(object):
                     
                     self._selection_drawable.setParams( selection_drawable_params )
 
-                    viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
+                    viewport = self.point_controls.viewport_context.viewport() # type: hou.GeometryViewport
 
                     if len(self.point_controls.selected_controls) == 1 and self.point_controls.selected_controls[0].tag == "handle":
                         self.point_controls.clear_selection()
@@ -2449,9 +3334,10 @@ class BezierEditor(object):
                         self.on_anchor_selected()
 
                     self.selection_start_anchors = [self.get_anchor_from_control(c) for c in self.point_controls.selected_controls]
+                    self.box_selection_mask = None
 
                     mouse_pos = hou.Vector3(device.mouseX(), device.mouseY(), 0.0)
-                    mouse_pos *= viewport.windowToViewportTransform()
+                    mouse_pos *= self.point_controls.viewport_context.window_to_viewport(viewport)
 
                     self.selection_start = mouse_pos
                     self.selection_viewport = viewport
@@ -2505,7 +3391,7 @@ class BezierEditor(object):
                     empty_selection = not self.point_controls.selected_controls
 
                     if not any_handle_selected or empty_selection:
-                        if selected_control in self.point_controls.selected_controls:
+                        if selected_control.is_selected:
                             self.point_controls.unselect_control(selected_control)
                             self.point_controls.update_selected_geo()
                             self.point_controls.dragged_control = None
@@ -2519,7 +3405,7 @@ class BezierEditor(object):
                 else:
                     multi_selected = all(c.tag == "position" for c in self.point_controls.selected_controls)
                     multi_selected = multi_selected and len(self.point_controls.selected_controls) > 1
-                    if not multi_selected or selected_control not in self.point_controls.selected_controls:
+                    if not multi_selected or not selected_control.is_selected:
                         self.point_controls.select_control(selected_control)
                     else:
                         self.point_controls.dragged_control = selected_control
@@ -2603,12 +3489,15 @@ class BezierEditor(object):
             self.state.log("Selection ends with {} selected".format(len(self.point_controls.selected_controls)))
             self.selection_mode = 0
 
+        self.export_to_SOP(force=True)
+
     
     def build_selection_geo(self, mouse_pos):
 
         geo = hou.Geometry() # type: hou.Geometry
 
-        mouse_pos *= self.selection_viewport.windowToViewportTransform()
+        context = self.point_controls.viewport_context
+        mouse_pos *= context.window_to_viewport(self.selection_viewport)
 
         pt1 = self.selection_start
         pt2 = mouse_pos
@@ -2619,7 +3508,7 @@ class BezierEditor(object):
         pt4_ray = self.selection_viewport.mapToWorld(pt2.x(), pt1.y())
 
 
-        view_transform = self.selection_viewport.viewTransform() # type: hou.Matrix4
+        view_transform = context.view_transform(self.selection_viewport) # type: hou.Matrix4
 
         camera_pos = hou.Vector3(0, 0, 0) * view_transform # type: hou.Vector3
         camera_look =  hou.Vector3(0, 0, -1) * view_transform - camera_pos # type: hou.Vector3
@@ -2636,19 +3525,19 @@ class BezierEditor(object):
 
         self._selection_drawable.setGeometry(geo)
 
-    def is_anchor_in_box_selection(self, anchor, left, right, bottom, top):
-        # type: (AnchorPoint, hou.Vector3) -> None
-
-        viewport = self.selection_viewport # type: hou.GeometryViewport
-        anchor_screen_pos = viewport.mapToScreen(anchor.position * viewport.modelToGeometryTransform().inverted()) # type: hou.Vector2
+    def get_anchors_in_box_selection(self, screen_positions, left, right, bottom, top):
+        # type: (np.ndarray, float, float, float, float) -> np.ndarray
+        screen_x = screen_positions[:, 0]
+        screen_y = screen_positions[:, 1]
 
-        return left <= anchor_screen_pos.x() <= right and bottom <= anchor_screen_pos.y() <= top
+        return (left <= screen_x) & (screen_x <= right) & (bottom <= screen_y) & (screen_y <= top)
 
+    @profiled
     def process_box_selection(self, device):
         # type(hou.UIEventDevice) -> bool
 
         mouse_pos = hou.Vector3(device.mouseX(), device.mouseY(), 0.0)
-        mouse_pos *=  self.selection_viewport.windowToViewportTransform()
+        mouse_pos *= self.point_controls.viewport_context.window_to_viewport(self.selection_viewport)
 
         start_x = self.selection_start.x()
         start_y = self.selection_start.y()
@@ -2662,21 +3551,31 @@ class BezierEditor(object):
         bottom = min(start_y, end_y)
         top = bottom + abs(start_y - end_y)
 
-        anchors_in_box = [anchor for anchor in self.anchor_points if self.is_anchor_in_box_selection(anchor, left, right, bottom, top)]
+        projection = self.point_controls.update_screen_projection(self.selection_viewport)
 
-        self.point_controls.clear_selection()
+        if self.box_selection_mask is None or self.box_layout_revision != projection.layout_revision:
+            self.box_selection_mask = projection.get_rows_mask(self.point_controls.selected_controls)
+            self.box_initial_mask = projection.get_rows_mask(self.anchor_points_controls[a][2] for a in self.selection_start_anchors)
+            self.box_anchors_mask = projection.get_rows_mask(self.anchor_points_controls[a][2] for a in self.anchor_points)
+            self.box_layout_revision = projection.layout_revision
 
+        anchors_in_box = self.box_anchors_mask & self.get_anchors_in_box_selection(projection.screen_positions, left, right, bottom, top)
        
         if self.selection_mode == 1:
-            selected_anchors = anchors_in_box
+            selection_mask = anchors_in_box
         elif self.selection_mode == 2:
-            selected_anchors = (self.selection_start_anchors + anchors_in_box)
+            selection_mask = self.box_initial_mask | anchors_in_box
         else:
-            selected_anchors = set(self.selection_start_anchors) - set(anchors_in_box)
+            selection_mask = self.box_initial_mask & ~anchors_in_box
 
-        for anchor in selected_anchors:
-            self.point_controls.add_control_to_selection(self.anchor_points_controls[anchor][2], False)
-        self.point_controls.update_selected_geo()
+        if np.array_equal(selection_mask, self.box_selection_mask):
+            return
+
+        added_rows = np.nonzero(selection_mask & ~self.box_selection_mask)[0]
+        removed_rows = np.nonzero(self.box_selection_mask & ~selection_mask)[0]
+        self.box_selection_mask = selection_mask
+
+        self.point_controls.change_selection(projection.get_controls(added_rows), projection.get_controls(removed_rows))
     
         self.get_editing_anchor_from_selection()
         self.show_editing_handles()
@@ -2776,139 +3675,295 @@ class BezierEditor(object):
     def update_anchor_geo_position(self, anchor):
         # type: (AnchorPoint) -> None
         self.curve_geo_dirty = True
+        self.geo_tracked = True
         for control_index in range(3):
             geo_point = self.get_anchor_geo_point(anchor, control_index)
             if geo_point is not None:
                 geo_point.setPosition(anchor[control_index])
 
+    def update_anchors_geo_positions(self, anchor_rows):
+        # type: (list[int]) -> None
+        """ update_anchor_geo_position for many anchors with a single bulk write """
+        self.curve_geo_dirty = True
+        self.geo_tracked = True
+        geo_points = self.anchor_store.geo_points[anchor_rows]
+        exported = geo_points >= 0
+        if not exported.any():
+            return
+
+        positions = np.frombuffer(self.curve_geo.pointFloatAttribValuesAsString("P"), dtype=np.float32).reshape(-1, 3).copy()
+        positions[geo_points[exported]] = self.anchor_store.points[anchor_rows][exported]
+        self.curve_geo.setPointFloatAttribValuesFromString("P", positions.tobytes())
+
+    def write_anchor_geo_attribs(self, anchor):
+        # type: (AnchorPoint) -> None
+        for control_index in range(3):
+            geo_point = self.get_anchor_geo_point(anchor, control_index)
+            if geo_point is not None:
+
+                for attrib_name in self.attribute_names:
+                    attrib_value = self.get_anchor_attrib_value(anchor, attrib_name, control_index)
+                    geo_point.setAttribValue(attrib_name, attrib_value)
+
     def update_anchor_geo_attribs(self, anchor):
         # type: (AnchorPoint) -> None
         self.curve_geo_dirty = True
+        self.geo_tracked = True
         self.attribs_dirty = True
-        anchors_to_update = (self.get_prev_anchor(anchor), anchor, self.get_next_anchor(anchor))
+        anchors_to_update = [anchor_to_update for anchor_to_update in (self.get_prev_anchor(anchor), anchor, self.get_next_anchor(anchor)) 
+                            if anchor_to_update is not None]
 
-        for anchor_to_update in (anchor for anchor in anchors_to_update if anchor is not None):
-            self.interpolate_anchor_attributes(anchor_to_update, anchor_to_update.anchor_index)
-            for control_index in range(3):
-                geo_point = self.get_anchor_geo_point(anchor_to_update, control_index)
-                if geo_point is not None:
+        self.interpolate_anchors_attributes([anchor_to_update.anchor_index for anchor_to_update in anchors_to_update])
+        for anchor_to_update in anchors_to_update:
+            self.write_anchor_geo_attribs(anchor_to_update)
 
-                    for attrib_name in self.attribute_names:
-                        attrib_value = self.get_anchor_attrib_value(anchor_to_update, attrib_name, control_index)
-                        geo_point.setAttribValue(attrib_name, attrib_value)
+    def get_arrowheads(self):
+        # type: () -> (np.ndarray, np.ndarray)
+        """ Positions and directions of the prim end arrowheads """
+        prim_offsets = self.prims.offsets
+        closed = self.prims.closed
+        exported = prim_offsets[:, 1] - prim_offsets[:, 0] > 1
 
-    def build_arrowheads_geo(self):
+        anchor_rows = np.where(closed, prim_offsets[:, 0], prim_offsets[:, 1] - 1)[exported]
+        prev_rows = np.where(closed, prim_offsets[:, 1] - 1, prim_offsets[:, 1] - 2)[exported]
+
+        points = self.anchor_store.points
+        positions = points[anchor_rows, 1]
+        is_corner = self.anchor_store.anchor_types[anchor_rows] == AnchorType.CORNER
+        tangents = np.where(is_corner[:, np.newaxis], positions - points[prev_rows, 2], positions - points[anchor_rows, 0])
+
+        lengths = np.linalg.norm(tangents, axis=1, keepdims=True)
+        directions = np.divide(tangents, lengths, out=np.zeros_like(tangents), where=lengths > 0.0)
+
+        return positions, directions
+
+    def instance_arrowheads(self, positions, directions, arrowhead_geo):
+        # type: (np.ndarray, np.ndarray, hou.Geometry) -> None
+        """ Copy arrowheads to the prim ends with unit scale. Point offsets from the 
+            instance origins are kept so rescaling doesn't need another copy """
         arrowheads_points = hou.Geometry() # type: hou.Geometry
 
-        pscale_attrib = arrowheads_points.addAttrib(hou.attribType.Point, "pscale", 1.0)
-        N_attrib = arrowheads_points.addAttrib(hou.attribType.Point, "N", (0, 1.0, 0.0), True)
-        anchors_to_export = [prim[1] - 1 if not prim[2] else prim[0] for prim in self.prims if prim[1] - prim[0] > 1]
-        prims_to_export = [primnum for primnum, prim in enumerate(self.prims) if prim[1] - prim[0] > 1]
-        geo_points = [self.anchor_points[index].position for index in anchors_to_export]
-        arrowheads_points.createPoints(geo_points)
+        arrowheads_points.addAttrib(hou.attribType.Point, "N", (0, 1.0, 0.0), True)
+        arrowheads_points.addAttrib(hou.attribType.Point, "__arrowhead", 0)
+        arrowheads_points.createPoints(positions.tolist())
+        set_point_attrib_values(arrowheads_points, "N", directions)
+        set_point_attrib_values(arrowheads_points, "__arrowhead", np.arange(len(positions)))
 
-        # from path deform state
-        viewport = self.scene_viewer.curViewport()
+        geo = hou.Geometry()
+        verb = hou.sopNodeTypeCategory().nodeVerb('copytopoints::2.0')
+        verb.setParms({'useidattrib': True, 'idattrib': '__type', 'targetattribs':({'applyattribs#': '* ^N'},)})
+        verb.execute(geo, [arrowhead_geo, arrowheads_points])
+
+        unit_positions = np.frombuffer(geo.pointFloatAttribValuesAsString("P"), dtype=np.float32).reshape(-1, 3)
+        if geo.findPointAttrib("__arrowhead") is not None:
+            instances = np.frombuffer(geo.pointIntAttribValuesAsString("__arrowhead"), dtype=np.int32)
+        else:
+            instances = np.zeros(len(unit_positions), dtype=np.int32)
+
+        self.arrowheads_geo = geo
+        self.arrowheads_instances = instances
+        self.arrowheads_offsets = unit_positions - positions[instances] if len(positions) else unit_positions
+        self.arrowheads_scales = None
+
+    def build_arrowheads_geo(self):
+        positions, directions = self.get_arrowheads()
+
+        arrowhead_node = self.node.node("head_scale")
+        arrowhead_geo = arrowhead_node.geometry()
+
+        # copy again only if the prim ends or the arrowhead itself changed
+        instances_key = (positions.tobytes(), directions.tobytes(), arrowhead_node.cookCount())
+        if instances_key != self.arrowheads_key:
+            self.instance_arrowheads(positions, directions, arrowhead_geo)
+            self.arrowheads_key = instances_key
 
-        proj = viewport.viewportToNDCTransform() * viewport.ndcToCameraTransform() * viewport.cameraToModelTransform() * viewport.modelToGeometryTransform()
+        # from path deform state
+        proj = self.point_controls.viewport_context.view_to_geo()
         dx = (hou.Vector4(1, 0, 0, 0) * proj).length()
         dy = (hou.Vector4(0, 1, 0, 0) * proj).length()
 
         scale = min(dx, dy)
         
-        proj_inv = proj.inverted()
+        proj_inv = np.array(proj.inverted().asTupleOfTuples())
+        depths = np.hstack((positions, np.ones((len(positions), 1)))).dot(proj_inv[:, 3])
+        scales = (scale * depths * 100).astype(np.float32)
 
+        if self.arrowheads_scales is not None and np.array_equal(scales, self.arrowheads_scales):
+            return
+        self.arrowheads_scales = scales
 
-        for ptnum, point in enumerate(arrowheads_points.points()): # type: int, hou.Point
-            anchor_index = anchors_to_export[ptnum]
-            anchor = self.anchor_points[anchor_index]
-            prim = self.prims[prims_to_export[ptnum]]
-            prev_anchor = self.anchor_points[anchor_index-1] if not prim[2] else self.anchor_points[prim[1] - 1]
-            tangent = anchor.position - anchor.in_control if anchor.anchor_type != AnchorType.CORNER else anchor.position - prev_anchor.out_control
-            point.setAttribValue(N_attrib, tangent.normalized())
-            pt_pos = point.position()
-            p = hou.Vector4(pt_pos.x(), pt_pos.y(), pt_pos.z(), 1.0) * proj_inv
-            point.setAttribValue(pscale_attrib, scale * p[3] * 100)
+        if len(positions):
+            instances = self.arrowheads_instances
+            scaled_positions = positions[instances] + self.arrowheads_offsets * scales[instances, np.newaxis]
+            set_point_attrib_values(self.arrowheads_geo, "P", scaled_positions)
 
-        geo = hou.Geometry()
-        verb = hou.sopNodeTypeCategory().nodeVerb('copytopoints::2.0')
-        verb.setParms({'useidattrib': True, 'idattrib': '__type', 'targetattribs':({'applyattribs#': '* ^N'},)})
-        arrowhead_geo = self.node.node("head_scale").geometry()
-        verb.execute(geo, [arrowhead_geo, arrowheads_points])
+        self._arrowhead_drawable.setGeometry(self.arrowheads_geo)
 
-        self._arrowhead_drawable.setGeometry(geo)
-               
+    def get_geo_attribs(self):
+        # type: () -> list[tuple[str, int]]
+        return [(attrib_name, self.attribute_names[attrib_name].type) for attrib_name in self.attribute_names]
 
-    # TODO: can be optimized with setPointFloatAttribValuesFromString (though point number is not that bad)
+    def create_curve_geo(self):
+        # type: () -> hou.Geometry
+        self.curve_geo_attribs = self.get_geo_attribs()
+        return create_curve_geo(self.curve_geo_attribs)
+
+    def build_geo_prims(self, prim_nums):
+        # type: (Iterable[int]) -> None
+        """ Append geo prims of the given prims, anchors are gathered so only their columns are built """
+        if not self.node:
+            return
+
+        prim_nums = [prim_num for prim_num in prim_nums if self.prims[prim_num][1] - self.prims[prim_num][0] > 1]
+        if not prim_nums:
+            return
+
+        # prims are rebased onto the gathered anchors
+        local_prims = []
+        anchor_rows = []
+        num_anchors = 0
+        for prim_num in prim_nums:
+            start, end, is_closed, prim_name = self.prims[prim_num]
+            local_prims.append((num_anchors, num_anchors + end - start, is_closed, prim_name))
+            anchor_rows.append(np.arange(start, end))
+            num_anchors += end - start
+
+        anchor_rows = np.concatenate(anchor_rows)
+        anchors = [self.anchor_points[anchor_index] for anchor_index in anchor_rows.tolist()]
+
+        attrib_types = dict(self.curve_geo_attribs)
+        attribs = dict((attrib_name, attribute_column(attrib_type, [anchor.attributes[attrib_name] for anchor in anchors]))
+                       for attrib_name, attrib_type in attrib_types.items())
+        tags = [anchor.tag for anchor in anchors]
+
+        point_start = self.curve_geo.intrinsicValue("pointcount")
+        point_anchors, point_controls = build_curve_prims(self.curve_geo, local_prims, self.anchor_store.points[anchor_rows], 
+                                                          attribs, attrib_types, tags)
+
+        # new points are always appended so their numbers are known without asking the geo
+        self.anchor_store.geo_points[anchor_rows[point_anchors], point_controls] = point_start + np.arange(len(point_anchors))
+        self.geo_prims.extend(prim_nums)
+
+    @profiled
     def rebuild_geo(self, update_stash=True):
         if update_stash:
             self.curve_geo_dirty = True
-        self.curve_geo = hou.Geometry()
+        self.curve_geo = self.create_curve_geo()
 
-        if len(self.geo_prims) < len(self.prims):
-            self.geo_prims.extend([-1] * (len(self.prims) - len(self.geo_prims)))
-        geo_prim_num = 0
+        self.anchor_store.geo_points[:] = -1
 
-        for attrib_name in self.attribute_names:
-            attrib = self.attribute_names[attrib_name]
-            self.curve_geo.addAttrib(hou.attribType.Point, attrib_name, attrib.value, create_local_variable=False)
+        self.geo_prims = []
+        self.build_geo_prims(range(len(self.prims)))
 
-        self.curve_geo.addAttrib(hou.attribType.Point, "tag", "", create_local_variable=False)
+        self.geo_dirty_prims = set()
+        self.geo_tracked = True
 
-        roll_attribs = [attrib_name for attrib_name in self.attribute_names if self.attribute_names[attrib_name].type == AnchorAttributeType.VECTOR_UP]
-        if roll_attribs:
-            self.curve_geo.addAttrib(hou.attribType.Global, "roll_attribs", "", create_local_variable=False)
-            self.curve_geo.setGlobalAttribValue("roll_attribs", " ".join(roll_attribs))
+        if update_stash:
+            self.export_to_SOP()
 
-        orient_attribs = [attrib_name for attrib_name in self.attribute_names if self.attribute_names[attrib_name].type == AnchorAttributeType.ORIENTATION]
-        if orient_attribs:
-            self.curve_geo.addAttrib(hou.attribType.Global, "orient_attribs", "", create_local_variable=False)
-            self.curve_geo.setGlobalAttribValue("orient_attribs", " ".join(orient_attribs))
+    def rebuild_geo_prims(self, prim_nums, update_stash=True):
+        # type: (Iterable[int], bool) -> None
+        """ Rebuild geo prims from the first of the given (and already dirty) prims on. Geo prims and 
+            points stay in prims order, so the same curve always exports the same prim and point numbers """
+        if self.curve_geo is None or self.curve_geo_attribs != self.get_geo_attribs():
+            self.rebuild_geo(update_stash)
+            return
 
+        if update_stash:
+            self.curve_geo_dirty = True
 
+        dirty_prims = self.geo_dirty_prims.union(prim_nums)
+        first_prim = min([prim_num for prim_num in dirty_prims if prim_num is not None and 0 <= prim_num < len(self.prims)], 
+                         default=len(self.prims))
 
-        self.interpolate_all_attributes()
+        first_geo_prim = next((geo_prim_index for geo_prim_index, prim_num in enumerate(self.geo_prims) 
+                               if prim_num in dirty_prims or prim_num >= first_prim), len(self.geo_prims))
+        first_prim = min([first_prim] + [prim_num for prim_num in self.geo_prims[first_geo_prim:] if prim_num != DELETED_PRIM])
 
-        self.curve_geo.addAttrib(hou.attribType.Prim, "name", "", create_local_variable=False)
+        # points of the geo prims before first_geo_prim come first, so the deleted points are
+        # the tail of the geo and nothing else is renumbered
+        if first_prim < len(self.prims):
+            self.anchor_store.geo_points[self.prims.offsets[first_prim][0]:] = -1
 
-        for anchor in self.anchor_points:
-            anchor.geo_points = [None, None, None]
+        if first_geo_prim < len(self.geo_prims):
+            self.curve_geo.deletePrims([self.curve_geo.prim(geo_prim_index) for geo_prim_index in range(first_geo_prim, len(self.geo_prims))], 
+                                       keep_points=False)
+            del self.geo_prims[first_geo_prim:]
 
-        for prim_num, prim in enumerate(self.prims):
-            prim_points = [anchor[index] for anchor in self.anchor_points[prim[0]:prim[1]] for index in range(3)]
-            prim_attribs = [(anchor_index, attrib_index) for anchor_index in range(prim[0], prim[1]) for attrib_index in range(3)]
+        self.build_geo_prims(range(first_prim, len(self.prims)))
 
-            if (prim[1]-prim[0]) > 1 and self.node:
-                prim_export_points = prim_points[1:-1]
-                prim_export_attribs = prim_attribs[1:-1]
+        self.geo_dirty_prims = set()
+        self.geo_tracked = True
 
-                # if closed
-                if prim[2]:
-                    prim_export_points.extend((prim_points[-1], prim_points[0]))
-                    prim_export_attribs.extend((prim_attribs[-1], prim_attribs[0]))
-                
-                bezier_prim = self.curve_geo.createBezierCurve(len(prim_export_points), prim[2], 4) # type: hou.Face
-                bezier_prim.setAttribValue("name", prim[3])
+        if update_stash:
+            self.export_to_SOP()
 
-                for ptnum, point in enumerate(bezier_prim.points()): # type: int, hou.Point
-                    point.setPosition(prim_export_points[ptnum])
-                    
-                    anchor_index = prim_export_attribs[ptnum][0]
-                    control_index = prim_export_attribs[ptnum][1]
-                    
-                    if control_index == 1:
-                        point.setAttribValue("tag", self.anchor_points[anchor_index].tag)
-                    
-                    self.anchor_points[anchor_index].geo_points[control_index] = point.number()
+    def get_geo_prim_index(self, prim_index):
+        # type: (int) -> int
+        if self.geo_prims and self.geo_prims[-1] == prim_index:
+            return len(self.geo_prims) - 1
+        return self.geo_prims.index(prim_index) if prim_index in self.geo_prims else None
+
+    def append_anchor_geo(self, prim_index):
+        # type: (int) -> bool
+        """ Fast path for drawing: the last anchor of the last open prim was just added.
+            New points go to the end of the geometry so nothing is renumbered. """
+        if self.curve_geo is None or not self.node or self.geo_dirty_prims:
+            return False
 
-                    for attrib_name in self.attribute_names:
-                        attrib_value = self.get_anchor_attrib_value(self.anchor_points[anchor_index], attrib_name, control_index)
-                        point.setAttribValue(attrib_name, attrib_value)
+        prim = self.prims[prim_index]
 
-                self.geo_prims[geo_prim_num] = prim_num
-                geo_prim_num += 1
+        if prim_index != len(self.prims) - 1 or prim[2] or prim[1] - prim[0] < 3:
+            return False
 
-        if update_stash:
+        geo_prim_index = self.get_geo_prim_index(prim_index)
+        if geo_prim_index is None or self.curve_geo_attribs != self.get_geo_attribs():
+            return False
+
+        prev_anchor = self.anchor_points[prim[1] - 2]
+        anchor = self.anchor_points[prim[1] - 1]
+
+        geo_prim = self.curve_geo.prim(geo_prim_index) # type: hou.Face
+        new_points = self.curve_geo.createPoints((prev_anchor.out_control, anchor.in_control, anchor.position)) # type: list[hou.Point]
+
+        for point in new_points:
+            geo_prim.addVertex(point)
+
+        new_points[2].setAttribValue("tag", anchor.tag)
+
+        prev_anchor.geo_points[2] = new_points[0].number()
+        anchor.geo_points = [new_points[1].number(), new_points[2].number(), None]
+
+        self.interpolate_anchors_attributes((prev_anchor.anchor_index, anchor.anchor_index))
+        for anchor_to_update in (prev_anchor, anchor):
+            self.write_anchor_geo_attribs(anchor_to_update)
+
+        self.geo_tracked = True
+        self.curve_geo_dirty = True
+        self.export_to_SOP()
+
+        return True
+
+    def mark_geo_dirty(self, prim_index):
+        # type: (int) -> None
+        if prim_index is None:
+            self.geo_dirty_prims.update(range(len(self.prims)))
+        else:
+            self.geo_dirty_prims.add(prim_index)
+        self.geo_tracked = True
+
+    def mark_anchor_geo_dirty(self, anchor):
+        # type: (AnchorPoint) -> None
+        self.mark_geo_dirty(self.get_anchor_prim(anchor.anchor_index))
+
+    def rebuild_dirty_geo(self):
+        if self.geo_dirty_prims:
+            self.rebuild_geo_prims(self.geo_dirty_prims)
+        elif not self.geo_tracked:
+            # nothing was tracked for this edit so play safe
+            self.rebuild_geo()
+        else:
+            # geo was updated in place, in place updates leave curve_geo_dirty set while the stash is skipped
             self.export_to_SOP()
 
     def update_guide_geo(self):
@@ -2916,14 +3971,23 @@ class BezierEditor(object):
         resampled_guide_geo = self.resampled_guide_node.geometry()
         self._curve_drawable.setGeometry(resampled_guide_geo)
 
-    def export_to_SOP(self):
-        if self.curve_geo_dirty:
-            if self.update_geo_on_edit or not self.edit_transaction or not self.use_curve_guides:
-               self.geo_stash.set(self.curve_geo)
-               self.curve_geo.incrementAllDataIds()
+    @profiled
+    def export_to_SOP(self, force=False):
+        # type: (bool) -> None
+        """ Write curve geo to the stashes. While editing dirty states are coalesced
+            and written at most export_throttle.rate times per second unless forced """
+        if not self.curve_geo_dirty:
+            return
+
+        if not self.export_throttle.should_commit(self.edit_transaction, force):
+            return
+
+        if self.update_geo_on_edit or not self.edit_transaction or not self.use_curve_guides:
+           self.geo_stash.set(self.curve_geo)
+           self.curve_geo.incrementAllDataIds()
 
-            self.update_guide_geo()
-            self.curve_geo_dirty = False
+        self.update_guide_geo()
+        self.curve_geo_dirty = False
 
 
 # Main class
@@ -2941,6 +4005,10 @@ class State(object):
         self.node = None # type: hou.SopNode
         self.scene_viewer = scene_viewer # type: hou.SceneViewer
         self.bezier_editor = BezierEditor(scene_viewer)
+        self.viewport_context = self.bezier_editor.point_controls.viewport_context
+        self.profiler = self.bezier_editor.profiler
+        self.profiler.name = state_name
+        self.profiler_hud = ProfilerHUD(scene_viewer, self.profiler)
 
         self.curve_geo = None # type: hou.Geometry
         self.point_drawable = hou.GeometryDrawable(scene_viewer, hou.drawableGeometryType.Point, "intersect_point") # type: hou.GeometryDrawable
@@ -3089,6 +4157,9 @@ class State(object):
             # node probably doesn't exist at the exit
             pass
 
+        if self.profiler.enabled and self.profiler.trace_events:
+            self.log("Profile trace saved to " + self.profiler.dump_trace())
+
     def onResume(self, kwargs):
         self.show(True)
         self.scene_viewer.setPromptMessage( State.MSG )
@@ -3096,6 +4167,8 @@ class State(object):
     def onInterrupt(self,kwargs):
         pass
 
+    @profiled
+    @viewport_event
     def onHandleToState(self, kwargs):
         node = kwargs['node'] # type: hou.Node
         handle = kwargs['handle']
@@ -3138,19 +4211,7 @@ class State(object):
             transform *= hou.hmath.buildScale(sx, sy, sz)
             transform *= hou.hmath.buildRotate(rx, ry, rz)
 
-            for index, control in enumerate(selected_controls):
-
-                anchor = self.bezier_editor.get_anchor_from_control(control)
-                box_positions = self.bezier_editor.selection_box_positions[index]
-
-                box_positions = [pos * transform for pos in box_positions]
-
-                anchor.position = box_center + box_positions[1]
-                anchor.controls[0] = box_center + box_positions[0]
-                anchor.controls[1] = box_center + box_positions[2]
-
-                self.bezier_editor.sync_anchor_controls(anchor)
-                self.bezier_editor.update_anchor_geo_position(anchor)
+            self.bezier_editor.transform_selection_box(transform, box_center)
 
             self.bezier_editor.point_controls.update_points_geo()
             self.bezier_editor.point_controls.update_selected_geo()
@@ -3215,6 +4276,7 @@ class State(object):
         self.bezier_editor.sync_parmpane_with_selection()
         
 
+    @viewport_event
     def onStateToHandle(self, kwargs):
         node = kwargs["node"] # type: hou.Node
         handle = kwargs["handle"]
@@ -3252,7 +4314,7 @@ class State(object):
             if self.bezier_editor.current_attribute is not None:
 
                 anchor = self.bezier_editor.get_anchor_from_control(current_control)
-                anchor_index = self.bezier_editor.anchor_points.index(anchor)
+                anchor_index = anchor.anchor_index
 
                 attribute_type = self.bezier_editor.current_attribute_class.type
                 scale = anchor.attributes["__pr"][0] if attribute_type == AnchorAttributeType.PSCALE_AND_ROLL else anchor.attributes[self.bezier_editor.current_attribute]
@@ -3302,10 +4364,10 @@ class State(object):
                     handle_up = hou.Vector3(0, 0.01, 0) * rot_matrix
                     handle_rotation = rot_matrix.extractRotates()
 
-                    viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
+                    context = self.bezier_editor.point_controls.viewport_context
                     
-                    view_transform = viewport.viewTransform() # type: hou.Matrix4
-                    ndc_to_cam = viewport.ndcToCameraTransform() # type: hou.Matrix4
+                    view_transform = context.view_transform() # type: hou.Matrix4
+                    ndc_to_cam = context.ndc_to_camera() # type: hou.Matrix4
                     
                     proj = view_transform.inverted() * ndc_to_cam.inverted()
                    
@@ -3478,6 +4540,7 @@ class State(object):
                             anchor.attributes[attrib_name] = attrib_value
                         else:
                             anchor.attributes["__pr"][__pr_index] = attrib_value
+                        self.bezier_editor.mark_anchor_geo_dirty(anchor)
 
                     self.bezier_editor.end_edit()
 
@@ -3491,12 +4554,14 @@ class State(object):
                     if parm_name == "prim_name":
                         self.bezier_editor.begin_edit()
                         self.bezier_editor.prims[current_prim][3] = value[0]
+                        self.bezier_editor.mark_geo_dirty(current_prim)
                         self.bezier_editor.end_edit()
                         self.bezier_editor.names_dirty = True
 
                     if parm_name == "prim_closed":
                         self.bezier_editor.begin_edit()
                         self.bezier_editor.prims[current_prim][2] = value[0]
+                        self.bezier_editor.mark_geo_dirty(current_prim)
                         self.bezier_editor.end_edit()
 
             if parm_name == "anchor_type":
@@ -3513,6 +4578,7 @@ class State(object):
                     for control in selected_controls:
                         anchor = self.bezier_editor.get_anchor_from_control(control)
                         anchor.tag = value[0]
+                        self.bezier_editor.mark_anchor_geo_dirty(anchor)
 
                     self.bezier_editor.end_edit()
 
@@ -3521,6 +4587,7 @@ class State(object):
 
 
 
+    @viewport_event
     def onKeyEvent(self, kwargs):
         ui_event = kwargs["ui_event"] # type: hou.UIEvent
         device = ui_event.device() # type: hou.UIEventDevice
@@ -3530,6 +4597,7 @@ class State(object):
 
         return False
 
+    @viewport_event
     def onMouseDoubleClickEvent(self, kwargs):
         ui_event = kwargs["ui_event"] # type: hou.UIEvent
         device = ui_event.device() # type: hou.UIEventDevice
@@ -3556,6 +4624,8 @@ class State(object):
 
         
 
+    @profiled
+    @viewport_event
     def onMouseEvent(self, kwargs):
         ui_event = kwargs["ui_event"] # type: hou.UIEvent
         state_parms = kwargs["state_parms"]
@@ -3572,8 +4642,6 @@ class State(object):
         device = ui_event.device() # type: hou.UIEventDevice
         reason = ui_event.reason() # type: hou.uiEventReason
 
-        viewport = self.scene_viewer.curViewport() # type: hou.GeometryViewport
-
         left_button = device.isLeftButton()
         middle_button = device.isMiddleButton()
 
@@ -3648,6 +4716,7 @@ class State(object):
 
         self.bezier_editor.point_controls.surface_geo = None
         self.bezier_editor.point_controls.surface_normal_attrib = None
+        self.bezier_editor.point_controls.surface_intersector.clear()
 
         if use_surface and surface_input is not None:
             surface_geo = surface_input.geometry() # type: hou.Geometry
@@ -3716,6 +4785,8 @@ class State(object):
 
 
     
+    @profiled
+    @viewport_event
     def onDraw( self, kwargs ):
         """ This callback is used for rendering the drawables
         """
@@ -3728,7 +4799,9 @@ class State(object):
 
         self.warning_drawable.draw(handle)
         self.corner_text_drawable.draw(handle)
+        self.profiler_hud.draw(handle)
 
+    @viewport_event
     def onDrawInterrupt(self, kwargs):
         handle = kwargs["draw_handle"]
         self.bezier_editor.draw(handle)
@@ -3831,6 +4904,7 @@ class State(object):
             if hovered_anchor is not None:
                 menu_states["value"] = State.ANCHOR_TYPE_TO_MENU_PARM[hovered_anchor.anchor_type]
 
+    @viewport_event
     def onMenuAction(self, kwargs):
         """ Callback implementing the actions of a bound menu. Called 
         when a menu item has been selected. 
@@ -3959,6 +5033,7 @@ class State(object):
             for anchor in action_anchors:
                 self.bezier_editor.set_anchor_type(anchor, AnchorType.SMOOTH)
                 self.bezier_editor.anchor_auto_gradient(anchor)
+                self.bezier_editor.mark_anchor_geo_dirty(anchor)
             self.bezier_editor.end_edit()
 
         if menu_item.startswith("align_") and action_anchors:
@@ -3980,7 +5055,9 @@ class State(object):
 
             self.bezier_editor.begin_edit()
             for anchor in action_anchors: # type: AnchorPoint
-                anchor.position[axis] = anchor.controls[0][axis] = anchor.controls[1][axis] = value
+                anchor.points[:, axis] = value
+                self.bezier_editor.sync_anchor_controls(anchor)
+                self.bezier_editor.mark_anchor_geo_dirty(anchor)
             self.bezier_editor.end_edit()
 
             self.bezier_editor.update_all_editor_geo()
@@ -4014,6 +5091,7 @@ class State(object):
                 anchor.controls[0] = hou.hmath.intersectPlane(plane_origin, plane_normal, anchor.controls[0], plane_normal)
                 anchor.controls[1] = hou.hmath.intersectPlane(plane_origin, plane_normal, anchor.controls[1], plane_normal)
                 self.bezier_editor.sync_anchor_controls(anchor)
+                self.bezier_editor.mark_anchor_geo_dirty(anchor)
             self.bezier_editor.end_edit()
 
             self.bezier_editor.update_all_editor_geo()